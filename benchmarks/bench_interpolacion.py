@@ -0,0 +1,305 @@
+import argparse
+import ast
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+from types import SimpleNamespace
+
+
+"""
+bench_interpolacion.py
+
+
+Micro-benchmarks de la interpolación y de la orientación, sin Blender.
+
+Uso:
+
+    python benchmarks/bench_interpolacion.py [--salida resultados.json]
+        [--referencia benchmarks/referencia.json] [--umbral 0.5]
+        [--guardar-referencia] [--tamanos 10 100 1000 10000]
+
+Mide `interpola.lineal`, `catmull_rom` y `hermite`, las funciones de vectores
+de `posicion` que llaman los drivers (`get_lat_vec`, `get_up_vec`,
+`get_quad_from_vecs`, `get_quat_rot` y `angle_in_xy_plane`) y su núcleo en
+`trayectoria` (`vector_lateral`, `vector_arriba`, `cuaternion_entre`,
+`cuaternion_rotacion` y `angulo_en_plano_xy`) sobre conjuntos sintéticos de
+keyframes de distintos tamaños. Cada función se llama una vez por segmento (o
+por tangente) del conjunto, se repite la pasada y se queda el mejor tiempo. El
+resultado, en nanosegundos por llamada y llamadas por segundo, se imprime como
+JSON.
+
+Si `mathutils` no está instalado se usa `mathutils_local`, para que
+`catmull_rom`, `hermite` y las funciones de `posicion` se midan por el mismo
+camino que en Blender. `trayectoria` no depende de Blender y se importa
+directamente; como `posicion` importa `bpy`, sus funciones se extraen del
+código fuente con `ast` y se ejecutan aparte.
+
+Con `--referencia` se compara con un resultado anterior y el script termina con
+código 1 si alguna medida es más lenta que la referencia en más del umbral.
+`--guardar-referencia` escribe el resultado en el archivo de referencia. Los
+tiempos absolutos solo son comparables en la misma máquina, así que la
+referencia no se guarda en el repositorio: cada uno la crea en local antes de
+medir un cambio, y si se tomó en otro entorno no se compara.
+
+
+Autores: Grupo 5.
+"""
+
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+DIRECTORIO_SRC = os.path.join(os.path.dirname(DIRECTORIO), "src")
+REFERENCIA = os.path.join(DIRECTORIO, "referencia.json")
+
+TAMANOS = (10, 100, 1000, 10000)
+FUNCIONES_POSICION = ("get_lat_vec", "get_up_vec", "get_quad_from_vecs",
+                      "get_quat_rot", "angle_in_xy_plane")
+
+
+def importa_mathutils():
+    """Devuelve `mathutils` o, si no está disponible, el sustituto local."""
+    try:
+        import mathutils
+        return mathutils, "mathutils"
+    except ImportError:
+        sys.path.insert(0, DIRECTORIO)
+        import mathutils_local
+        sys.modules["mathutils"] = mathutils_local
+        return mathutils_local, "mathutils_local"
+
+
+def funciones_posicion(mathutils, trayectoria, nombres=FUNCIONES_POSICION):
+    """
+    Extrae funciones de `posicion.py` sin importar el módulo (que necesita `bpy`).
+
+    Retorno:
+    -------
+    dict[str, function]
+    """
+    ruta = os.path.join(DIRECTORIO_SRC, "posicion.py")
+    with open(ruta, encoding="utf-8") as f:
+        arbol = ast.parse(f.read(), ruta)
+
+    nodos = [nodo for nodo in arbol.body
+             if isinstance(nodo, ast.FunctionDef) and nodo.name in nombres]
+    faltan = set(nombres) - {nodo.name for nodo in nodos}
+    if faltan:
+        raise RuntimeError(f"Funciones no encontradas en posicion.py: {sorted(faltan)}")
+
+    espacio = {"mathutils": mathutils, "math": math, "trayectoria": trayectoria}
+    exec(compile(ast.Module(body=nodos, type_ignores=[]), ruta, "exec"), espacio)
+
+    return {nombre: espacio[nombre] for nombre in nombres}
+
+
+def keyframes_sinteticos(n):
+    """
+    Keyframes de una ruta por la cuadrícula: tiempos crecientes con pasos
+    irregulares y posiciones (x, y, z) que giran cada pocos tramos.
+    """
+    tiempos = [0.0]
+    posiciones = [(0.0, 0.0, 5.0)]
+    for k in range(1, n):
+        tiempos.append(tiempos[-1] + 5 + (k * 7) % 11)
+        x, y, z = posiciones[-1]
+        if (k // 3) % 2:
+            posiciones.append((x, y + 6.0, z + math.sin(k) * 0.5))
+        else:
+            posiciones.append((x + 6.0, y, z + math.cos(k) * 0.5))
+    return tiempos, posiciones
+
+
+def casos(interpola, trayectoria, posicion, mathutils, n):
+    """
+    Lista de (nombre, función, argumentos) para un conjunto de `n` keyframes.
+    Los argumentos se preparan de antemano para medir solo la llamada.
+    """
+    tiempos, posiciones = keyframes_sinteticos(n)
+    xs = [p[0] for p in posiciones]
+
+    lineal, catmull, hermite = [], [], []
+    for i in range(n - 1):
+        t0, t1 = tiempos[i], tiempos[i + 1]
+        t = (t0 + t1) / 2
+        lineal.append((t, t0, t1, xs[i], xs[i + 1]))
+
+        i0, i3 = max(i - 1, 0), min(i + 2, n - 1)
+        catmull.append((t, tiempos[i0], t0, t1, tiempos[i3],
+                        xs[i0], xs[i], xs[i + 1], xs[i3], 0.5))
+
+        v = (xs[i + 1] - xs[i]) / (t1 - t0)
+        hermite.append((t, t0, t1, xs[i], xs[i + 1], v * (t1 - t0), v * (t1 - t0)))
+
+    tangentes = [(b[0] - a[0] + 0.01, b[1] - a[1] + 0.02, b[2] - a[2])
+                 for a, b in zip(posiciones, posiciones[1:])]
+    laterales = [trayectoria.vector_lateral(t) for t in tangentes]
+    ups = [trayectoria.vector_arriba(t, l) for t, l in zip(tangentes, laterales)]
+    eje = trayectoria.EJES['X']
+    e3 = trayectoria.EJES['Z']
+    pares = list(zip(tangentes, tangentes[1:] + tangentes[:1]))
+
+    # Los mismos datos como los reciben las funciones de `posicion` desde los drivers
+    Vector = mathutils.Vector
+    tangentes_v = [Vector(t) for t in tangentes]
+    laterales_v = [posicion["get_lat_vec"](t) for t in tangentes_v]
+    ups_v = [posicion["get_up_vec"](t, l) for t, l in zip(tangentes_v, laterales_v)]
+    eje_v = Vector(eje)
+    obj = SimpleNamespace(eje_arriba='Z')
+    pares_v = list(zip(tangentes_v, tangentes_v[1:] + tangentes_v[:1]))
+
+    return [
+        ("interpola.lineal", interpola.lineal, lineal),
+        ("interpola.catmull_rom", interpola.catmull_rom, catmull),
+        ("interpola.hermite", interpola.hermite, hermite),
+        ("trayectoria.vector_lateral", trayectoria.vector_lateral, [(t,) for t in tangentes]),
+        ("trayectoria.vector_arriba", trayectoria.vector_arriba, list(zip(tangentes, laterales))),
+        ("trayectoria.cuaternion_entre", trayectoria.cuaternion_entre,
+         [(eje, t) for t in tangentes]),
+        ("trayectoria.cuaternion_rotacion", trayectoria.cuaternion_rotacion,
+         [(eje, t, up, 0.2, 0.1, e3) for t, up in zip(tangentes, ups)]),
+        ("trayectoria.angulo_en_plano_xy", trayectoria.angulo_en_plano_xy, pares),
+        ("posicion.get_lat_vec", posicion["get_lat_vec"], [(t,) for t in tangentes_v]),
+        ("posicion.get_up_vec", posicion["get_up_vec"], list(zip(tangentes_v, laterales_v))),
+        ("posicion.get_quad_from_vecs", posicion["get_quad_from_vecs"],
+         [(eje_v, t) for t in tangentes_v]),
+        ("posicion.get_quat_rot", posicion["get_quat_rot"],
+         [(eje_v, t, up, 0.2, 0.1, obj) for t, up in zip(tangentes_v, ups_v)]),
+        ("posicion.angle_in_xy_plane", posicion["angle_in_xy_plane"], pares_v),
+    ]
+
+
+def mide(funcion, argumentos, repeticiones, minimo_llamadas=2000):
+    """
+    Mejor tiempo por llamada (ns) de `funcion` sobre todos los argumentos.
+
+    Cada repetición recorre la lista las veces necesarias para hacer al menos
+    `minimo_llamadas` llamadas, de modo que los conjuntos pequeños también se
+    miden con suficientes llamadas.
+    """
+    vueltas = max(1, -(-minimo_llamadas // len(argumentos)))
+    llamadas = vueltas * len(argumentos)
+
+    mejor = math.inf
+    for _ in range(repeticiones):
+        inicio = time.perf_counter_ns()
+        for _ in range(vueltas):
+            for args in argumentos:
+                funcion(*args)
+        mejor = min(mejor, time.perf_counter_ns() - inicio)
+
+    return mejor / llamadas
+
+
+def ejecuta(tamanos=TAMANOS, repeticiones=5):
+    """
+    Ejecuta todos los benchmarks.
+
+    Retorno:
+    -------
+    dict
+        Entorno y, por cada "función[n=tamaño]", ns por llamada y llamadas por segundo.
+    """
+    mathutils, origen = importa_mathutils()
+    sys.path.insert(0, DIRECTORIO_SRC)
+    import interpola
+    import trayectoria
+    posicion = funciones_posicion(mathutils, trayectoria)
+
+    resultados = {}
+    for n in tamanos:
+        for nombre, funcion, argumentos in casos(interpola, trayectoria, posicion, mathutils, n):
+            ns = mide(funcion, argumentos, repeticiones)
+            resultados[f"{nombre}[n={n}]"] = {
+                "ns_llamada": round(ns, 1),
+                "llamadas_s": round(1e9 / ns),
+            }
+
+    return {
+        "entorno": {
+            "python": platform.python_version(),
+            "implementacion": platform.python_implementation(),
+            "maquina": platform.machine(),
+            "mathutils": origen,
+        },
+        "resultados": resultados,
+    }
+
+
+def compara(actual, referencia, umbral):
+    """
+    Medidas más lentas que la referencia en más de `umbral` (fracción).
+
+    Retorno:
+    -------
+    list[tuple[str, float, float, float]]
+        Nombre, ns de referencia, ns actuales y cambio relativo de cada regresión.
+    """
+    regresiones = []
+    for nombre, medida in actual["resultados"].items():
+        previa = referencia["resultados"].get(nombre)
+        if previa is None:
+            continue
+        cambio = medida["ns_llamada"] / previa["ns_llamada"] - 1
+        if cambio > umbral:
+            regresiones.append((nombre, previa["ns_llamada"], medida["ns_llamada"], cambio))
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks de interpolación y orientación sin Blender.")
+    parser.add_argument("--salida", help="archivo JSON para los resultados")
+    parser.add_argument("--referencia", default=REFERENCIA,
+                        help="resultados de referencia, creados en local con --guardar-referencia "
+                             "(por defecto benchmarks/referencia.json)")
+    parser.add_argument("--umbral", type=float, default=0.5,
+                        help="empeoramiento relativo admitido (0.5 = 50%%)")
+    parser.add_argument("--guardar-referencia", action="store_true",
+                        help="guarda el resultado como nueva referencia")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=list(TAMANOS),
+                        help="número de keyframes de cada conjunto")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if min(args.tamanos) < 2:
+        parser.error("cada conjunto necesita al menos dos keyframes")
+
+    actual = ejecuta(args.tamanos, args.repeticiones)
+    texto = json.dumps(actual, indent=2)
+    print(texto)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+
+    if args.guardar_referencia:
+        with open(args.referencia, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+        return 0
+
+    if not os.path.exists(args.referencia):
+        print(f"No hay referencia en {args.referencia}; no se compara "
+              "(créala con --guardar-referencia).", file=sys.stderr)
+        return 0
+
+    with open(args.referencia, encoding="utf-8") as f:
+        referencia = json.load(f)
+
+    if referencia["entorno"] != actual["entorno"]:
+        print("La referencia se tomó en otro entorno "
+              f"({referencia['entorno']}); no se compara.", file=sys.stderr)
+        return 0
+
+    regresiones = compara(actual, referencia, args.umbral)
+    for nombre, previa, ns, cambio in regresiones:
+        print(f"REGRESIÓN {nombre}: {previa:.1f} -> {ns:.1f} ns/llamada (+{cambio:.0%})",
+              file=sys.stderr)
+
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import math
+
+
+"""
+mathutils_local.py
+
+
+Sustituto mínimo de `mathutils` para ejecutar los benchmarks fuera de Blender.
+
+Implementa solo lo que usan `interpola` y las funciones de orientación de
+`posicion`: Vector (cross, dot, normalized, angle, orthogonal y el producto
+fila @ Matrix), Matrix (Matrix @ Vector) y Quaternion (desde eje y ángulo,
+producto de cuaterniones y rotación de vectores). Está escrito en Python puro,
+así que sus tiempos no son comparables con los de Blender: sirve para comparar
+una ejecución con la referencia tomada en las mismas condiciones.
+
+
+Autores: Grupo 5.
+"""
+
+
+class Vector:
+    __slots__ = ("_v",)
+
+    def __init__(self, valores=(0.0, 0.0, 0.0)):
+        self._v = tuple(map(float, valores))
+
+    @classmethod
+    def _de_tupla(cls, valores):
+        # Construcción sin conversión para los resultados internos
+        v = object.__new__(cls)
+        v._v = valores
+        return v
+
+    # Acceso a componentes
+
+    def __len__(self):
+        return len(self._v)
+
+    def __iter__(self):
+        return iter(self._v)
+
+    def __getitem__(self, i):
+        return self._v[i]
+
+    @property
+    def x(self):
+        return self._v[0]
+
+    @property
+    def y(self):
+        return self._v[1]
+
+    @property
+    def z(self):
+        return self._v[2]
+
+    def __repr__(self):
+        return f"Vector({self._v})"
+
+    # Aritmética
+
+    def __eq__(self, otro):
+        return isinstance(otro, Vector) and self._v == otro._v
+
+    def __hash__(self):
+        return hash(self._v)
+
+    def __neg__(self):
+        return Vector._de_tupla(tuple([-c for c in self._v]))
+
+    def __add__(self, otro):
+        return Vector._de_tupla(tuple([a + b for a, b in zip(self._v, otro)]))
+
+    def __sub__(self, otro):
+        return Vector._de_tupla(tuple([a - b for a, b in zip(self._v, otro)]))
+
+    def __mul__(self, escalar):
+        return Vector._de_tupla(tuple([c * escalar for c in self._v]))
+
+    __rmul__ = __mul__
+
+    def __matmul__(self, otro):
+        # Vector @ Vector: producto escalar; Vector @ Matrix: vector fila por matriz
+        if isinstance(otro, Matrix):
+            return Vector._de_tupla(tuple([sum([a * b for a, b in zip(self._v, columna)])
+                                           for columna in zip(*otro._filas)]))
+        return self.dot(otro)
+
+    # Geometría
+
+    def dot(self, otro):
+        return sum([a * b for a, b in zip(self._v, otro)])
+
+    def cross(self, otro):
+        ax, ay, az = self._v
+        bx, by, bz = otro
+        return Vector._de_tupla((ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx))
+
+    @property
+    def length(self):
+        return math.sqrt(self.dot(self))
+
+    def normalized(self):
+        n = self.length
+        if n == 0:
+            return Vector._de_tupla(self._v)
+        return Vector._de_tupla(tuple([c / n for c in self._v]))
+
+    def normalize(self):
+        self._v = self.normalized()._v
+
+    def angle(self, otro):
+        n = self.length * otro.length
+        if n == 0:
+            raise ValueError("Vector.angle(other): zero length vectors have no valid angle")
+        return math.acos(max(-1.0, min(1.0, self.dot(otro) / n)))
+
+    def orthogonal(self):
+        x, y, z = (abs(c) for c in self._v)
+        # Eje con la menor componente para evitar un producto vectorial nulo
+        if x <= y and x <= z:
+            eje = Vector((1, 0, 0))
+        elif y <= z:
+            eje = Vector((0, 1, 0))
+        else:
+            eje = Vector((0, 0, 1))
+        return self.cross(eje)
+
+
+class Matrix:
+    __slots__ = ("_filas",)
+
+    def __init__(self, filas):
+        self._filas = tuple(tuple(float(c) for c in fila) for fila in filas)
+
+    def __matmul__(self, otro):
+        if isinstance(otro, Matrix):
+            columnas = list(zip(*otro._filas))
+            return Matrix([[sum(a * b for a, b in zip(fila, col)) for col in columnas]
+                           for fila in self._filas])
+        return Vector._de_tupla(tuple([sum([a * b for a, b in zip(fila, otro)])
+                                       for fila in self._filas]))
+
+
+class Quaternion:
+    __slots__ = ("w", "x", "y", "z")
+
+    def __init__(self, valores=(1.0, 0.0, 0.0, 0.0), angulo=None):
+        if angulo is None:
+            self.w, self.x, self.y, self.z = map(float, valores)
+        else:
+            eje = Vector(valores).normalized()
+            s = math.sin(angulo / 2)
+            self.w = math.cos(angulo / 2)
+            self.x, self.y, self.z = eje.x * s, eje.y * s, eje.z * s
+
+    def __iter__(self):
+        return iter((self.w, self.x, self.y, self.z))
+
+    def __getitem__(self, i):
+        return (self.w, self.x, self.y, self.z)[i]
+
+    def __len__(self):
+        return 4
+
+    def __repr__(self):
+        return f"Quaternion({tuple(self)})"
+
+    def __matmul__(self, otro):
+        if isinstance(otro, Quaternion):
+            w1, x1, y1, z1 = self
+            w2, x2, y2, z2 = otro
+            return Quaternion((
+                w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+                w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+                w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+                w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+            ))
+
+        # Rotación de un vector: v' = v + 2w (q × v) + 2 q × (q × v)
+        q = Vector._de_tupla((self.x, self.y, self.z))
+        v = Vector(otro)
+        t = q.cross(v) * 2.0
+        return v + t * self.w + q.cross(t)
@@ -3,8 +3,17 @@ import os
 import mathutils
 import posicion
 import generar_ciudad
+import fcurves_lote
+import modelos
+import flota
+import perfilado
+import trazas
+
+from flota import crea_ruta, genera_ruta, inserta_keyframes_ruta
 import random
 import bpy
+
+from bpy.app.handlers import persistent
 bl_info = {
     "name": "Control Velocidad Esfera",
     "blender": (2, 93, 0),
@@ -36,7 +45,22 @@ bpy.types.Scene.num_esferas = bpy.props.IntProperty(
     description="Define el número de esferas a crear",
     default=1,
     min=1,
-    max=10
+    max=10000,
+    soft_max=100
+)
+
+bpy.types.Scene.modo_rutas = bpy.props.EnumProperty(
+    name="Rutas",
+    description="Cómo se eligen las rutas de las esferas",
+    items=[('ALEATORIA', "Aleatorias", "Rutas con giros al azar que acaban en la última calle"),
+           ('ORIGEN_DESTINO', "Origen y destino", "Camino más corto entre dos cruces al azar")],
+    default='ALEATORIA'
+)
+
+bpy.types.Scene.calcular_trayectorias = bpy.props.BoolProperty(
+    name="Mostrar trayectorias",
+    description="Calcular las trayectorias de movimiento de los coches creados",
+    default=True
 )
 
 bpy.types.Scene.nturns = bpy.props.IntProperty(
@@ -50,7 +74,8 @@ bpy.types.Scene.nturns = bpy.props.IntProperty(
 bpy.types.Scene.apply_random_oscillation = bpy.props.BoolProperty(
     name="Aplicar Oscilación Aleatoria",
     description="Activar o desactivar oscilación aleatoria",
-    default=False
+    default=False,
+    update=posicion.incrementa_version_ajustes
 )
 
 bpy.types.Scene.generar_coches = bpy.props.BoolProperty(
@@ -63,7 +88,8 @@ bpy.types.Scene.oscillation_axes = bpy.props.EnumProperty(
     name="Ejes de Oscilación",
     description="Selecciona los ejes de aplicación de la oscilación",
     items=[('X', "Eje X", ""), ('Y', "Eje Y", ""), ('Z', "Eje Z", "")],
-    options={'ENUM_FLAG'}
+    options={'ENUM_FLAG'},
+    update=posicion.incrementa_version_ajustes
 )
 
 bpy.types.Scene.oscillation_amplitude = bpy.props.FloatProperty(
@@ -71,7 +97,8 @@ bpy.types.Scene.oscillation_amplitude = bpy.props.FloatProperty(
     description="Define la amplitud de la oscilación aleatoria",
     default=1.0,
     min=0.0,
-    max=10.0
+    max=10.0,
+    update=posicion.incrementa_version_ajustes
 )
 
 bpy.types.Scene.oscillation_frequency = bpy.props.FloatProperty(
@@ -79,7 +106,8 @@ bpy.types.Scene.oscillation_frequency = bpy.props.FloatProperty(
     description="Define la frecuencia de la oscilación aleatoria",
     default=0.1,
     min=0.0,
-    max=5.0
+    max=5.0,
+    update=posicion.incrementa_version_ajustes
 )
 
 bpy.types.Scene.control_rotacion = bpy.props.BoolProperty(
@@ -88,6 +116,35 @@ bpy.types.Scene.control_rotacion = bpy.props.BoolProperty(
     default=True
 )
 
+
+def _actualiza_trazado(self, context):
+    # Cada activación empieza una traza nueva
+    if self.trazar_generacion:
+        trazas.reinicia()
+        trazas.activa()
+    else:
+        trazas.desactiva()
+
+
+bpy.types.Scene.trazar_generacion = bpy.props.BoolProperty(
+    name="Trazar generación",
+    description="Registra la duración de cada etapa de la generación de la ciudad y de los coches "
+                "para verla en un visor de trazas de Chrome",
+    default=False,
+    update=_actualiza_trazado
+)
+
+
+@persistent
+def _sincroniza_trazado(*args):
+    '''Handler de carga de archivo: aplica el ajuste guardado en la escena.'''
+    scene = bpy.context.scene
+    if scene is not None and scene.trazar_generacion:
+        trazas.activa()
+    else:
+        trazas.desactiva()
+
+
 ruta_escena = bpy.data.filepath
 directorio_escena = os.path.dirname(ruta_escena)
 nombre_archivo = "car.obj"
@@ -109,63 +166,7 @@ eje_items = [
 ]
 
 
-def crea_ruta(nturns: int, N: int):
-    """
-    Genera una ruta aleatoria en una cuadrícula NxN con un número especificado de giros (nturns).
-
-    Parámetros:
-    -----------
-    nturns : int
-        Número de giros o cambios de dirección en la ruta.
-    N : int
-        Tamaño de la cuadrícula, donde las calles están numeradas de 0 a N.
-
-    Descripción:
-    ------------
-    - La función crea una ruta inicializando en (0, 0) y eligiendo de manera aleatoria las calles 
-    horizontales (filas) o verticales (columnas) para moverse, asegurándose de no repetir la última 
-    posición en el siguiente turno.
-    - Alterna entre filas y columnas en cada giro, asegurando diversidad en la trayectoria.
-    - Finalmente, la ruta se fuerza para terminar en la última calle de la cuadrícula, ya sea 
-    horizontal (i = N) o vertical (j = N).
-
-    Retorno:
-    --------
-    list
-        Una lista de posiciones `[i, j]` que representan la ruta en la cuadrícula.
-"""
-
-    # Listado de calles a elegir
-    calles = set(range(N+1))
-
-    i = 0
-    j = 0
-    posns = []
-
-    # Elegimos al azar si la primera posición es en fila o columna
-    fila = random.choice([True, False])
-    for turn in range(nturns + 1):
-        if fila:
-            fila = False
-            # Elección aleatoria de la siguiente calle
-            i = random.choice(list(calles - {i}))
-        else:
-            fila = True
-            # Elección aleatoria de la siguiente calle
-            j = random.choice(list(calles - {j}))
-        posns.append([i, j])
-
-    # Forzamos que acabe en la última calle
-    if fila:
-        i = N
-    else:
-        j = N
-
-    posns.append([i, j])
-
-    return posns
-
-
+@trazas.traza(categoria="ciudad")
 def aplicar_configuracion_ciudad():
     """
     Aplica la configuración actual de la ciudad en el proyecto de Blender.
@@ -197,10 +198,56 @@ def aplicar_configuracion_ciudad():
     generar_ciudad.numero_calles_x = bpy.context.scene.numero_calles_x_y
     generar_ciudad.numero_calles_y = bpy.context.scene.numero_calles_x_y
     generar_ciudad.tam_calle = bpy.context.scene.amplitud_calle
-    generar_ciudad.Borrar_Ciudad()  # Genera la ciudad con los nuevos valores
-    generar_ciudad.register()  # Genera la ciudad con los nuevos valores
+    generar_ciudad.usar_arquetipos = bpy.context.scene.usar_arquetipos
+    generar_ciudad.num_arquetipos = bpy.context.scene.num_arquetipos
+    with trazas.tramo("Borrar_Ciudad", "ciudad"):
+        generar_ciudad.Borrar_Ciudad()
+    with trazas.tramo("genera_ciudad", "ciudad"):
+        generar_ciudad.register()  # Genera la ciudad con los nuevos valores
+
+
+def ruta_modelo():
+    """Ruta absoluta del modelo .obj de la escena (`car.obj` junto al .blend por defecto)."""
+    return bpy.path.abspath(bpy.context.scene.ruta_modelo_obj) or ruta_completa
+
+
+def crea_vehiculo(generar_coches, location):
+    """
+    Crea el objeto que recorrerá una ruta: un coche con el modelo .obj de la
+    escena o, si no se piden coches o el modelo no existe, una esfera.
+
+    Parámetros:
+    ---------
+    - generar_coches (bool): Usar el modelo 3D en lugar de una esfera.
+    - location (tuple): Posición inicial del objeto.
+
+    Descripción:
+    ------------
+    - El modelo se importa una sola vez por sesión (`modelos.malla_modelo`) y
+      cada coche enlaza la misma malla.
+    - Las esferas comparten una malla de radio `tam_calle * 0.75` con dos
+      niveles de subdivisión (`modelos.malla_esfera`).
 
+    Retorno:
+    --------
+    bpy.types.Object: El objeto creado.
+    """
+    if generar_coches:
+        ruta_obj = ruta_modelo()
+
+        if os.path.exists(ruta_obj) and ruta_obj.endswith(".obj"):
+            factor_escala = generar_ciudad.tam_calle * 3
+            return modelos.crea_coche(ruta_obj, factor_escala, location)
+
+        print("No se encontró un modelo .obj válido. Generando esferas por defecto.")
+
+    # Crear una esfera en lugar de un coche (malla compartida ya subdividida)
+    esfera = modelos.crea_esfera(generar_ciudad.tam_calle * 0.75, 2, location)
 
+    return esfera
+
+
+@trazas.traza(categoria="coches")
 def CrearEsferas(velocidad, nturns):
     """
     Esta función crea esferas (o coches en formato 3D) 
@@ -220,8 +267,8 @@ def CrearEsferas(velocidad, nturns):
     proporcionada y genera una ruta aleatoria de movimiento para cada objeto.
     - La dirección de la ruta se elige aleatoriamente, pudiendo ser Norte-Sur (N-S), 
     Este-Oeste (E-O), Oeste-Este (O-E) o Sur-Norte (S-N).
-    - Si se encuentra un archivo .obj válido, lo importa y lo escala para usarlo 
-    como modelo 3D, si no, se crea una esfera básica.
+    - Si se encuentra un archivo .obj válido, se usa como modelo 3D (importado una
+    sola vez y compartido entre coches), si no, se crea una esfera básica.
     - La función `crea_ruta` genera las posiciones para la trayectoria de la esfera 
     (o coche), basándose en la dirección y el número de vueltas (`nturns`).
     - Se insertan fotogramas clave en cada posición de la ruta para animar el objeto 
@@ -235,349 +282,25 @@ def CrearEsferas(velocidad, nturns):
     fps = bpy.context.scene.render.fps
     # Calcular el tiempo en frames para recorrer una calle
     tiempo_por_calle = fps / velocidad
-    posiciones = []
     generar_coches = bpy.context.scene.generar_coches
 
-    direccion = random.randint(0, 3)  # harexmos 0 N-S y 1 E-O
-
-    if direccion == 0:
-        calle_x = random.randint(0, generar_ciudad.numero_calles_x)
+    # Calle de salida, altura y ruta aleatorias
+    modo_rutas = bpy.context.scene.modo_rutas
+    with trazas.tramo("genera_ruta", "coches"):
+        inicio, altura, posiciones = genera_ruta(nturns, modo_rutas)
 
-        # Calcular la posición de la esfera entre dos valores consecutivos de X
-        pos_esfera_x = -2 + (calle_x * generar_ciudad.tam_calle) + \
-            (calle_x * generar_ciudad.tam_edif) + (generar_ciudad.tam_calle / 2)
-        pos_esfera_fin = -2 + (generar_ciudad.numero_calles_y * generar_ciudad.tam_calle) + (
-            generar_ciudad.numero_calles_y * generar_ciudad.tam_edif) + (generar_ciudad.tam_calle / 2)
+    with trazas.tramo("crea_vehiculo", "coches") as tramo:
+        esfera = crea_vehiculo(generar_coches, inicio)
+        tramo.anota(objeto=esfera.name)
 
-        altura = random.uniform(5, 15)
-
-        if generar_coches:
-            print("RUTA OBJETO CARGADA")
-            ruta_obj = ruta_completa  # bpy.context.scene.ruta_modelo_obj
-
-        if os.path.exists(ruta_obj) and ruta_obj.endswith(".obj"):
-            # Si el archivo existe, cargar el modelo 3D
-            bpy.ops.wm.obj_import(filepath=ruta_obj)
-            print("CARGA")
-            esfera = bpy.context.selected_objects[0]
-            factor_escala = generar_ciudad.tam_calle * 3 
-            esfera.scale *= factor_escala
-
-            # Asegúrate de aplicar la escala para solidificar los cambios
-            bpy.context.view_layer.objects.active = esfera
-            # Selecciona el objeto importado
-            bpy.ops.object.transform_apply(
-                location=False, rotation=False, scale=True)
-            print("Modelo 3D cargado correctamente.")
-        else:
-            print("No se encontró un modelo .obj válido. Generando esferas por defecto.")
-            generar_coches = False  # Revertir a esferas si no hay modelo válido
-
-        if not generar_coches:
-            # Crear una esfera en lugar de un coche
-            bpy.ops.mesh.primitive_uv_sphere_add(radius=1,
-                                                 enter_editmode=False,
-                                                 align='WORLD',
-                                                 # Posición inicial
-                                                 location=(
-                                                     pos_esfera_x, 0, altura),
-                                                 scale=(1, 1, 1))
-            esfera = bpy.context.active_object
-
-            # Redimensionar la esfera
-            bpy.ops.transform.resize(value=(generar_ciudad.tam_calle * 0.75, generar_ciudad.tam_calle * 0.75, generar_ciudad.tam_calle * 0.75),
-                                     orient_type='GLOBAL',
-                                     orient_matrix=(
-                                         (1, 0, 0), (0, 1, 0), (0, 0, 1)),
-                                     orient_matrix_type='GLOBAL',
-                                     mirror=False,
-                                     use_proportional_edit=False,
-                                     proportional_edit_falloff='SMOOTH',
-                                     proportional_size=1,
-                                     use_proportional_connected=False,
-                                     use_proportional_projected=False,
-                                     snap=False)
-
-            # Añadir el modificador de Subdivision Surface
-            mod = esfera.modifiers.new(name="Subdivision", type='SUBSURF')
-            mod.levels = 2  # Nivel de subdivisión en la vista
-            mod.render_levels = 3  # Nivel de subdivisión en el render
-
-        # Aplicar el modificador
-            bpy.ops.object.modifier_apply(modifier="Subdivision")
-
-        posiciones = crea_ruta(nturns, generar_ciudad.numero_calles_x)
+    # El resto del trabajo se dibuja en la fila del coche
+    with trazas.tramo("keyframes", "coches", pista=esfera.name):
         # Insertar fotogramas clave en cada posición de posns
-        for index, pos in enumerate(posiciones):
-            # Calcular el frame para cada punto en la ruta
-            frame = 1 + int(index * tiempo_por_calle)
-            bpy.context.scene.frame_set(frame)
-            esfera.location = (pos[0] * (generar_ciudad.tam_calle + generar_ciudad.tam_edif) - generar_ciudad.tam_calle/2, pos[1] * (
-                # Configurar la posición de la esfera en el punto actual
-                generar_ciudad.tam_calle + generar_ciudad.tam_edif) - generar_ciudad.tam_calle/2, altura)
-
-            # Insertar fotograma clave para la posición
-            esfera.keyframe_insert(data_path="location", index=-1)
-
-        bpy.context.view_layer.objects.active = esfera
-        bpy.ops.object.create_trayectoria()  # Llama al operador
-
-    elif direccion == 1:
-        calle_y = random.randint(0, generar_ciudad.numero_calles_y)
-
-        # Calcular la posición de la esfera entre dos valores consecutivos de X
-        pos_esfera_y = -2 + (calle_y * generar_ciudad.tam_calle) + \
-            (calle_y * generar_ciudad.tam_edif) + (generar_ciudad.tam_calle / 2)
-        pos_esfera_fin = -2 + (generar_ciudad.numero_calles_x * generar_ciudad.tam_calle) + (
-            generar_ciudad.numero_calles_x * generar_ciudad.tam_edif) + (generar_ciudad.tam_calle / 2)
-
-        altura = random.uniform(5, 15)
-
-        if generar_coches:
-            print("RUTA OBJETO CARGADA")
-            ruta_obj = ruta_completa  # bpy.context.scene.ruta_modelo_obj
+        inserta_keyframes_ruta(esfera, posiciones, tiempo_por_calle, altura,
+                               proporcional=(modo_rutas == 'ORIGEN_DESTINO'))
 
-        if os.path.exists(ruta_obj) and ruta_obj.endswith(".obj"):
-            # Si el archivo existe, cargar el modelo 3D
-            bpy.ops.wm.obj_import(filepath=ruta_obj)
-            print("CARGA")
-            esfera = bpy.context.selected_objects[0]
-            factor_escala = generar_ciudad.tam_calle * 3 
-            esfera.scale *= factor_escala
-
-            # Asegúrate de aplicar la escala para solidificar los cambios
-            bpy.context.view_layer.objects.active = esfera
-            # Selecciona el objeto importado
-            bpy.ops.object.transform_apply(
-                location=False, rotation=False, scale=True)
-            print("Modelo 3D cargado correctamente.")
-        else:
-            print("No se encontró un modelo .obj válido. Generando esferas por defecto.")
-            generar_coches = False  # Revertir a esferas si no hay modelo válido
-
-        if not generar_coches:
-            # Crear una esfera en lugar de un coche
-            bpy.ops.mesh.primitive_uv_sphere_add(radius=1,
-                                                 enter_editmode=False,
-                                                 align='WORLD',
-                                                 # Posición inicial
-                                                 location=(
-                                                     pos_esfera_x, 0, altura),
-                                                 scale=(1, 1, 1))
-            esfera = bpy.context.active_object
-
-            # Redimensionar la esfera
-            bpy.ops.transform.resize(value=(generar_ciudad.tam_calle * 0.75, generar_ciudad.tam_calle * 0.75, generar_ciudad.tam_calle * 0.75),
-                                     orient_type='GLOBAL',
-                                     orient_matrix=(
-                                         (1, 0, 0), (0, 1, 0), (0, 0, 1)),
-                                     orient_matrix_type='GLOBAL',
-                                     mirror=False,
-                                     use_proportional_edit=False,
-                                     proportional_edit_falloff='SMOOTH',
-                                     proportional_size=1,
-                                     use_proportional_connected=False,
-                                     use_proportional_projected=False,
-                                     snap=False)
-
-            # Añadir el modificador de Subdivision Surface
-            mod = esfera.modifiers.new(name="Subdivision", type='SUBSURF')
-            mod.levels = 2  # Nivel de subdivisión en la vista
-            mod.render_levels = 3  # Nivel de subdivisión en el render
-
-        # Aplicar el modificador
-        bpy.ops.object.modifier_apply(modifier="Subdivision")
-
-        # Aplicar el modificador
-        bpy.ops.object.modifier_apply(modifier="Subdivision")
-        # Insertar fotogramas clave en cada posición de posns
-        posiciones = crea_ruta(nturns, generar_ciudad.numero_calles_x)
-        for index, pos in enumerate(posiciones):
-            # Calcular el frame para cada punto en la ruta
-            frame = 1 + int(index * tiempo_por_calle)
-            bpy.context.scene.frame_set(frame)
-            esfera.location = (pos[0] * (generar_ciudad.tam_calle + generar_ciudad.tam_edif) - generar_ciudad.tam_calle/2, pos[1] * (
-                # Configurar la posición de la esfera en el punto actual
-                generar_ciudad.tam_calle + generar_ciudad.tam_edif) - generar_ciudad.tam_calle/2, altura)
-
-            # Insertar fotograma clave para la posición
-            esfera.keyframe_insert(data_path="location", index=-1)
-
-        bpy.context.view_layer.objects.active = esfera
-        bpy.ops.object.create_trayectoria()  # Llama al operador
-
-    # O-E
-    elif direccion == 2:
-        calle_y = random.randint(0, generar_ciudad.numero_calles_y)
-
-        # Calcular la posición de la esfera entre dos valores consecutivos de X
-        pos_esfera_y = -2 + (calle_y * generar_ciudad.tam_calle) + \
-            (calle_y * generar_ciudad.tam_edif) + (generar_ciudad.tam_calle / 2)
-        pos_esfera_fin = (generar_ciudad.numero_calles_x * generar_ciudad.tam_calle) + (
-            generar_ciudad.numero_calles_x * generar_ciudad.tam_edif) + (generar_ciudad.tam_calle / 2)
-
-        altura = random.uniform(5, 15)
-
-        # Crear esfera
-        if generar_coches:
-            print("RUTA OBJETO CARGADA")
-            ruta_obj = ruta_completa  # bpy.context.scene.ruta_modelo_obj
-
-        if os.path.exists(ruta_obj) and ruta_obj.endswith(".obj"):
-            # Si el archivo existe, cargar el modelo 3D
-            bpy.ops.wm.obj_import(filepath=ruta_obj)
-            print("CARGA")
-            esfera = bpy.context.selected_objects[0]
-            factor_escala = generar_ciudad.tam_calle * 3 
-            # Multiplica las dimensiones actuales por el factor de escala
-            esfera.scale *= factor_escala
-
-            # Asegúrate de aplicar la escala para solidificar los cambios
-            bpy.context.view_layer.objects.active = esfera
-            # Selecciona el objeto importado
-            bpy.ops.object.transform_apply(
-                location=False, rotation=False, scale=True)
-            print("Modelo 3D cargado correctamente.")
-        else:
-            print("No se encontró un modelo .obj válido. Generando esferas por defecto.")
-            generar_coches = False  # Revertir a esferas si no hay modelo válido
-
-        if not generar_coches:
-            # Crear una esfera en lugar de un coche
-            bpy.ops.mesh.primitive_uv_sphere_add(radius=1,
-                                                 enter_editmode=False,
-                                                 align='WORLD',
-                                                 # Posición inicial
-                                                 location=(
-                                                     pos_esfera_x, 0, altura),
-                                                 scale=(1, 1, 1))
-            esfera = bpy.context.active_object
-
-            # Redimensionar la esfera
-            bpy.ops.transform.resize(value=(generar_ciudad.tam_calle * 0.75, generar_ciudad.tam_calle * 0.75, generar_ciudad.tam_calle * 0.75),
-                                     orient_type='GLOBAL',
-                                     orient_matrix=(
-                                         (1, 0, 0), (0, 1, 0), (0, 0, 1)),
-                                     orient_matrix_type='GLOBAL',
-                                     mirror=False,
-                                     use_proportional_edit=False,
-                                     proportional_edit_falloff='SMOOTH',
-                                     proportional_size=1,
-                                     use_proportional_connected=False,
-                                     use_proportional_projected=False,
-                                     snap=False)
-
-            # Añadir el modificador de Subdivision Surface
-            mod = esfera.modifiers.new(name="Subdivision", type='SUBSURF')
-            mod.levels = 2  # Nivel de subdivisión en la vista
-            mod.render_levels = 3  # Nivel de subdivisión en el render
-
-        # Aplicar el modificador
-        bpy.ops.object.modifier_apply(modifier="Subdivision")
-
-        # Establecer el frame a 50 y agregar el fotograma clave al final de la calle
-       # Aplicar el modificador
-        bpy.ops.object.modifier_apply(modifier="Subdivision")
-        posiciones = crea_ruta(nturns, generar_ciudad.numero_calles_x)
-        # Insertar fotogramas clave en cada posición de posns
-        for index, pos in enumerate(posiciones):
-            # Calcular el frame para cada punto en la ruta
-            frame = 1 + int(index * tiempo_por_calle)
-            bpy.context.scene.frame_set(frame)
-            esfera.location = (pos[0] * (generar_ciudad.tam_calle + generar_ciudad.tam_edif) - generar_ciudad.tam_calle/2, pos[1] * (
-                # Configurar la posición de la esfera en el punto actual
-                generar_ciudad.tam_calle + generar_ciudad.tam_edif) - generar_ciudad.tam_calle/2, altura)
-
-            # Insertar fotograma clave para la posición
-            esfera.keyframe_insert(data_path="location", index=-1)
-
-        bpy.context.view_layer.objects.active = esfera
-        bpy.ops.object.create_trayectoria()  # Llama al operador
-
-    elif direccion == 3:
-        calle_x = random.randint(0, generar_ciudad.numero_calles_x)
-
-        # Calcular la posición de la esfera entre dos valores consecutivos de X
-        pos_esfera_x = -2 + (calle_x * generar_ciudad.tam_calle) + \
-            (calle_x * generar_ciudad.tam_edif) + (generar_ciudad.tam_calle / 2)
-        pos_esfera_fin = -2 + (generar_ciudad.numero_calles_y * generar_ciudad.tam_calle) + (
-            generar_ciudad.numero_calles_y * generar_ciudad.tam_edif) + (generar_ciudad.tam_calle / 2)
-
-        altura = random.uniform(5, 15)
-
-        if generar_coches:
-            print("RUTA OBJETO CARGADA")
-            ruta_obj = ruta_completa  # bpy.context.scene.ruta_modelo_obj
-
-        if os.path.exists(ruta_obj) and ruta_obj.endswith(".obj"):
-            # Si el archivo existe, cargar el modelo 3D
-            bpy.ops.wm.obj_import(filepath=ruta_obj)
-            print("CARGA")
-            esfera = bpy.context.selected_objects[0]
-            factor_escala = generar_ciudad.tam_calle * 3 
-            # Multiplica las dimensiones actuales por el factor de escala
-            esfera.scale *= factor_escala
-
-            # Asegúrate de aplicar la escala para solidificar los cambios
-            bpy.context.view_layer.objects.active = esfera
-            # Selecciona el objeto importado
-            bpy.ops.object.transform_apply(
-                location=False, rotation=False, scale=True)
-            print("Modelo 3D cargado correctamente.")
-        else:
-            print("No se encontró un modelo .obj válido. Generando esferas por defecto.")
-            generar_coches = False  # Revertir a esferas si no hay modelo válido
-
-        if not generar_coches:
-            # Crear una esfera en lugar de un coche
-            bpy.ops.mesh.primitive_uv_sphere_add(radius=1,
-                                                 enter_editmode=False,
-                                                 align='WORLD',
-                                                 # Posición inicial
-                                                 location=(
-                                                     pos_esfera_x, 0, altura),
-                                                 scale=(1, 1, 1))
-            esfera = bpy.context.active_object
-
-            # Redimensionar la esfera
-            bpy.ops.transform.resize(value=(generar_ciudad.tam_calle * 0.75, generar_ciudad.tam_calle * 0.75, generar_ciudad.tam_calle * 0.75),
-                                     orient_type='GLOBAL',
-                                     orient_matrix=(
-                                         (1, 0, 0), (0, 1, 0), (0, 0, 1)),
-                                     orient_matrix_type='GLOBAL',
-                                     mirror=False,
-                                     use_proportional_edit=False,
-                                     proportional_edit_falloff='SMOOTH',
-                                     proportional_size=1,
-                                     use_proportional_connected=False,
-                                     use_proportional_projected=False,
-                                     snap=False)
-
-            # Añadir el modificador de Subdivision Surface
-            mod = esfera.modifiers.new(name="Subdivision", type='SUBSURF')
-            mod.levels = 2  # Nivel de subdivisión en la vista
-            mod.render_levels = 3  # Nivel de subdivisión en el render
-
-        # Aplicar el modificador
-        bpy.ops.object.modifier_apply(modifier="Subdivision")
-
-        # Aplicar el modificador
-        bpy.ops.object.modifier_apply(modifier="Subdivision")
-        posiciones = crea_ruta(nturns, generar_ciudad.numero_calles_x)
-        # Insertar fotogramas clave en cada posición de posns
-        for index, pos in enumerate(posiciones):
-            # Calcular el frame para cada punto en la ruta
-            frame = 1 + int(index * tiempo_por_calle)
-            bpy.context.scene.frame_set(frame)
-            esfera.location = (pos[0] * (generar_ciudad.tam_calle + generar_ciudad.tam_edif) - generar_ciudad.tam_calle/2, pos[1] * (
-                # Configurar la posición de la esfera en el punto actual
-                generar_ciudad.tam_calle + generar_ciudad.tam_edif) - generar_ciudad.tam_calle/2, altura)
-
-            # Insertar fotograma clave para la posición
-            esfera.keyframe_insert(data_path="location", index=-1)
-
-        # bpy.context.view_layer.objects.active = objeto
-        bpy.context.view_layer.objects.active = esfera
+    bpy.context.view_layer.objects.active = esfera
+    with trazas.tramo("create_trayectoria", "coches", pista=esfera.name):
         bpy.ops.object.create_trayectoria()  # Llama al operador
 
 
@@ -609,7 +332,7 @@ class OBJECT_OT_Crear_Mov_Esfera(bpy.types.Operator):
     --------
     1. `invoke(self, context, event)`:
         Método invocado cuando se utiliza el operador desde la interfaz. Obtiene las propiedades de la escena,
-        y luego llama a la función `CrearEsferas` para generar las esferas en la escena.
+        y luego llama a `flota.crea_flota` para generar todas las esferas en la escena por lotes.
 
         Retorna:
         --------
@@ -617,7 +340,8 @@ class OBJECT_OT_Crear_Mov_Esfera(bpy.types.Operator):
 
     Notas:
     ------
-    - La función `CrearEsferas` es la responsable de generar las esferas y asignarles los movimientos.
+    - `flota.crea_flota` genera las esferas y les asigna los movimientos por fases, sin
+      llamar a operadores por esfera. `CrearEsferas` sigue disponible para crear una sola.
 
     Retorno:
     --------
@@ -629,21 +353,93 @@ class OBJECT_OT_Crear_Mov_Esfera(bpy.types.Operator):
 
     def invoke(self, context, event):
 
-        ruta_obj = bpy.context.scene.ruta_modelo_obj
+        scene = bpy.context.scene
 
-        velocidad = bpy.context.scene.velocidad_esfera
-        num_esferas = bpy.context.scene.num_esferas
-        nturns = bpy.context.scene.nturns
+        velocidad = scene.velocidad_esfera
+        num_esferas = scene.num_esferas
+        nturns = scene.nturns
 
-        # Crear esferas en un bucle
-        for i in range(num_esferas):
-            CrearEsferas(velocidad, nturns)
-            print(f"Esfera {i+1} creada")
+        # Crear todas las esferas por lotes
+        with trazas.tramo("Crear coches", "coches", num_coches=num_esferas):
+            flota.crea_flota(num_esferas, velocidad, nturns,
+                             generar_coches=scene.generar_coches,
+                             ruta_obj=ruta_modelo(),
+                             calcula_trayectorias=scene.calcular_trayectorias,
+                             modo_rutas=scene.modo_rutas)
 
         self.report({'INFO'}, f"{num_esferas} esferas creadas exitosamente")
         return {'FINISHED'}
 
 
+class OBJECT_OT_SimularTrafico(bpy.types.Operator):
+    """
+    Operador para simular el tráfico entre las esferas de la escena.
+
+    Propósito:
+    ----------
+    Aplica el modelo del conductor inteligente a todas las esferas y coches de la escena
+    (`flota.aplica_trafico`): los que comparten calle y sentido guardan la distancia entre sí,
+    y su movimiento pasa a controlarse con la `distancia_deseada` simulada.
+
+    Atributos:
+    ----------
+    - `bl_idname` : str
+        En este caso: "object.simular_trafico".
+    - `bl_label` : str
+        En este caso: "Simular Tráfico".
+    """
+    bl_idname = "object.simular_trafico"
+    bl_label = "Simular Tráfico"
+
+    def execute(self, context):
+        coches = [obj for obj in context.scene.objects
+                  if obj.name.startswith(("Car", "Sphere"))]
+
+        simulados = flota.aplica_trafico(coches, context.scene.velocidad_esfera)
+
+        self.report({'INFO'}, f"Tráfico simulado para {simulados} esferas")
+        return {'FINISHED'}
+
+
+class OBJECT_OT_ExportarTrayectorias(bpy.types.Operator):
+    """
+    Operador para exportar las trayectorias de los coches a arrays binarios.
+
+    Propósito:
+    ----------
+    Escribe la posición y el cuaternión de cada esfera y coche de la escena en todo el rango de
+    frames (`flota.exporta_trayectorias`) en `<archivo>_trayectorias.json` y sus `.npy`, al lado
+    del .blend, para leerlos fuera de Blender con `formato_trayectorias.carga_trayectorias`.
+
+    Atributos:
+    ----------
+    - `bl_idname` : str
+        En este caso: "object.exportar_trayectorias".
+    - `bl_label` : str
+        En este caso: "Exportar Trayectorias".
+    """
+    bl_idname = "object.exportar_trayectorias"
+    bl_label = "Exportar Trayectorias"
+
+    def execute(self, context):
+        if not bpy.data.filepath:
+            self.report({'ERROR'}, "Guarda el .blend antes de exportar las trayectorias")
+            return {'CANCELLED'}
+
+        coches = [obj for obj in context.scene.objects
+                  if obj.name.startswith(("Car", "Sphere"))]
+        if not coches:
+            self.report({'ERROR'}, "No hay coches que exportar")
+            return {'CANCELLED'}
+
+        ruta_base = os.path.splitext(bpy.data.filepath)[0] + "_trayectorias"
+        ruta = flota.exporta_trayectorias(
+            coches, ruta_base, context.scene.frame_start, context.scene.frame_end)
+
+        self.report({'INFO'}, f"Trayectorias de {len(coches)} coches exportadas en {ruta}")
+        return {'FINISHED'}
+
+
 class OBJECT_OT_Borrar_Esferas(bpy.types.Operator):
     """
     Operador para borrar todas las esferas de la escena.
@@ -681,7 +477,7 @@ class OBJECT_OT_Borrar_Esferas(bpy.types.Operator):
     def execute(self, context):
         # Recorrer todos los objetos de la escena y eliminar las esferas
         for obj in bpy.context.scene.objects:
-            if obj.name.startswith("Car"):
+            if obj.name.startswith(("Car", "Sphere")):
                 bpy.data.objects.remove(obj, do_unlink=True)
 
         self.report({'INFO'}, "Todas las esferas han sido borradas")
@@ -744,14 +540,23 @@ class OBJECT_PT_VelocidadEsferaPanel(bpy.types.Panel):
         layout.label(text="Configuración de la Ciudad")
         layout.prop(scene, "numero_calles_x_y", text="Número de Calles")
         layout.prop(scene, "amplitud_calle", text="Amplitud de calle")
+        layout.prop(scene, "usar_arquetipos")
+        if scene.usar_arquetipos:
+            layout.prop(scene, "num_arquetipos")
         layout.operator("object.aplicar_configuracion_ciudad",
                         text="Aplicar Configuración de Ciudad")
+        fila = layout.row(align=True)
+        fila.operator("object.guardar_ciudad", text="Guardar Ciudad")
+        fila.operator("object.cargar_ciudad", text="Cargar Ciudad")
 
         # Control de las esferas existente
         layout.label(text="Controlador de las Esferas")
         layout.prop(scene, "velocidad_esfera", text="Velocidad")
         layout.prop(scene, "num_esferas", text="Número de Esferas")
-        layout.prop(scene, "nturns", text="Número de Giros")
+        layout.prop(scene, "modo_rutas")
+        if scene.modo_rutas == 'ALEATORIA':
+            layout.prop(scene, "nturns", text="Número de Giros")
+        layout.prop(scene, "calcular_trayectorias")
         layout.prop(scene, "apply_random_oscillation",
                     text="Oscilación Aleatoria")
 
@@ -759,6 +564,8 @@ class OBJECT_PT_VelocidadEsferaPanel(bpy.types.Panel):
             layout.prop(scene, "oscillation_axes", text="Ejes")
             layout.prop(scene, "oscillation_amplitude", text="Amplitud")
             layout.prop(scene, "oscillation_frequency", text="Frecuencia")
+            if obj:
+                layout.prop(obj, "semilla_oscilacion", text="Semilla del objeto")
 
         layout.label(text="Opciones de Generación")
         layout.prop(scene, "generar_coches", text="Generar Coches")
@@ -767,10 +574,52 @@ class OBJECT_PT_VelocidadEsferaPanel(bpy.types.Panel):
 
         layout.operator("object.borrar_esferas", text="Borrar todos los objetos")
         layout.operator("object.crear_mov_esfera", text="Crear coches")
+        layout.operator("object.simular_trafico", text="Simular tráfico")
+        layout.operator("object.exportar_trayectorias", text="Exportar trayectorias")
+
+        fila = layout.row(align=True)
+        fila.prop(scene, "trazar_generacion")
+        fila.operator("object.guardar_traza", text="Guardar traza")
 
 # Operador para aplicar la configuración de la ciudad
 
 
+class OBJECT_OT_GuardarTraza(bpy.types.Operator):
+    """
+    Operador para guardar la traza de la generación.
+
+    Propósito:
+    ----------
+    Escribe los tramos registrados desde que se activó `trazar_generacion` (`trazas.exporta`) en
+    `<archivo>_traza.json`, al lado del .blend (o en el directorio temporal de Blender si el archivo
+    no se ha guardado), en el formato Trace Event que abren chrome://tracing y Perfetto.
+
+    Atributos:
+    ----------
+    - `bl_idname` : str
+        En este caso: "object.guardar_traza".
+    - `bl_label` : str
+        En este caso: "Guardar Traza".
+    """
+    bl_idname = "object.guardar_traza"
+    bl_label = "Guardar Traza"
+
+    def execute(self, context):
+        if not trazas.num_eventos():
+            self.report({'ERROR'}, "No hay tramos registrados: activa «Trazar generación» antes de generar")
+            return {'CANCELLED'}
+
+        if bpy.data.filepath:
+            ruta = os.path.splitext(bpy.data.filepath)[0] + "_traza.json"
+        else:
+            ruta = os.path.join(bpy.app.tempdir, "traza.json")
+
+        num_tramos = trazas.exporta(ruta)
+
+        self.report({'INFO'}, f"{num_tramos} tramos guardados en {ruta}")
+        return {'FINISHED'}
+
+
 class OBJECT_OT_AplicarConfiguracionCiudad(bpy.types.Operator):
     """
     Operador para aplicar la configuración de la ciudad.
@@ -812,6 +661,77 @@ class OBJECT_OT_AplicarConfiguracionCiudad(bpy.types.Operator):
         return {'FINISHED'}
 
 
+class OBJECT_OT_GuardarCiudad(bpy.types.Operator):
+    """
+    Operador para guardar la distribución de la ciudad junto al .blend.
+
+    Propósito:
+    ----------
+    Escribe la distribución de la última ciudad generada (`generar_ciudad.guarda_ciudad`) en
+    `<archivo>_ciudad.npz`, al lado del .blend, para poder reconstruirla sin volver a generarla.
+
+    Atributos:
+    ----------
+    - `bl_idname` : str
+        En este caso: "object.guardar_ciudad".
+    - `bl_label` : str
+        En este caso: "Guardar Ciudad".
+    """
+    bl_idname = "object.guardar_ciudad"
+    bl_label = "Guardar Ciudad"
+
+    def execute(self, context):
+        ruta = generar_ciudad.ruta_distribucion()
+        if ruta is None:
+            self.report({'ERROR'}, "Guarda el .blend antes de guardar la ciudad")
+            return {'CANCELLED'}
+
+        try:
+            generar_ciudad.guarda_ciudad(ruta)
+        except ValueError as error:
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"Ciudad guardada en {ruta}")
+        return {'FINISHED'}
+
+
+class OBJECT_OT_CargarCiudad(bpy.types.Operator):
+    """
+    Operador para reconstruir la ciudad guardada junto al .blend.
+
+    Propósito:
+    ----------
+    Sustituye la ciudad de la escena por la de `<archivo>_ciudad.npz` (`generar_ciudad.carga_ciudad`)
+    sin repetir la generación aleatoria, y actualiza las propiedades de la escena con sus parámetros.
+
+    Atributos:
+    ----------
+    - `bl_idname` : str
+        En este caso: "object.cargar_ciudad".
+    - `bl_label` : str
+        En este caso: "Cargar Ciudad".
+    """
+    bl_idname = "object.cargar_ciudad"
+    bl_label = "Cargar Ciudad"
+
+    def execute(self, context):
+        ruta = generar_ciudad.ruta_distribucion()
+        if ruta is None or not os.path.exists(ruta):
+            self.report({'ERROR'}, "No hay ninguna ciudad guardada junto al .blend")
+            return {'CANCELLED'}
+
+        distribucion = generar_ciudad.carga_ciudad(ruta)
+
+        scene = context.scene
+        scene.numero_calles_x_y = distribucion.numero_calles_x
+        scene.amplitud_calle = distribucion.tam_calle
+        scene.usar_arquetipos = distribucion.num_arquetipos > 0
+
+        self.report({'INFO'}, f"Ciudad cargada de {ruta}")
+        return {'FINISHED'}
+
+
 class OBJECT_OT_Quaternion(bpy.types.Operator):
     """
     Operador para calcular y asignar un quaternion de rotación a un objeto.
@@ -879,11 +799,22 @@ def register():
     bpy.utils.register_class(OBJECT_PT_VelocidadEsferaPanel)
     bpy.utils.register_class(OBJECT_OT_Crear_Mov_Esfera)
     bpy.utils.register_class(OBJECT_OT_Borrar_Esferas)
+    bpy.utils.register_class(OBJECT_OT_SimularTrafico)
+    bpy.utils.register_class(OBJECT_OT_ExportarTrayectorias)
+    bpy.utils.register_class(OBJECT_OT_GuardarTraza)
     bpy.utils.register_class(OBJECT_OT_AplicarConfiguracionCiudad)
+    bpy.utils.register_class(OBJECT_OT_GuardarCiudad)
+    bpy.utils.register_class(OBJECT_OT_CargarCiudad)
     bpy.utils.register_class(OBJECT_OT_Quaternion)
 
     # Registra el módulo posicion
     posicion.register()
+    modelos.register()
+    # Después de posicion, que publica las funciones de driver que se perfilan
+    perfilado.register()
+
+    if _sincroniza_trazado not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(_sincroniza_trazado)
 
 
 def unregister():
@@ -896,6 +827,14 @@ def unregister():
         bpy.utils.unregister_class(OBJECT_OT_AplicarConfiguracionCiudad)
     except RuntimeError:
         pass
+    try:
+        bpy.utils.unregister_class(OBJECT_OT_GuardarCiudad)
+    except RuntimeError:
+        pass
+    try:
+        bpy.utils.unregister_class(OBJECT_OT_CargarCiudad)
+    except RuntimeError:
+        pass
     try:
         bpy.utils.unregister_class(OBJECT_OT_Crear_Mov_Esfera)
     except RuntimeError:
@@ -905,15 +844,33 @@ def unregister():
         bpy.utils.unregister_class(OBJECT_OT_Borrar_Esferas)
     except RuntimeError:
         pass
+    try:
+        bpy.utils.unregister_class(OBJECT_OT_SimularTrafico)
+    except RuntimeError:
+        pass
+    try:
+        bpy.utils.unregister_class(OBJECT_OT_ExportarTrayectorias)
+    except RuntimeError:
+        pass
+    try:
+        bpy.utils.unregister_class(OBJECT_OT_GuardarTraza)
+    except RuntimeError:
+        pass
     try:
         bpy.utils.unregister_class(OBJECT_OT_Quaternion)
     except RuntimeError:
         pass
 
+    if _sincroniza_trazado in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_sincroniza_trazado)
+
+    # Antes de posicion, para devolver las funciones originales al driver_namespace
+    perfilado.unregister()
     try:
         posicion.unregister()
     except RuntimeError:
         pass
+    modelos.unregister()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,312 @@
+import random
+
+import numpy as np
+
+
+"""
+distribucion_ciudad.py
+
+
+Distribución de la ciudad como datos.
+
+La generación aleatoria de la ciudad (qué cubos forman cada bloque, su escala,
+su desplazamiento y la altura de cada bloque) se guarda en un registro de
+arrays, `DistribucionCiudad`, separado de su construcción en Blender. El
+registro se puede guardar en un `.npz` junto al .blend y volver a cargar para
+reconstruir exactamente la misma ciudad sin repetir la generación aleatoria, o
+leerse desde otras herramientas sin abrir Blender.
+
+El módulo no depende de Blender.
+
+
+Autores: Grupo 5.
+"""
+
+
+# Vértices de un cubo unidad centrado en el origen y sus caras (normales hacia fuera)
+VERTICES_CUBO = np.array([
+    (-0.5, -0.5, -0.5), (-0.5, -0.5, 0.5), (-0.5, 0.5, -0.5), (-0.5, 0.5, 0.5),
+    (0.5, -0.5, -0.5), (0.5, -0.5, 0.5), (0.5, 0.5, -0.5), (0.5, 0.5, 0.5),
+])
+
+CARAS_CUBO = np.array([
+    (0, 1, 3, 2), (2, 3, 7, 6), (6, 7, 5, 4),
+    (4, 5, 1, 0), (2, 6, 4, 0), (7, 3, 1, 5),
+])
+
+# Versión del formato .npz (2: `altura_arquetipos`)
+VERSION = 2
+
+# Altura `sz` con la que se generan los arquetipos: el centro del rango de
+# alturas de los bloques, para que la escala en Z de cada bloque quede entre 0.5 y 1.5
+ALTURA_ARQUETIPOS = 10.0
+
+
+def genera_bloque(n_cube, sx, sy, sz, min_scale=0.8, max_scale=1.5, building_height=10):
+    """
+    Genera la composición aleatoria de cubos de un bloque de edificios.
+
+    Sigue las mismas reglas (y el mismo orden de llamadas a `random`) que la
+    construcción original con operadores: cada cubo tiene una escala aleatoria,
+    un desplazamiento aleatorio dentro del bloque y después se escala por
+    (sx, sy, sz) y se eleva sz / 2.
+
+    Parámetros:
+    ----------
+    n_cube : int
+        Número de cubos del bloque.
+    sx, sy, sz : float
+        Escala del bloque en cada eje.
+    min_scale, max_scale : float
+        Rango de la escala aleatoria de cada cubo.
+    building_height : float
+        Altura máxima del desplazamiento vertical de los cubos.
+
+    Retorno:
+    -------
+    tuple[numpy.ndarray, numpy.ndarray]
+        Centros (n_cube, 3) de los cubos respecto al centro del bloque y
+        dimensiones (n_cube, 3) de cada cubo.
+    """
+    centros = np.empty((n_cube, 3))
+    dimensiones = np.empty((n_cube, 3))
+
+    for edif in range(n_cube):
+        scale_x = random.uniform(min_scale, max_scale)
+        scale_y = random.uniform(min_scale, max_scale)
+        scale_z = random.uniform(min_scale, max_scale)
+
+        shift_x = random.uniform(-scale_x/2, scale_x/2)
+        shift_y = random.uniform(-scale_y/2, scale_y/2)
+        shift_z = random.uniform(0.0, building_height - scale_z/2)
+
+        centros[edif] = (shift_x, shift_y, shift_z + sz/2)
+        dimensiones[edif] = (scale_x * sx, scale_y * sy, scale_z * sz)
+
+    return centros, dimensiones
+
+
+def malla_cajas(centros, dimensiones):
+    """
+    Calcula los vértices y caras de un conjunto de cajas alineadas con los ejes.
+
+    Parámetros:
+    ----------
+    centros : numpy.ndarray
+        Centro de cada caja, forma (n, 3).
+    dimensiones : numpy.ndarray
+        Tamaño de cada caja en cada eje, forma (n, 3).
+
+    Retorno:
+    -------
+    tuple[numpy.ndarray, numpy.ndarray]
+        Vértices (8n, 3) y caras (6n, 4) de todas las cajas.
+    """
+    centros = np.asarray(centros, dtype=float)
+    dimensiones = np.asarray(dimensiones, dtype=float)
+
+    vertices = centros[:, None, :] + VERTICES_CUBO[None, :, :] * dimensiones[:, None, :]
+    caras = CARAS_CUBO[None, :, :] + 8 * np.arange(len(centros))[:, None, None]
+
+    return vertices.reshape(-1, 3), caras.reshape(-1, 4)
+
+
+class DistribucionCiudad:
+    '''
+    Registro de la distribución de una ciudad.
+
+    Atributos:
+    ----------
+    posiciones : numpy.ndarray
+        Centro (x, y) de cada bloque, forma (B, 2).
+    alturas : numpy.ndarray
+        Escala en altura `sz` de cada bloque, forma (B,).
+    centros, dimensiones : numpy.ndarray
+        Centro y tamaño de cada cubo de cada bloque respecto al centro del bloque,
+        forma (B, n, 3). Vacíos (B, 0, 3) en el modo de arquetipos.
+    arquetipo, giro : numpy.ndarray
+        Arquetipo (-1 si no usa ninguno) y giro en cuartos de vuelta de cada
+        bloque, forma (B,).
+    centros_arquetipos, dimensiones_arquetipos : numpy.ndarray
+        Cubos de cada arquetipo, forma (K, n, 3).
+    altura_arquetipos : float
+        Altura `sz` con la que se generaron los arquetipos. Un bloque de altura
+        `sz` coloca su arquetipo con escala `sz / altura_arquetipos` en Z.
+    tam_edif, tam_calle : float
+        Tamaño de las manzanas y de las calles.
+    numero_calles_x, numero_calles_y : int
+        Número de bloques por eje.
+    '''
+
+    def __init__(self, posiciones, alturas, centros, dimensiones,
+                 arquetipo=None, giro=None,
+                 centros_arquetipos=None, dimensiones_arquetipos=None,
+                 altura_arquetipos=1.0, tam_edif=4.0, tam_calle=2.0, numero_calles_x=7, numero_calles_y=7):
+        self.posiciones = np.asarray(posiciones, dtype=float).reshape(-1, 2)
+        self.alturas = np.asarray(alturas, dtype=float)
+
+        n = len(self.alturas)
+        self.centros = np.asarray(centros, dtype=float)
+        self.dimensiones = np.asarray(dimensiones, dtype=float)
+
+        self.arquetipo = (np.full(n, -1, dtype=np.int64) if arquetipo is None
+                          else np.asarray(arquetipo, dtype=np.int64))
+        self.giro = (np.zeros(n, dtype=np.int64) if giro is None
+                     else np.asarray(giro, dtype=np.int64))
+
+        vacio = np.empty((0, 0, 3))
+        self.centros_arquetipos = (vacio if centros_arquetipos is None
+                                   else np.asarray(centros_arquetipos, dtype=float))
+        self.dimensiones_arquetipos = (vacio if dimensiones_arquetipos is None
+                                       else np.asarray(dimensiones_arquetipos, dtype=float))
+        # Los archivos de la versión 1 generaban los arquetipos con altura 1
+        self.altura_arquetipos = float(altura_arquetipos)
+
+        self.tam_edif = float(tam_edif)
+        self.tam_calle = float(tam_calle)
+        self.numero_calles_x = int(numero_calles_x)
+        self.numero_calles_y = int(numero_calles_y)
+
+        if not (len(self.posiciones) == n == len(self.centros) == len(self.dimensiones)
+                == len(self.arquetipo) == len(self.giro)):
+            raise ValueError("Todos los arrays por bloque deben tener un elemento por bloque.")
+
+    def __len__(self):
+        return len(self.alturas)
+
+    @property
+    def num_arquetipos(self):
+        return len(self.centros_arquetipos)
+
+    @property
+    def centro_ciudad(self):
+        '''Centro (x, y) de la cuadrícula, donde se coloca la base.'''
+        celda = self.tam_edif + self.tam_calle
+        return (self.numero_calles_x * celda / 2, self.numero_calles_y * celda / 2)
+
+    def malla_bloque(self, b):
+        '''Vértices y caras del bloque `b` (que no use arquetipo), en coordenadas locales.'''
+        return malla_cajas(self.centros[b], self.dimensiones[b])
+
+    def escala_arquetipo(self, b):
+        '''Escala en Z con la que se coloca el arquetipo del bloque `b`.'''
+        return float(self.alturas[b]) / self.altura_arquetipos
+
+    def malla_arquetipo(self, a):
+        '''Vértices y caras del arquetipo `a`, generado con altura `altura_arquetipos`.'''
+        return malla_cajas(self.centros_arquetipos[a], self.dimensiones_arquetipos[a])
+
+    def como_dict(self):
+        '''Arrays del registro, con los nombres que se usan en el .npz.'''
+        return {
+            "version": np.array(VERSION),
+            "posiciones": self.posiciones,
+            "alturas": self.alturas,
+            "centros": self.centros,
+            "dimensiones": self.dimensiones,
+            "arquetipo": self.arquetipo,
+            "giro": self.giro,
+            "centros_arquetipos": self.centros_arquetipos,
+            "dimensiones_arquetipos": self.dimensiones_arquetipos,
+            "altura_arquetipos": np.array(self.altura_arquetipos),
+            "tam_edif": np.array(self.tam_edif),
+            "tam_calle": np.array(self.tam_calle),
+            "numero_calles_x": np.array(self.numero_calles_x),
+            "numero_calles_y": np.array(self.numero_calles_y),
+        }
+
+    def guarda(self, ruta):
+        '''Guarda el registro en un .npz comprimido.'''
+        with open(ruta, "wb") as f:
+            np.savez_compressed(f, **self.como_dict())
+
+    @classmethod
+    def carga(cls, ruta):
+        '''
+        Lee un registro guardado con `guarda`.
+
+        Lanza ValueError si el archivo es de una versión más reciente.
+        '''
+        with np.load(ruta) as datos:
+            campos = {clave: datos[clave] for clave in datos.files}
+
+        version = int(campos.pop("version", 0))
+        if version > VERSION:
+            raise ValueError(f"Distribución de ciudad de una versión no soportada: {version}")
+
+        for clave in ("altura_arquetipos", "tam_edif", "tam_calle",
+                      "numero_calles_x", "numero_calles_y"):
+            if clave in campos:
+                campos[clave] = campos[clave].item()
+
+        return cls(**campos)
+
+
+def genera_distribucion(numero_calles_x, numero_calles_y, tam_edif, tam_calle,
+                        n_cubes, sx=1, sy=1, min_scale=0.8, max_scale=1.5,
+                        building_height=10, num_arquetipos=0):
+    """
+    Genera al azar la distribución de una ciudad.
+
+    Parámetros:
+    ----------
+    numero_calles_x, numero_calles_y : int
+        Número de bloques por eje.
+    tam_edif, tam_calle : float
+        Tamaño de las manzanas y de las calles.
+    n_cubes : int
+        Cubos por bloque.
+    sx, sy, min_scale, max_scale, building_height :
+        Como en `genera_bloque`.
+    num_arquetipos : int
+        Si es mayor que 0, se generan ese número de bloques de altura
+        `ALTURA_ARQUETIPOS` y cada bloque usa uno al azar con un giro de 90
+        grados al azar.
+
+    Descripción:
+    ------------
+    Un arquetipo colocado con escala `sz / ALTURA_ARQUETIPOS` en Z tiene la
+    altura de los cubos y la elevación `sz / 2` de un bloque de altura `sz`; el
+    desplazamiento vertical aleatorio de los cubos también se escala, pero solo
+    por un factor entre 0.5 y 1.5.
+
+    Retorno:
+    -------
+    DistribucionCiudad
+    """
+    n_bloques = numero_calles_x * numero_calles_y
+
+    centros_arquetipos = np.empty((num_arquetipos, n_cubes, 3))
+    dimensiones_arquetipos = np.empty((num_arquetipos, n_cubes, 3))
+    for a in range(num_arquetipos):
+        centros_arquetipos[a], dimensiones_arquetipos[a] = genera_bloque(
+            n_cubes, sx, sy, ALTURA_ARQUETIPOS, min_scale, max_scale, building_height)
+
+    cubos = 0 if num_arquetipos else n_cubes
+    posiciones = np.empty((n_bloques, 2))
+    alturas = np.empty(n_bloques)
+    centros = np.empty((n_bloques, cubos, 3))
+    dimensiones = np.empty((n_bloques, cubos, 3))
+    arquetipo = np.full(n_bloques, -1, dtype=np.int64)
+    giro = np.zeros(n_bloques, dtype=np.int64)
+
+    b = 0
+    for i in range(numero_calles_x):
+        for j in range(numero_calles_y):
+            posiciones[b] = (i*(tam_edif + tam_calle) + (tam_edif/2),
+                             j*(tam_edif + tam_calle) + (tam_edif/2))
+
+            sz = random.uniform(5, 15)
+            alturas[b] = sz
+
+            if num_arquetipos:
+                arquetipo[b] = random.randrange(num_arquetipos)
+                giro[b] = random.randint(0, 3)
+            else:
+                centros[b], dimensiones[b] = genera_bloque(
+                    n_cubes, sx, sy, sz, min_scale, max_scale, building_height)
+            b += 1
+
+    return DistribucionCiudad(posiciones, alturas, centros, dimensiones,
+                              arquetipo, giro, centros_arquetipos, dimensiones_arquetipos,
+                              ALTURA_ARQUETIPOS if num_arquetipos else 1.0, tam_edif, tam_calle, numero_calles_x, numero_calles_y)
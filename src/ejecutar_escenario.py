@@ -0,0 +1,286 @@
+"""
+ejecutar_escenario.py
+
+
+Generación de una ciudad y su flota sin interfaz gráfica.
+
+Uso:
+
+    blender -b --python-exit-code 1 -P src/ejecutar_escenario.py -- escenario.json
+        [--salida ciudad.blend] [--informe tiempos.json] [--traza traza.json]
+
+El escenario es un archivo JSON con cualquiera de estas claves (el resto toma
+los valores por defecto de `ESCENARIO_POR_DEFECTO`):
+
+    {
+        "calles": 7,                  número de calles en X e Y
+        "amplitud_calle": 2.0,        ancho de las calles
+        "arquetipos": 0,              mallas compartidas por los bloques (0: una por bloque)
+        "ciudad": null,               .npz de una ciudad guardada (null: generarla)
+        "coches": 10,                 número de coches
+        "giros": 3,                   giros de cada ruta (nturns)
+        "rutas": "ALEATORIA",         ALEATORIA u ORIGEN_DESTINO (camino más corto)
+        "velocidad": 1.0,             calles por segundo
+        "generar_coches": false,      modelo .obj en lugar de esferas
+        "interpolacion": "LINEAL",    LINEAL, CATMULL-ROM o HERMITE
+        "tension": 0.5,               tensión de Catmull-Rom
+        "oscilacion": {               por defecto null (sin oscilación)
+            "ejes": ["Z"],
+            "amplitud": 1.0,
+            "frecuencia": 0.1
+        },
+        "semilla": 0,                 semilla de `random` (null: aleatoria)
+        "bake": false,                convertir las trayectorias en keyframes
+        "trayectorias": null,         ruta base para exportar las trayectorias (.json + .npy)
+        "salida": null                .blend que se guarda al terminar (null: no se guarda)
+    }
+
+Al terminar se imprime el tiempo de cada etapa (registro, ciudad, coches, bake,
+exportación y guardado). Con `--informe` también se escribe en JSON.
+
+Con `--traza` se registran los tramos de `trazas` (las etapas anteriores y,
+dentro de ellas, las fases de la ciudad y de la flota y el trabajo de cada
+coche) y se escriben en formato Trace Event de Chrome, para abrirlos en
+chrome://tracing o en Perfetto.
+
+
+Autores: Grupo 5.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sys
+import time
+
+from contextlib import contextmanager
+
+import bpy
+
+
+DIRECTORIO_ADDON = os.path.dirname(os.path.abspath(__file__))
+
+# Los módulos del complemento se importan entre sí por su nombre (`posicion`,
+# `generar_ciudad`...), así que la carpeta se añade a `sys.path`
+if DIRECTORIO_ADDON not in sys.path:
+    sys.path.insert(0, DIRECTORIO_ADDON)
+
+import trazas
+
+ESCENARIO_POR_DEFECTO = {
+    "calles": 7,
+    "amplitud_calle": 2.0,
+    "arquetipos": 0,
+    "ciudad": None,
+    "coches": 10,
+    "giros": 3,
+    "rutas": "ALEATORIA",
+    "velocidad": 1.0,
+    "generar_coches": False,
+    "interpolacion": "LINEAL",
+    "tension": 0.5,
+    "oscilacion": None,
+    "semilla": 0,
+    "bake": False,
+    "trayectorias": None,
+    "salida": None,
+}
+
+INTERPOLACIONES = ('LINEAL', 'CATMULL-ROM', 'HERMITE')
+MODOS_RUTAS = ('ALEATORIA', 'ORIGEN_DESTINO')
+
+
+class Cronometro:
+    """
+    Acumula la duración de cada etapa de la ejecución.
+
+    Atributos:
+    ----------
+    etapas : list[tuple[str, float]]
+        Nombre y duración en segundos de cada etapa, en orden.
+    """
+
+    def __init__(self):
+        self.etapas = []
+
+    @contextmanager
+    def etapa(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            with trazas.tramo(nombre, "escenario"):
+                yield
+        finally:
+            self.etapas.append((nombre, time.perf_counter() - inicio))
+
+    def informe(self):
+        total = sum(duracion for _, duracion in self.etapas)
+        lineas = ["Etapa                Tiempo (s)", "-" * 31]
+        lineas += [f"{nombre:<20} {duracion:>10.3f}" for nombre, duracion in self.etapas]
+        lineas += ["-" * 31, f"{'total':<20} {total:>10.3f}"]
+        return "\n".join(lineas)
+
+    def como_dict(self):
+        return {
+            "etapas": [{"nombre": nombre, "segundos": duracion}
+                       for nombre, duracion in self.etapas],
+            "total": sum(duracion for _, duracion in self.etapas),
+        }
+
+
+def argumentos_script(argv):
+    """Devuelve los argumentos posteriores a `--` (los de Blender se ignoran)."""
+    return argv[argv.index("--") + 1:] if "--" in argv else []
+
+
+def lee_escenario(ruta):
+    """
+    Lee un escenario JSON y lo completa con los valores por defecto.
+
+    Lanza ValueError si hay claves desconocidas o valores fuera de rango.
+    """
+    with open(ruta, encoding="utf-8") as f:
+        datos = json.load(f)
+
+    desconocidas = set(datos) - set(ESCENARIO_POR_DEFECTO)
+    if desconocidas:
+        raise ValueError(f"Claves desconocidas en el escenario: {sorted(desconocidas)}")
+
+    escenario = dict(ESCENARIO_POR_DEFECTO, **datos)
+
+    if escenario["interpolacion"] not in INTERPOLACIONES:
+        raise ValueError(f"Interpolación desconocida: {escenario['interpolacion']}")
+    if escenario["rutas"] not in MODOS_RUTAS:
+        raise ValueError(f"Modo de rutas desconocido: {escenario['rutas']}")
+    if escenario["arquetipos"] < 0:
+        raise ValueError("El número de arquetipos no puede ser negativo.")
+    if escenario["coches"] < 0:
+        raise ValueError("El número de coches no puede ser negativo.")
+
+    return escenario
+
+
+def carga_addon():
+    """
+    Importa el complemento desde su carpeta (ya en `sys.path`) y lo registra.
+    """
+    spec = importlib.util.spec_from_file_location(
+        "skyward_metropolis", os.path.join(DIRECTORIO_ADDON, "__init__.py"))
+    addon = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(addon)
+    addon.register()
+
+    return addon
+
+
+def configura_escena(scene, escenario):
+    """Copia los parámetros del escenario a las propiedades de la escena."""
+    scene.numero_calles_x_y = escenario["calles"]
+    scene.amplitud_calle = escenario["amplitud_calle"]
+    scene.usar_arquetipos = escenario["arquetipos"] > 0
+    if escenario["arquetipos"]:
+        scene.num_arquetipos = escenario["arquetipos"]
+    scene.nturns = escenario["giros"]
+    scene.modo_rutas = escenario["rutas"]
+    scene.velocidad_esfera = escenario["velocidad"]
+    scene.generar_coches = escenario["generar_coches"]
+    scene.selected_shape = escenario["interpolacion"]
+    scene.tension = escenario["tension"]
+
+    oscilacion = escenario["oscilacion"]
+    scene.apply_random_oscillation = bool(oscilacion)
+    if oscilacion:
+        scene.oscillation_axes = set(oscilacion.get("ejes", ["Z"]))
+        scene.oscillation_amplitude = oscilacion.get("amplitud", 1.0)
+        scene.oscillation_frequency = oscilacion.get("frecuencia", 0.1)
+    else:
+        scene.oscillation_axes = set()
+
+
+def ejecuta(escenario, ruta_informe=None, ruta_traza=None):
+    """
+    Construye la ciudad y la flota de un escenario e imprime el informe de tiempos.
+
+    Con `ruta_traza` también guarda ahí la traza de la ejecución (`trazas.exporta`).
+
+    Retorno:
+    --------
+    Cronometro
+        Los tiempos de cada etapa.
+    """
+    cronometro = Cronometro()
+
+    if ruta_traza:
+        trazas.reinicia()
+        trazas.activa()
+
+    if escenario["semilla"] is not None:
+        random.seed(escenario["semilla"])
+
+    with cronometro.etapa("registro"):
+        addon = carga_addon()
+        scene = bpy.context.scene
+        configura_escena(scene, escenario)
+
+    with cronometro.etapa("ciudad"):
+        if escenario["ciudad"]:
+            addon.generar_ciudad.carga_ciudad(os.path.abspath(escenario["ciudad"]))
+        else:
+            addon.aplicar_configuracion_ciudad()
+
+    with cronometro.etapa("coches"):
+        coches = addon.flota.crea_flota(
+            escenario["coches"], scene.velocidad_esfera, scene.nturns,
+            generar_coches=scene.generar_coches, ruta_obj=addon.ruta_modelo(),
+            modo_rutas=scene.modo_rutas)
+
+    if escenario["bake"]:
+        with cronometro.etapa("bake"):
+            for obj in coches:
+                addon.posicion.bake_trayectoria(
+                    obj, scene.frame_start, scene.frame_end, scene.subframes_bake)
+
+    if escenario["trayectorias"]:
+        with cronometro.etapa("exportacion"):
+            addon.flota.exporta_trayectorias(
+                coches, os.path.abspath(escenario["trayectorias"]),
+                scene.frame_start, scene.frame_end)
+
+    if escenario["salida"]:
+        with cronometro.etapa("guardado"):
+            bpy.ops.wm.save_as_mainfile(filepath=os.path.abspath(escenario["salida"]))
+
+    print(cronometro.informe())
+
+    if ruta_informe:
+        with open(ruta_informe, "w", encoding="utf-8") as f:
+            json.dump(cronometro.como_dict(), f, indent=2)
+
+    if ruta_traza:
+        trazas.desactiva()
+        num_tramos = trazas.exporta(ruta_traza)
+        print(f"Traza con {num_tramos} tramos guardada en {ruta_traza}")
+
+    return cronometro
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="blender -b -P ejecutar_escenario.py --",
+        description="Genera una ciudad y su flota a partir de un escenario JSON.")
+    parser.add_argument("escenario", help="archivo JSON con el escenario")
+    parser.add_argument("--salida", help=".blend en el que guardar el resultado")
+    parser.add_argument("--informe", help="archivo JSON para el informe de tiempos")
+    parser.add_argument("--traza", help="archivo JSON para la traza de la ejecución (Trace Event de Chrome)")
+    args = parser.parse_args(argumentos_script(sys.argv if argv is None else argv))
+
+    escenario = lee_escenario(args.escenario)
+    if args.salida:
+        escenario["salida"] = args.salida
+
+    ejecuta(escenario, args.informe, args.traza)
+
+
+if __name__ == "__main__":
+    main()
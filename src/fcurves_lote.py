@@ -0,0 +1,154 @@
+import bpy
+
+
+"""
+fcurves_lote.py
+
+
+Escritura de fCurves por lotes.
+
+Insertar keyframes de uno en uno con `keyframe_insert` (y mover el frame de la
+escena con `frame_set` antes de cada uno) paga una búsqueda RNA y una
+actualización del depsgraph por keyframe. Estas funciones crean o vacían la
+fCurve destino y rellenan todas sus coordenadas con una sola llamada a
+`foreach_set`.
+
+
+Autores: Grupo 5.
+"""
+
+
+# Valores internos de los enums de keyframe, tal y como los espera `foreach_set`
+INTERPOLACION = {
+    'CONSTANT': 0,
+    'LINEAR': 1,
+    'BEZIER': 2,
+}
+
+TIPO_ASA = {
+    'FREE': 0,
+    'AUTO': 1,
+    'VECTOR': 2,
+    'ALIGNED': 3,
+    'AUTO_CLAMPED': 4,
+}
+
+
+def accion_objeto(obj):
+    """
+    Devuelve la acción activa del objeto, creándola si no existe.
+
+    Parámetros:
+    ----------
+    obj : bpy.types.Object
+        El objeto animado.
+
+    Retorno:
+    -------
+    bpy.types.Action
+    """
+    if obj.animation_data is None:
+        obj.animation_data_create()
+
+    if obj.animation_data.action is None:
+        obj.animation_data.action = bpy.data.actions.new(name=f"{obj.name}Action")
+
+    return obj.animation_data.action
+
+
+def escribe_fcurve(obj, data_path, frames, valores, index=0, grupo="",
+                   interpolacion='BEZIER', tipo_asa='AUTO_CLAMPED'):
+    """
+    Sustituye la fCurve `data_path[index]` del objeto por los keyframes dados.
+
+    Parámetros:
+    ----------
+    obj : bpy.types.Object
+        El objeto animado.
+    data_path : str
+        Ruta de la propiedad animada (por ejemplo 'location').
+    frames : sequence[float]
+        Frame de cada keyframe.
+    valores : sequence[float]
+        Valor de cada keyframe.
+    index : int
+        Índice dentro de la propiedad (0 para X, 1 para Y...).
+    grupo : str
+        Grupo de la acción en el que se crea la fCurve.
+    interpolacion : str
+        'CONSTANT', 'LINEAR' o 'BEZIER', para todos los keyframes.
+    tipo_asa : str
+        Tipo de asa de los keyframes ('AUTO_CLAMPED' como `keyframe_insert`).
+
+    Retorno:
+    -------
+    bpy.types.FCurve
+        La fCurve escrita.
+
+    Notas:
+    ------
+    - `foreach_set` no pasa por el depsgraph: quien llame debe invalidar las
+      cachés que dependan de la acción (por ejemplo `posicion.invalida_indice`).
+    """
+    if len(frames) != len(valores):
+        raise ValueError("Se necesita un valor por frame.")
+
+    accion = accion_objeto(obj)
+    fcurves = accion.fcurves
+
+    fc = fcurves.find(data_path, index=index)
+    if fc is not None:
+        fcurves.remove(fc)
+    fc = fcurves.new(data_path, index=index, action_group=grupo)
+
+    n = len(frames)
+    keyframes = fc.keyframe_points
+    keyframes.add(n)
+
+    co = [0.0] * (2 * n)
+    co[0::2] = frames
+    co[1::2] = valores
+    keyframes.foreach_set('co', co)
+
+    keyframes.foreach_set('interpolation', [INTERPOLACION[interpolacion]] * n)
+    keyframes.foreach_set('handle_left_type', [TIPO_ASA[tipo_asa]] * n)
+    keyframes.foreach_set('handle_right_type', [TIPO_ASA[tipo_asa]] * n)
+
+    # Ordena los keyframes y recalcula las asas automáticas
+    fc.update()
+    accion.update_tag()
+
+    return fc
+
+
+def escribe_fcurves_vector(obj, data_path, frames, vectores, grupo="",
+                           interpolacion='BEZIER', tipo_asa='AUTO_CLAMPED'):
+    """
+    Escribe una fCurve por componente de una propiedad vectorial.
+
+    Parámetros:
+    ----------
+    obj : bpy.types.Object
+        El objeto animado.
+    data_path : str
+        Ruta de la propiedad animada (por ejemplo 'location').
+    frames : sequence[float]
+        Frame de cada keyframe.
+    vectores : sequence[sequence[float]]
+        Valor de la propiedad en cada frame (una fila por frame).
+    grupo, interpolacion, tipo_asa :
+        Como en `escribe_fcurve`.
+
+    Retorno:
+    -------
+    list[bpy.types.FCurve]
+        Las fCurves escritas, una por componente.
+    """
+    if not vectores:
+        return []
+
+    componentes = list(zip(*vectores))
+
+    return [escribe_fcurve(obj, data_path, frames, valores, index=k, grupo=grupo,
+                           interpolacion=interpolacion, tipo_asa=tipo_asa)
+            for k, valores in enumerate(componentes)]
@@ -0,0 +1,623 @@
+import os
+import random
+
+import bpy
+import mathutils
+import numpy as np
+
+import fcurves_lote
+import formato_trayectorias
+import generar_ciudad
+import grafo_calles
+import indice_espacial
+import modelos
+import posicion
+import trafico
+import trazas
+
+
+"""
+flota.py
+
+
+Creación de flotas de coches por lotes.
+
+`CrearEsferas` prepara un coche completo de cada vez: malla, keyframes,
+drivers y una llamada anidada a `create_trayectoria` que además recalcula las
+trayectorias de movimiento. `crea_flota` hace el mismo trabajo por fases para
+todos los coches a la vez (rutas, objetos, keyframes, drivers y longitudes) sin
+llamar a operadores por coche, y actualiza la escena una sola vez al final.
+
+`genera_ruta` elige rutas al azar como `crea_ruta` o, en modo origen/destino,
+el camino más corto entre dos cruces (`grafo_calles`).
+
+`aplica_trafico` simula el tráfico de una flota ya creada (`trafico.simula`) y
+convierte el resultado en la `distancia_deseada` de cada coche, e
+`indice_espacial_frame` indexa las posiciones de la flota en un frame para
+consultar qué coches hay cerca de un punto o de otro coche.
+
+`exporta_trayectorias` escribe la posición y la orientación de cada coche en un
+rango de frames en arrays float32 que se pueden abrir proyectados en memoria
+(`formato_trayectorias`).
+
+
+Autores: Grupo 5.
+"""
+
+
+def crea_ruta(nturns: int, N: int):
+    """
+    Genera una ruta aleatoria en una cuadrícula NxN con un número especificado de giros (nturns).
+
+    Parámetros:
+    -----------
+    nturns : int
+        Número de giros o cambios de dirección en la ruta.
+    N : int
+        Tamaño de la cuadrícula, donde las calles están numeradas de 0 a N.
+
+    Descripción:
+    ------------
+    - La función crea una ruta inicializando en (0, 0) y eligiendo de manera aleatoria las calles 
+    horizontales (filas) o verticales (columnas) para moverse, asegurándose de no repetir la última 
+    posición en el siguiente turno.
+    - Alterna entre filas y columnas en cada giro, asegurando diversidad en la trayectoria.
+    - Finalmente, la ruta se fuerza para terminar en la última calle de la cuadrícula, ya sea 
+    horizontal (i = N) o vertical (j = N).
+
+    Retorno:
+    --------
+    list
+        Una lista de posiciones `[i, j]` que representan la ruta en la cuadrícula.
+"""
+
+    # Listado de calles a elegir
+    calles = set(range(N+1))
+
+    i = 0
+    j = 0
+    posns = []
+
+    # Elegimos al azar si la primera posición es en fila o columna
+    fila = random.choice([True, False])
+    for turn in range(nturns + 1):
+        if fila:
+            fila = False
+            # Elección aleatoria de la siguiente calle
+            i = random.choice(list(calles - {i}))
+        else:
+            fila = True
+            # Elección aleatoria de la siguiente calle
+            j = random.choice(list(calles - {j}))
+        posns.append([i, j])
+
+    # Forzamos que acabe en la última calle
+    if fila:
+        i = N
+    else:
+        j = N
+
+    posns.append([i, j])
+
+    return posns
+
+
+# Grafo de calles de la cuadrícula actual (se reconstruye si cambia su tamaño)
+_grafo = None
+
+
+def grafo_ciudad():
+    """
+    Grafo de calles de la ciudad actual, con su caché de rutas.
+
+    Cada tramo entre cruces mide una celda de la cuadrícula (`tam_calle + tam_edif`),
+    así que el coste de las rutas y la penalización por giro están en unidades de
+    la escena. El grafo se reconstruye si cambia el número de calles o su tamaño.
+    """
+    global _grafo
+
+    N = generar_ciudad.numero_calles_x
+    celda = float(generar_ciudad.tam_calle + generar_ciudad.tam_edif)
+    if _grafo is None or _grafo.N != N or _grafo.longitud != celda:
+        _grafo = grafo_calles.GrafoCalles(N, longitud=celda)
+
+    return _grafo
+
+
+def posicion_calle(calle):
+    """Coordenada del centro de la calle `calle` (en X o en Y) en la ciudad actual."""
+    return -2 + (calle * generar_ciudad.tam_calle) + \
+        (calle * generar_ciudad.tam_edif) + (generar_ciudad.tam_calle / 2)
+
+
+def genera_viaje():
+    """
+    Elige dos cruces distintos al azar y devuelve el camino más corto entre ellos.
+
+    Descripción:
+    ------------
+    - La ruta la calcula el grafo compartido de la ciudad (`grafo_ciudad`), con
+    A* y caché por par origen/destino, y se reduce a sus esquinas.
+
+    Retorno:
+    --------
+    tuple
+        Igual que `genera_ruta`: posición inicial `(x, y, z)`, altura de vuelo y
+        lista de posiciones `[i, j]` de la ruta.
+    """
+    grafo = grafo_ciudad()
+    cruces = [(i, j) for i in range(grafo.N + 1) for j in range(grafo.N + 1)]
+
+    origen, destino = random.sample(cruces, 2)
+    # La cuadrícula es conexa: siempre hay ruta entre dos cruces
+    posiciones = grafo.ruta_esquinas(origen, destino)
+
+    altura = random.uniform(5, 15)
+    inicio = (posicion_calle(origen[0]), posicion_calle(origen[1]), altura)
+
+    return inicio, altura, posiciones
+
+
+def genera_ruta(nturns, modo='ALEATORIA'):
+    """
+    Elige al azar la calle de salida, la altura de vuelo y la ruta de un coche.
+
+    Parámetros:
+    -----------
+    nturns : int
+        Número de giros de la ruta (solo en modo 'ALEATORIA').
+    modo : str
+        'ALEATORIA' para una ruta de `crea_ruta` u 'ORIGEN_DESTINO' para el camino
+        más corto entre dos cruces al azar.
+
+    Descripción:
+    ------------
+    - En modo 'ORIGEN_DESTINO' se eligen dos cruces distintos y la ruta es la que
+    devuelve el grafo de calles (A*, con caché por par), reducida a sus esquinas.
+    - En modo 'ALEATORIA' la dirección de la ruta se elige aleatoriamente, pudiendo ser Norte-Sur (N-S),
+    Este-Oeste (E-O), Oeste-Este (O-E) o Sur-Norte (S-N), y con ella la calle de
+    salida.
+    - Las llamadas a `random` siguen siempre el mismo orden, de modo que una
+    semilla da las mismas rutas con `CrearEsferas` y con `crea_flota`.
+
+    Retorno:
+    --------
+    tuple
+        Posición inicial `(x, y, z)`, altura de vuelo y lista de posiciones `[i, j]`
+        de la ruta (ver `crea_ruta`).
+    """
+    if modo == 'ORIGEN_DESTINO':
+        return genera_viaje()
+
+    direccion = random.randint(0, 3)  # harexmos 0 N-S y 1 E-O
+
+    # N-S y S-N
+    if direccion in (0, 3):
+        calle_x = random.randint(0, generar_ciudad.numero_calles_x)
+
+        # Calcular la posición de la esfera entre dos valores consecutivos de X
+        pos_esfera_x = posicion_calle(calle_x)
+
+        altura = random.uniform(5, 15)
+        inicio = (pos_esfera_x, 0, altura)
+
+    # E-O y O-E
+    else:
+        calle_y = random.randint(0, generar_ciudad.numero_calles_y)
+
+        # Calcular la posición de la esfera entre dos valores consecutivos de Y
+        pos_esfera_y = posicion_calle(calle_y)
+
+        altura = random.uniform(5, 15)
+        inicio = (0, pos_esfera_y, altura)
+
+    posiciones = crea_ruta(nturns, generar_ciudad.numero_calles_x)
+
+    return inicio, altura, posiciones
+
+
+def inserta_keyframes_ruta(objeto, posiciones, tiempo_por_calle, altura, proporcional=False):
+    """
+    Inserta los fotogramas clave de posición de una ruta en un objeto.
+
+    Parámetros:
+    ---------
+    - objeto (bpy.types.Object): Objeto que recorrerá la ruta.
+    - posiciones (list): Posiciones `[i, j]` de la ruta en la cuadrícula, tal y como
+      las devuelve `crea_ruta`.
+    - tiempo_por_calle (float): Frames que se tarda en recorrer una calle.
+    - altura (float): Altura de vuelo del objeto.
+    - proporcional (bool): Repartir el tiempo según la longitud de cada tramo.
+
+    Descripción:
+    ------------
+    - Cada posición de la ruta se convierte en un keyframe de `location` en el
+      frame `1 + index * tiempo_por_calle`, o con `proporcional` en el frame
+      `1 + calles_recorridas * tiempo_por_calle` (velocidad constante).
+    - Los keyframes se escriben en bloque con `fcurves_lote`, sin mover el frame
+      de la escena ni insertar keyframes uno a uno.
+
+    Retorno:
+    --------
+    Ninguno.
+    """
+    celda = generar_ciudad.tam_calle + generar_ciudad.tam_edif
+
+    frames = []
+    ubicaciones = []
+    recorrido = 0
+    for index, pos in enumerate(posiciones):
+        # Calcular el frame para cada punto en la ruta
+        if proporcional:
+            if index > 0:
+                recorrido += abs(pos[0] - posiciones[index - 1][0]) + \
+                    abs(pos[1] - posiciones[index - 1][1])
+            frames.append(1 + int(recorrido * tiempo_por_calle))
+        else:
+            frames.append(1 + int(index * tiempo_por_calle))
+        # Configurar la posición del objeto en el punto actual
+        ubicaciones.append((pos[0] * celda - generar_ciudad.tam_calle/2,
+                            pos[1] * celda - generar_ciudad.tam_calle/2,
+                            altura))
+
+    objeto.location = ubicaciones[0]
+    fcurves_lote.escribe_fcurves_vector(
+        objeto, "location", frames, ubicaciones, grupo="Object Transforms")
+    posicion.invalida_indice(objeto)
+
+
+def malla_vehiculo(generar_coches, ruta_obj=None):
+    """
+    Devuelve la malla compartida que usarán los coches de una flota.
+
+    Parámetros:
+    -----------
+    generar_coches : bool
+        Usar el modelo .obj en lugar de una esfera.
+    ruta_obj : str
+        Ruta al modelo .obj.
+
+    Retorno:
+    --------
+    tuple
+        Malla, rotación inicial de los objetos (o None) y nombre base de los
+        objetos ("Car" o "Sphere").
+    """
+    if generar_coches:
+        if ruta_obj and os.path.exists(ruta_obj) and ruta_obj.endswith(".obj"):
+            malla, rotacion = modelos.malla_modelo(ruta_obj, generar_ciudad.tam_calle * 3)
+            return malla, rotacion, "Car"
+
+        print("No se encontró un modelo .obj válido. Generando esferas por defecto.")
+
+    return modelos.malla_esfera(generar_ciudad.tam_calle * 0.75, 2), None, "Sphere"
+
+
+def crea_flota(num_coches, velocidad, nturns, generar_coches=False, ruta_obj=None,
+               bake=False, calcula_trayectorias=False, modo_rutas='ALEATORIA'):
+    """
+    Crea `num_coches` coches con sus rutas, keyframes y drivers por lotes.
+
+    Parámetros:
+    -----------
+    num_coches : int
+        Número de coches.
+    velocidad : float
+        Calles por segundo.
+    nturns : int
+        Número de giros de cada ruta.
+    generar_coches : bool
+        Usar el modelo .obj en lugar de esferas.
+    ruta_obj : str
+        Ruta al modelo .obj.
+    bake : bool
+        Bakear las trayectorias (`posicion.bake_trayectoria`) en lugar de dejar
+        los drivers.
+    calcula_trayectorias : bool
+        Calcular las trayectorias de movimiento (`paths_calculate`) de los coches,
+        en una sola llamada para toda la flota.
+    modo_rutas : str
+        'ALEATORIA' u 'ORIGEN_DESTINO' (ver `genera_ruta`). Los viajes de origen a
+        destino se recorren a velocidad constante.
+
+    Descripción:
+    ------------
+    1. Genera todas las rutas.
+    2. Crea todos los objetos enlazando una única malla compartida.
+    3. Escribe los keyframes de cada ruta con `fcurves_lote`.
+    4. Asigna los drivers de posición y rotación (o bakea) y calcula la
+    longitud recorrida cuando no hay control de velocidad.
+    5. Actualiza la escena una sola vez.
+
+    Retorno:
+    --------
+    list[bpy.types.Object]
+        Los coches creados.
+    """
+    scene = bpy.context.scene
+    coleccion = bpy.context.collection
+
+    # Calcular el tiempo en frames para recorrer una calle
+    tiempo_por_calle = scene.render.fps / velocidad
+
+    # 1. Rutas
+    with trazas.tramo("rutas", "flota", modo=modo_rutas):
+        rutas = [genera_ruta(nturns, modo_rutas) for _ in range(num_coches)]
+
+    # 2. Objetos
+    with trazas.tramo("objetos", "flota"):
+        malla, rotacion, nombre = malla_vehiculo(generar_coches, ruta_obj)
+
+        coches = []
+        for inicio, _, _ in rutas:
+            coche = bpy.data.objects.new(nombre, malla)
+            coche.location = inicio
+            if rotacion is not None:
+                coche.rotation_euler = rotacion
+            coleccion.objects.link(coche)
+            coches.append(coche)
+
+    # Desde aquí el trabajo de cada coche se dibuja en su propia fila de la traza
+
+    # 3. Keyframes
+    with trazas.tramo("keyframes", "flota"):
+        for coche, (_, altura, posiciones) in zip(coches, rutas):
+            with trazas.tramo("keyframes", "coches", pista=coche.name):
+                inserta_keyframes_ruta(coche, posiciones, tiempo_por_calle, altura,
+                                       proporcional=(modo_rutas == 'ORIGEN_DESTINO'))
+
+    # 4. Drivers (o bake) y longitudes
+    with trazas.tramo("drivers", "flota", bake=bake):
+        for coche in coches:
+            with trazas.tramo("drivers", "coches", pista=coche.name):
+                if not coche.control_vel:
+                    posicion.longitud_recorrida(coche)
+
+                coche.rotation_mode = 'QUATERNION'
+
+                posicion.asigna_driver_posicion(coche)
+                posicion.asigna_drivers_rotacion(coche)
+
+                if bake:
+                    posicion.bake_trayectoria(coche, scene.frame_start, scene.frame_end,
+                                              scene.subframes_bake)
+
+    # 5. Una única actualización de la escena
+    with trazas.tramo("view_layer.update", "flota"):
+        bpy.context.view_layer.update()
+
+    if calcula_trayectorias and coches:
+        for obj in bpy.context.selected_objects:
+            obj.select_set(False)
+        for coche in coches:
+            coche.select_set(True)
+        bpy.context.view_layer.objects.active = coches[-1]
+        with trazas.tramo("paths_calculate", "flota", num_coches=len(coches)):
+            bpy.ops.object.paths_calculate(display_type='RANGE', range='SCENE')
+
+    return coches
+
+
+def ruta_desde_keyframes(obj):
+    """
+    Reconstruye la ruta en la cuadrícula (puntos `[i, j]`) a partir de los
+    keyframes de posición del objeto, o None si no tiene una ruta válida.
+    """
+    indice = posicion.indice_keyframes(obj)
+    if indice is None or indice.fcurves[0] is None or indice.fcurves[1] is None:
+        return None
+
+    xs = indice.valores[0]
+    ys = indice.valores[1]
+    if len(xs) < 2 or len(xs) != len(ys):
+        return None
+
+    celda = generar_ciudad.tam_calle + generar_ciudad.tam_edif
+    return (np.column_stack((xs, ys)) + generar_ciudad.tam_calle/2) / celda
+
+
+def aplica_trafico(coches, velocidad):
+    """
+    Simula el tráfico de los coches y sincroniza su movimiento con el resultado.
+
+    Parámetros:
+    -----------
+    coches : list[bpy.types.Object]
+        Coches con keyframes de ruta (los bakeados se ignoran).
+    velocidad : float
+        Velocidad deseada en calles por segundo.
+
+    Descripción:
+    ------------
+    - Los coches de un mismo carril guardan la distancia y aceleran o frenan según
+    el modelo del conductor inteligente (`trafico.simula`), en todo el rango de
+    frames de la escena.
+    - La distancia simulada se mide sobre la polilínea de la ruta y se escala a la
+    longitud de la curva interpolada, antes de escribirse como fCurve de
+    `distancia_deseada`. El coche pasa a usar el control de velocidad.
+
+    Retorno:
+    --------
+    int
+        Número de coches simulados.
+    """
+    scene = bpy.context.scene
+    celda = generar_ciudad.tam_calle + generar_ciudad.tam_edif
+
+    simulados = []
+    rutas = []
+    for coche in coches:
+        if coche.accion_ruta is not None:
+            print(f"{coche.name} está bakeado: se omite en la simulación de tráfico.")
+            continue
+        ruta = ruta_desde_keyframes(coche)
+        if ruta is not None:
+            simulados.append(coche)
+            rutas.append(ruta)
+
+    if not simulados:
+        return 0
+
+    frames = list(range(scene.frame_start, scene.frame_end + 1))
+
+    # Velocidad en celdas por frame y dimensiones de los coches en celdas
+    v0 = velocidad / scene.render.fps
+    largo = 2 * generar_ciudad.tam_calle * 0.75 / celda
+    recorrido = trafico.simula(rutas, len(frames), v0, largo=largo,
+                               s0=generar_ciudad.tam_calle / 4 / celda,
+                               T=scene.render.fps)
+    totales = trafico.prepara_rutas(rutas)[2]
+
+    for k, coche in enumerate(simulados):
+        # `change_frame` invierte la distancia con la tabla de `distancia_recorrida`
+        if posicion.indice_keyframes(coche).fcurve_distancia_recorrida is None:
+            posicion.longitud_recorrida(coche)
+
+        motor = posicion.indice_keyframes(coche).longitud_arco(
+            scene.selected_shape, scene.tension, scene.tolerancia_longitud)
+        escala = motor.total / totales[k] if totales[k] > 0 else 0.0
+
+        fcurves_lote.escribe_fcurve(coche, "distancia_deseada", frames,
+                                    (recorrido[:, k] * escala).tolist(),
+                                    interpolacion='LINEAR')
+        coche.control_vel = True
+        posicion.invalida_indice(coche)
+
+    bpy.context.view_layer.update()
+
+    return len(simulados)
+
+
+def esta_bakeado(coche):
+    """Indica si la trayectoria del coche está bakeada en fCurves."""
+    return (coche.accion_ruta is not None and coche.animation_data is not None
+            and coche.animation_data.action is not None)
+
+
+def evalua_fcurves(coche, data_path, valor, frames):
+    """
+    Evalúa las fCurves de `data_path` en varios frames.
+
+    Las componentes sin fCurve toman el valor actual `valor`.
+
+    Retorno:
+    --------
+    numpy.ndarray
+        Valores (len(frames), len(valor)).
+    """
+    fcurves = coche.animation_data.action.fcurves
+    resultado = np.empty((len(frames), len(valor)))
+
+    for coord in range(len(valor)):
+        fc = fcurves.find(data_path, index=coord)
+        if fc is None:
+            resultado[:, coord] = valor[coord]
+        else:
+            resultado[:, coord] = [fc.evaluate(frm) for frm in frames]
+
+    return resultado
+
+
+def posiciones_flota(coches, frm):
+    """
+    Posiciones (n, 3) de los coches en el frame `frm`.
+
+    Los coches con drivers se evalúan con las mismas funciones que los drivers
+    (`posicion.evalua_posicion`, con caché) y los bakeados directamente con sus
+    fCurves de `location`, sin mover el frame de la escena.
+    """
+    posiciones = np.empty((len(coches), 3))
+
+    for k, coche in enumerate(coches):
+        if esta_bakeado(coche):
+            posiciones[k] = evalua_fcurves(coche, 'location', coche.location, (frm,))[0]
+        else:
+            posiciones[k] = posicion.evalua_posicion(coche, frm)
+
+    return posiciones
+
+
+def indice_espacial_frame(coches, frm):
+    """
+    Construye el hash espacial de la flota en el frame `frm`.
+
+    Las celdas son las manzanas de la ciudad (`tam_edif + tam_calle`), centradas
+    en los cruces de calles. El índice `k` de cada punto es el de `coches[k]`.
+
+    Retorno:
+    --------
+    indice_espacial.HashEspacial
+    """
+    celda = generar_ciudad.tam_calle + generar_ciudad.tam_edif
+    origen = -generar_ciudad.tam_calle/2 - celda/2
+
+    return indice_espacial.HashEspacial(posiciones_flota(coches, frm), celda, (origen, origen))
+
+
+def _cuaternion_fijo(coche):
+    """Orientación (w, x, y, z) de un coche sin rotación animada."""
+    if coche.rotation_mode == 'QUATERNION':
+        return tuple(coche.rotation_quaternion)
+    if coche.rotation_mode == 'AXIS_ANGLE':
+        angulo, *eje = coche.rotation_axis_angle
+        return tuple(mathutils.Quaternion(eje, angulo))
+    return tuple(coche.rotation_euler.to_quaternion())
+
+
+def exporta_trayectorias(coches, ruta_base, frame_start, frame_end):
+    """
+    Exporta la trayectoria de cada coche en arrays binarios proyectables en memoria.
+
+    Parámetros:
+    ----------
+    coches : list[bpy.types.Object]
+        Coches que se exportan, en el orden de la primera dimensión.
+    ruta_base : str
+        Ruta sin extensión de los archivos (ver `formato_trayectorias`).
+    frame_start, frame_end : int
+        Rango de frames (ambos incluidos).
+
+    Retorno:
+    -------
+    str
+        Ruta de la cabecera JSON.
+
+    Descripción:
+    ------------
+    Los coches con drivers se evalúan con las funciones de los drivers
+    (`get_posicion_xyz` y `calcula_quaternion`) sin pasar por la caché por
+    frame, que una exportación larga solo vaciaría, y los bakeados con sus
+    fCurves. Los arrays se escriben coche a coche en los archivos proyectados,
+    así que la memoria usada no depende del número de coches. El signo de los
+    cuaterniones se mantiene continuo entre frames como en el bake.
+    """
+    escena = bpy.context.scene
+    fps = escena.render.fps / escena.render.fps_base
+    frames = range(frame_start, frame_end + 1)
+
+    posiciones, cuaterniones = formato_trayectorias.crea_exportacion(
+        ruta_base, [coche.name for coche in coches], fps, frame_start, frame_end)
+
+    for k, coche in enumerate(coches):
+        if esta_bakeado(coche):
+            posiciones[k] = evalua_fcurves(coche, 'location', coche.location, frames)
+            if coche.rotacion_bakeada:
+                q = evalua_fcurves(coche, 'rotation_quaternion', coche.rotation_quaternion, frames)
+            else:
+                q = np.tile(_cuaternion_fijo(coche), (len(frames), 1))
+        else:
+            posiciones[k] = [posicion.get_posicion_xyz(frm, coche) for frm in frames]
+            if posicion.tiene_drivers_rotacion(coche):
+                q = np.array([tuple(posicion.calcula_quaternion(frm, coche)) for frm in frames])
+            else:
+                q = np.tile(_cuaternion_fijo(coche), (len(frames), 1))
+
+        # Invertir los cuaterniones que quedan en el hemisferio opuesto al anterior
+        signos = np.ones(len(q))
+        signos[1:] = np.where(np.einsum('ij,ij->i', q[1:], q[:-1]) < 0, -1.0, 1.0)
+        cuaterniones[k] = q * np.cumprod(signos)[:, None]
+
+    posiciones.flush()
+    cuaterniones.flush()
+
+    return formato_trayectorias.rutas_exportacion(ruta_base)[0]
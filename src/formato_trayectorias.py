@@ -0,0 +1,125 @@
+import json
+import os
+
+import numpy as np
+
+
+"""
+formato_trayectorias.py
+
+
+Formato binario de las trayectorias exportadas de una flota.
+
+Una exportación con ruta base `flota` consta de tres archivos:
+
+    flota.json                 cabecera (nombres de los coches, fps, rango de frames)
+    flota_posiciones.npy       float32 (coches, frames, 3): x, y, z
+    flota_cuaterniones.npy     float32 (coches, frames, 4): w, x, y, z
+
+Los arrays son `.npy` normales con el coche como primera dimensión, así que se
+pueden abrir con `np.load(..., mmap_mode='r')` (o `carga_trayectorias`) y leer
+solo los coches o frames que se necesiten, sin cargar el archivo entero.
+
+El módulo no depende de Blender.
+
+
+Autores: Grupo 5.
+"""
+
+
+VERSION = 1
+
+
+def rutas_exportacion(ruta_base):
+    """Rutas de la cabecera y de los arrays de posiciones y cuaterniones."""
+    ruta_base = os.path.splitext(ruta_base)[0] if ruta_base.endswith(".json") else ruta_base
+    return (ruta_base + ".json",
+            ruta_base + "_posiciones.npy",
+            ruta_base + "_cuaterniones.npy")
+
+
+def crea_exportacion(ruta_base, nombres, fps, frame_inicial, frame_final):
+    """
+    Crea los archivos de una exportación y devuelve sus arrays para rellenarlos.
+
+    Parámetros:
+    ----------
+    ruta_base : str
+        Ruta sin extensión de los archivos.
+    nombres : list[str]
+        Nombre de cada coche, en el orden de la primera dimensión.
+    fps : float
+        Frames por segundo de la escena.
+    frame_inicial, frame_final : int
+        Rango de frames exportado (ambos incluidos).
+
+    Retorno:
+    -------
+    tuple[numpy.memmap, numpy.memmap]
+        Posiciones (coches, frames, 3) y cuaterniones (coches, frames, 4),
+        proyectados en disco. Hay que llamar a `flush` al terminar.
+    """
+    ruta_cabecera, ruta_posiciones, ruta_cuaterniones = rutas_exportacion(ruta_base)
+    num_frames = frame_final - frame_inicial + 1
+
+    if num_frames < 1:
+        raise ValueError("El rango de frames está vacío.")
+
+    cabecera = {
+        "version": VERSION,
+        "coches": list(nombres),
+        "fps": fps,
+        "frame_inicial": frame_inicial,
+        "frame_final": frame_final,
+        "num_frames": num_frames,
+        "dtype": "float32",
+        "posiciones": os.path.basename(ruta_posiciones),
+        "cuaterniones": os.path.basename(ruta_cuaterniones),
+        "componentes_posicion": ["x", "y", "z"],
+        "componentes_cuaternion": ["w", "x", "y", "z"],
+    }
+
+    with open(ruta_cabecera, "w", encoding="utf-8") as f:
+        json.dump(cabecera, f, indent=2)
+
+    posiciones = np.lib.format.open_memmap(
+        ruta_posiciones, mode="w+", dtype=np.float32, shape=(len(nombres), num_frames, 3))
+    cuaterniones = np.lib.format.open_memmap(
+        ruta_cuaterniones, mode="w+", dtype=np.float32, shape=(len(nombres), num_frames, 4))
+
+    return posiciones, cuaterniones
+
+
+def carga_trayectorias(ruta_base, mmap_mode="r"):
+    """
+    Abre una exportación.
+
+    Parámetros:
+    ----------
+    ruta_base : str
+        Ruta sin extensión (o la ruta del .json).
+    mmap_mode : str | None
+        Modo de `np.load`; None carga los arrays en memoria.
+
+    Retorno:
+    -------
+    tuple[dict, numpy.ndarray, numpy.ndarray]
+        Cabecera, posiciones (coches, frames, 3) y cuaterniones (coches, frames, 4).
+    """
+    ruta_cabecera = rutas_exportacion(ruta_base)[0]
+
+    with open(ruta_cabecera, encoding="utf-8") as f:
+        cabecera = json.load(f)
+
+    if cabecera.get("version", 0) > VERSION:
+        raise ValueError(f"Exportación de una versión no soportada: {cabecera['version']}")
+
+    directorio = os.path.dirname(ruta_cabecera)
+    posiciones = np.load(os.path.join(directorio, cabecera["posiciones"]), mmap_mode=mmap_mode)
+    cuaterniones = np.load(os.path.join(directorio, cabecera["cuaterniones"]), mmap_mode=mmap_mode)
+
+    forma = (len(cabecera["coches"]), cabecera["num_frames"])
+    if posiciones.shape != forma + (3,) or cuaterniones.shape != forma + (4,):
+        raise ValueError("Los arrays no coinciden con la cabecera.")
+
+    return cabecera, posiciones, cuaterniones
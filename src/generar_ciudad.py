@@ -1,6 +1,13 @@
 import bpy
+import os
 import random  
 import mathutils
+import numpy as np
+
+import distribucion_ciudad
+import trazas
+
+from distribucion_ciudad import malla_cajas
 
 bpy.types.Scene.amplitud_calle = bpy.props.FloatProperty(
     name="Amplitud de la calle",
@@ -18,114 +25,128 @@ bpy.types.Scene.numero_calles_x_y = bpy.props.IntProperty(
     max=20
 )
 
+bpy.types.Scene.usar_arquetipos = bpy.props.BoolProperty(
+    name="Usar arquetipos",
+    description="Los bloques comparten un conjunto fijo de mallas en lugar de tener cada uno la suya",
+    default=False
+)
+
+bpy.types.Scene.num_arquetipos = bpy.props.IntProperty(
+    name="Arquetipos",
+    description="Número de mallas de edificio distintas en el modo de arquetipos",
+    default=8,
+    min=1,
+    max=64
+)
+
 
-def CrearEdificio(altura, pos_x, pos_y, n_cube, sx, sy, sz):
-
-    cubes = []
-
-    for edif in range(n_cube):
-        scale_x = random.uniform(min_scale, max_scale)
-        scale_y = random.uniform(min_scale, max_scale)
-        scale_z = random.uniform(min_scale, max_scale)
-        
-        shift_x = random.uniform(-scale_x/2, scale_x/2)
-        shift_y = random.uniform(-scale_y/2, scale_y/2)
-        shift_z = random.uniform(0.0, building_height - scale_z/2)
-
-        
-        bpy.ops.mesh.primitive_cube_add(
-            size=1,
-            enter_editmode=False,
-            align='WORLD',
-            location=(shift_x, shift_y, shift_z),
-            scale=(scale_x, scale_y, scale_z)
-        )
-               
-        cubes.append(bpy.context.active_object)
-        bpy.ops.transform.translate(value=(pos_x, pos_y, 0),
-                                    orient_type='GLOBAL', 
-                                    orient_matrix=((1, 0, 0), (0, 1, 0), (0, 0, 1)),
-                                    orient_matrix_type='GLOBAL',
-                                    constraint_axis=(True, False, False),
-                                    mirror=False,
-                                    use_proportional_edit=False,
-                                    proportional_edit_falloff='SMOOTH',
-                                    proportional_size=1, use_proportional_connected=False,
-                                    use_proportional_projected=False,
-                                    snap=False, snap_elements={'INCREMENT'},
-                                    use_snap_project=False,
-                                    snap_target='CLOSEST',
-                                    use_snap_self=True,
-                                    use_snap_edit=True,
-                                    use_snap_nonedit=True,
-                                    use_snap_selectable=False)
-                                    
-        bpy.ops.transform.resize(value=(sx, sy, 1),
-                                 orient_type='GLOBAL',
-                                 orient_matrix=((1, 0, 0), (0, 1, 0),
-                                 (0, 0, 1)),
-                                 orient_matrix_type='GLOBAL',
-                                 mirror=False,
-                                 use_proportional_edit=False,
-                                 proportional_edit_falloff='SMOOTH',
-                                 proportional_size=1,
-                                 use_proportional_connected=False,
-                                 use_proportional_projected=False,
-                                 snap=False,
-                                 snap_elements={'INCREMENT'},
-                                 use_snap_project=False,
-                                 snap_target='CLOSEST', 
-                                 use_snap_self=True, 
-                                 use_snap_edit=True, 
-                                 use_snap_nonedit=True, 
-                                 use_snap_selectable=False)
-                                 
-        bpy.ops.transform.resize(value=(1, 1, sz), 
-                                 orient_type='GLOBAL', 
-                                 orient_matrix=((1, 0, 0), (0, 1, 0), (0, 0, 1)), 
-                                 orient_matrix_type='GLOBAL', 
-                                 constraint_axis=(False, False, True), 
-                                 mirror=False, 
-                                 use_proportional_edit=False,
-                                 proportional_edit_falloff='SMOOTH',
-                                 proportional_size=1,
-                                 use_proportional_connected=False, 
-                                 use_proportional_projected=False, 
-                                 snap=False, 
-                                 snap_elements={'INCREMENT'}, 
-                                 use_snap_project=False, 
-                                 snap_target='CLOSEST', 
-                                 use_snap_self=True, 
-                                 use_snap_edit=True, 
-                                 use_snap_nonedit=True, 
-                                 use_snap_selectable=False)
-                                 
-        bpy.ops.transform.translate(value=(0, 0, sz/2),
-                                   orient_type='GLOBAL', 
-                                   orient_matrix=((1, 0, 0), (0, 1, 0), (0, 0, 1)), 
-                                   orient_matrix_type='GLOBAL', 
-                                   constraint_axis=(False, False, True), 
-                                   mirror=False, 
-                                   use_proportional_edit=False, 
-                                   proportional_edit_falloff='SMOOTH', 
-                                   proportional_size=1, 
-                                   use_proportional_connected=False, 
-                                   use_proportional_projected=False, 
-                                   snap=False, 
-                                   snap_elements={'INCREMENT'}, 
-                                   use_snap_project=False, 
-                                   snap_target='CLOSEST', 
-                                   use_snap_self=True, 
-                                   use_snap_edit=True, 
-                                   use_snap_nonedit=True, 
-                                   use_snap_selectable=False)
-
-    bpy.ops.object.select_all(action='DESELECT')
-
-    for ob in cubes:
-        ob.select_set(True)
-
-    bpy.ops.object.join()
+def malla_desde_datos(nombre, vertices, caras):
+    """Crea una malla nueva a partir de vértices y caras."""
+    malla = bpy.data.meshes.new(nombre)
+    malla.from_pydata(vertices.tolist(), [], caras.tolist())
+    malla.update()
+
+    return malla
+
+
+def crea_objeto_malla(nombre, vertices, caras, location=(0, 0, 0)):
+    """
+    Crea un objeto con una malla nueva a partir de vértices y caras y lo enlaza
+    a la colección activa, sin pasar por operadores.
+    """
+    obj = bpy.data.objects.new(nombre, malla_desde_datos(nombre, vertices, caras))
+    obj.location = location
+    bpy.context.collection.objects.link(obj)
+
+    return obj
+
+
+def ColocarArquetipo(malla, pos_x, pos_y, escala_z, giro):
+    """
+    Coloca un bloque en (pos_x, pos_y) como un objeto que enlaza la malla de un
+    arquetipo, girado `giro` cuartos de vuelta y con escala `escala_z` en Z
+    (ver `DistribucionCiudad.escala_arquetipo`).
+    """
+    obj = bpy.data.objects.new("Edificio", malla)
+    obj.location = (pos_x, pos_y, 0)
+    obj.rotation_euler = (0, 0, giro * np.pi / 2)
+    obj.scale = (1, 1, escala_z)
+    bpy.context.collection.objects.link(obj)
+
+    return obj
+
+
+@trazas.traza(categoria="ciudad")
+def construye_ciudad(distribucion):
+    """
+    Construye en la escena los bloques y la base de una distribución de ciudad
+    (`distribucion_ciudad.DistribucionCiudad`), sin ninguna llamada a `random`.
+
+    En el modo de arquetipos se crea una malla por arquetipo ("Arquetipo_00",
+    "Arquetipo_01"...) y los bloques la comparten.
+    """
+    # Las mallas de arquetipos de una ciudad anterior ya no las usa nadie
+    for malla in list(bpy.data.meshes):
+        if malla.name.startswith("Arquetipo_") and malla.users == 0:
+            bpy.data.meshes.remove(malla)
+
+    mallas = []
+    with trazas.tramo("arquetipos", "ciudad", num_arquetipos=distribucion.num_arquetipos):
+        for a in range(distribucion.num_arquetipos):
+            vertices, caras = distribucion.malla_arquetipo(a)
+            mallas.append(malla_desde_datos("Arquetipo_%02d" % a, vertices, caras))
+
+    with trazas.tramo("bloques", "ciudad", num_bloques=len(distribucion)):
+        for b in range(len(distribucion)):
+            pos_x, pos_y = distribucion.posiciones[b].tolist()
+            arquetipo = int(distribucion.arquetipo[b])
+
+            if arquetipo >= 0:
+                ColocarArquetipo(mallas[arquetipo], pos_x, pos_y,
+                                 distribucion.escala_arquetipo(b), int(distribucion.giro[b]))
+            else:
+                vertices, caras = distribucion.malla_bloque(b)
+                crea_objeto_malla("Edificio", vertices, caras, location=(pos_x, pos_y, 0))
+
+    # Colocar un cubo en la posición central calculada (tamaño 60 x 60 x 8)
+    centro_x, centro_y = distribucion.centro_ciudad
+    vertices, caras = malla_cajas([(0, 0, 0)], [(60, 60, 8)])
+    crea_objeto_malla("Base", vertices, caras, location=(centro_x, centro_y, 0))
+
+
+def ruta_distribucion():
+    """Ruta del .npz de la ciudad junto al .blend (None si el .blend no se ha guardado)."""
+    if not bpy.data.filepath:
+        return None
+    return os.path.splitext(bpy.data.filepath)[0] + "_ciudad.npz"
+
+
+def guarda_ciudad(ruta):
+    """Guarda la distribución de la última ciudad generada o cargada."""
+    if ultima_distribucion is None:
+        raise ValueError("No hay ninguna ciudad generada que guardar.")
+    ultima_distribucion.guarda(ruta)
+
+
+def carga_ciudad(ruta):
+    """
+    Sustituye la ciudad por la guardada en `ruta`, sin repetir la generación
+    aleatoria. Los parámetros de la cuadrícula pasan a ser los del archivo.
+    """
+    global ultima_distribucion, tam_edif, tam_calle, numero_calles_x, numero_calles_y
+
+    distribucion = distribucion_ciudad.DistribucionCiudad.carga(ruta)
+
+    tam_edif = distribucion.tam_edif
+    tam_calle = distribucion.tam_calle
+    numero_calles_x = distribucion.numero_calles_x
+    numero_calles_y = distribucion.numero_calles_y
+
+    Borrar_Ciudad()
+    construye_ciudad(distribucion)
+    ultima_distribucion = distribucion
+
+    return distribucion
     
 
 building_height = 10
@@ -146,22 +167,23 @@ numero_calles_y = 7
 
 centro_ciudad_x_y = (numero_calles_x * (tam_calle + tam_edif))/2 
 
+# Modo de arquetipos: los bloques enlazan una de `num_arquetipos` mallas compartidas
+usar_arquetipos = False
+num_arquetipos = 8
+
+# Distribución de la última ciudad generada o cargada (para guardarla)
+ultima_distribucion = None
+
 def register():
-    for i in range(numero_calles_x):
-        for j in range(numero_calles_y):
-            pos_x = i*(tam_edif + tam_calle) + (tam_edif/2)
-            pos_y = j*(tam_edif + tam_calle) + (tam_edif/2)
-
-            sz = random.uniform(5, 15)
-            CrearEdificio(building_height, pos_x, pos_y, n_cubes, sx, sy, sz)
-
-    # Colocar un cubo en la posición central calculada
-    bpy.ops.mesh.primitive_cube_add(
-        enter_editmode=False, 
-        align='WORLD', 
-        location=(centro_ciudad_x_y, centro_ciudad_x_y, 0),  # Posición central
-        scale=(30, 30, 4)  # Tamaño del cubo en el centro
-    )      
+    global ultima_distribucion
+
+    with trazas.tramo("genera_distribucion", "ciudad"):
+        ultima_distribucion = distribucion_ciudad.genera_distribucion(
+            numero_calles_x, numero_calles_y, tam_edif, tam_calle, n_cubes, sx, sy,
+            min_scale, max_scale, building_height,
+            num_arquetipos if usar_arquetipos else 0)
+
+    construye_ciudad(ultima_distribucion)
 
 def Borrar_Ciudad():
     bpy.ops.object.select_all(action='SELECT')
@@ -171,4 +193,3 @@ def Borrar_Ciudad():
 if __name__ == "__main__":
     register()
     
-
@@ -0,0 +1,176 @@
+import heapq
+
+from collections import OrderedDict
+
+
+"""
+grafo_calles.py
+
+
+Grafo de calles de la ciudad y rutas más cortas con A*.
+
+Los cruces de la cuadrícula (i, j), con 0 <= i, j <= N, son los nodos y cada
+tramo de calle entre dos cruces vecinos es una arista de longitud `longitud`.
+Las rutas se buscan con A* (heurística de Manhattan) y se guardan en una caché
+LRU por par origen/destino, de modo que una flota con muchos viajes repetidos
+hace una búsqueda por par distinto.
+
+El módulo no depende de Blender.
+
+
+Autores: Grupo 5.
+"""
+
+
+# Direcciones de avance por la cuadrícula: +i, -i, +j, -j
+_DIRECCIONES = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+class GrafoCalles:
+    '''
+    Grafo de la cuadrícula de calles.
+
+    Atributos:
+    ----------
+    N : int
+        Índice de la última calle en cada eje (hay N + 1 calles por eje).
+    longitud : float
+        Longitud de cada tramo entre cruces.
+    penalizacion_giro : float
+        Coste añadido por cada giro; entre rutas igual de largas prefiere las que
+        giran menos.
+    aciertos, fallos : int
+        Consultas resueltas desde la caché de rutas y búsquedas realizadas.
+    '''
+
+    def __init__(self, N, longitud=1.0, penalizacion_giro=1e-3, capacidad=4096):
+        if N < 1:
+            raise ValueError("La cuadrícula necesita al menos dos calles por eje.")
+
+        self.N = N
+        self.longitud = float(longitud)
+        self.penalizacion_giro = float(penalizacion_giro)
+        self.capacidad = capacidad
+
+        self._rutas = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def contiene(self, nodo):
+        '''Indica si el cruce pertenece a la cuadrícula.'''
+        return 0 <= nodo[0] <= self.N and 0 <= nodo[1] <= self.N
+
+    def vecinos(self, nodo):
+        '''Cruces alcanzables desde `nodo`, con el índice de la dirección usada.'''
+        for d, (di, dj) in enumerate(_DIRECCIONES):
+            vecino = (nodo[0] + di, nodo[1] + dj)
+            if self.contiene(vecino):
+                yield vecino, d
+
+    def heuristica(self, nodo, destino):
+        '''Distancia de Manhattan, que nunca sobreestima el coste restante.'''
+        return (abs(nodo[0] - destino[0]) + abs(nodo[1] - destino[1])) * self.longitud
+
+    def busca(self, origen, destino):
+        '''
+        Ruta más corta de `origen` a `destino` con A*, sin caché.
+
+        El estado de la búsqueda es (cruce, dirección de llegada) para poder
+        penalizar los giros.
+
+        Retorno:
+        -------
+        list[tuple[int, int]] | None
+            Todos los cruces de la ruta, o None si no hay camino.
+        '''
+        if origen == destino:
+            return [origen]
+
+        inicio = (origen, None)
+        costes = {inicio: 0.0}
+        previos = {inicio: None}
+        # (f, h, contador, estado): h desempata hacia el destino y el contador evita
+        # comparar estados
+        abiertos = [(self.heuristica(origen, destino), 0.0, 0, inicio)]
+        contador = 1
+
+        while abiertos:
+            _, _, _, estado = heapq.heappop(abiertos)
+            nodo, direccion = estado
+
+            if nodo == destino:
+                ruta = []
+                while estado is not None:
+                    ruta.append(estado[0])
+                    estado = previos[estado]
+                return ruta[::-1]
+
+            coste = costes[estado]
+            for vecino, d in self.vecinos(nodo):
+                nuevo = coste + self.longitud
+                if direccion is not None and d != direccion:
+                    nuevo += self.penalizacion_giro
+
+                siguiente = (vecino, d)
+                if nuevo < costes.get(siguiente, float('inf')):
+                    costes[siguiente] = nuevo
+                    previos[siguiente] = estado
+                    h = self.heuristica(vecino, destino)
+                    heapq.heappush(abiertos, (nuevo + h, h, contador, siguiente))
+                    contador += 1
+
+        return None
+
+    def ruta(self, origen, destino):
+        '''
+        Ruta más corta de `origen` a `destino`, desde la caché si ya se calculó.
+
+        Retorno:
+        -------
+        tuple[tuple[int, int], ...] | None
+        '''
+        origen = tuple(origen)
+        destino = tuple(destino)
+        if not (self.contiene(origen) and self.contiene(destino)):
+            raise ValueError(f"Cruce fuera de la cuadrícula: {origen} -> {destino}")
+
+        clave = (origen, destino)
+        if clave in self._rutas:
+            self._rutas.move_to_end(clave)
+            self.aciertos += 1
+            return self._rutas[clave]
+
+        self.fallos += 1
+        ruta = self.busca(origen, destino)
+        ruta = tuple(ruta) if ruta is not None else None
+
+        self._rutas[clave] = ruta
+        if len(self._rutas) > self.capacidad:
+            self._rutas.popitem(last=False)
+
+        return ruta
+
+    def ruta_esquinas(self, origen, destino):
+        '''
+        Ruta de `origen` a `destino` reducida a sus esquinas (origen, cruces en los
+        que gira y destino), como listas `[i, j]` igual que `crea_ruta`.
+        '''
+        ruta = self.ruta(origen, destino)
+        if ruta is None:
+            return None
+        return [list(nodo) for nodo in comprime(ruta)]
+
+
+def comprime(ruta):
+    '''Quita de la ruta los cruces en los que se sigue recto.'''
+    if len(ruta) <= 2:
+        return list(ruta)
+
+    esquinas = [ruta[0]]
+    for previo, actual, siguiente in zip(ruta, ruta[1:], ruta[2:]):
+        if (actual[0] - previo[0], actual[1] - previo[1]) != \
+                (siguiente[0] - actual[0], siguiente[1] - actual[1]):
+            esquinas.append(actual)
+    esquinas.append(ruta[-1])
+
+    return esquinas
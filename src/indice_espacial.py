@@ -0,0 +1,187 @@
+import math
+
+import numpy as np
+
+
+"""
+indice_espacial.py
+
+
+Índice espacial de posiciones sobre una cuadrícula uniforme.
+
+La ciudad es una cuadrícula regular de celdas de `tam_edif + tam_calle`, así que
+las posiciones de los coches se agrupan por celda (en X e Y) con NumPy: se
+calcula la celda de cada punto, se ordenan los índices por celda y se guarda el
+rango de cada celda ocupada en un diccionario. Una consulta de vecinos solo mira
+las celdas que toca su radio, con coste esperado constante.
+
+El módulo no depende de Blender.
+
+
+Autores: Grupo 5.
+"""
+
+
+class HashEspacial:
+    '''
+    Hash espacial de un conjunto de puntos en un instante.
+
+    Atributos:
+    ----------
+    posiciones : numpy.ndarray
+        Puntos indexados, forma (n, 2) o (n, 3). Las distancias usan todas las
+        coordenadas; las celdas solo X e Y.
+    celda : float
+        Lado de una celda.
+    origen : tuple[float, float]
+        Esquina de la celda (0, 0).
+    '''
+
+    def __init__(self, posiciones, celda, origen=(0.0, 0.0)):
+        if celda <= 0:
+            raise ValueError("El tamaño de celda debe ser positivo.")
+
+        self.posiciones = np.asarray(posiciones, dtype=float)
+        self.celda = float(celda)
+        self.origen = (float(origen[0]), float(origen[1]))
+
+        self._celdas = {}
+        self._orden = np.empty(0, dtype=np.int64)
+        self._limites = (0, -1, 0, -1)
+
+        if len(self.posiciones) == 0:
+            return
+
+        ij = np.floor((self.posiciones[:, :2] - self.origen) / self.celda).astype(np.int64)
+
+        # Una clave entera por celda para ordenar los puntos por celda
+        minimo = ij.min(axis=0)
+        maximo = ij.max(axis=0)
+        self._limites = (int(minimo[0]), int(maximo[0]), int(minimo[1]), int(maximo[1]))
+        ij_rel = ij - minimo
+        ancho = int(ij_rel[:, 1].max()) + 1
+        claves = ij_rel[:, 0] * ancho + ij_rel[:, 1]
+
+        self._orden = np.argsort(claves, kind='stable')
+        unicas, inicios, cuentas = np.unique(
+            claves[self._orden], return_index=True, return_counts=True)
+
+        for clave, inicio, cuenta in zip(unicas.tolist(), inicios.tolist(), cuentas.tolist()):
+            i, j = divmod(clave, ancho)
+            self._celdas[(i + int(minimo[0]), j + int(minimo[1]))] = (inicio, inicio + cuenta)
+
+    def __len__(self):
+        return len(self.posiciones)
+
+    def celda_de(self, punto):
+        '''Celda (i, j) que contiene el punto.'''
+        return (math.floor((punto[0] - self.origen[0]) / self.celda),
+                math.floor((punto[1] - self.origen[1]) / self.celda))
+
+    def en_celda(self, i, j):
+        '''Índices de los puntos de la celda (i, j).'''
+        rango = self._celdas.get((i, j))
+        if rango is None:
+            return self._orden[:0]
+        return self._orden[rango[0]:rango[1]]
+
+    def candidatos(self, punto, radio):
+        '''Índices de los puntos de las celdas que toca el círculo (punto, radio).'''
+        i0, j0 = self.celda_de((punto[0] - radio, punto[1] - radio))
+        i1, j1 = self.celda_de((punto[0] + radio, punto[1] + radio))
+
+        # Solo las celdas dentro de la zona ocupada
+        i0, i1 = max(i0, self._limites[0]), min(i1, self._limites[1])
+        j0, j1 = max(j0, self._limites[2]), min(j1, self._limites[3])
+
+        trozos = [self.en_celda(i, j)
+                  for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)
+                  if (i, j) in self._celdas]
+
+        if not trozos:
+            return self._orden[:0]
+        return np.concatenate(trozos)
+
+    def vecinos(self, punto, radio):
+        '''
+        Índices de los puntos a una distancia <= radio del punto.
+
+        Parámetros:
+        ----------
+        punto : sequence[float]
+            Con las mismas coordenadas que `posiciones` (o al menos X e Y).
+        radio : float
+        '''
+        idx = self.candidatos(punto, radio)
+        if len(idx) == 0:
+            return idx
+
+        dim = min(len(punto), self.posiciones.shape[1])
+        d = self.posiciones[idx, :dim] - np.asarray(punto[:dim], dtype=float)
+
+        return idx[np.einsum('ij,ij->i', d, d) <= radio * radio]
+
+    def vecinos_de(self, i, radio):
+        '''Índices de los puntos a una distancia <= radio del punto `i`, sin él.'''
+        idx = self.vecinos(self.posiciones[i], radio)
+        return idx[idx != i]
+
+    def _anillo(self, ci, cj, k):
+        '''Celdas ocupadas a distancia de Chebyshev exactamente `k` de (ci, cj).'''
+        i_min, i_max, j_min, j_max = self._limites
+        j0, j1 = max(cj - k, j_min), min(cj + k, j_max)
+
+        for i in range(max(ci - k, i_min), min(ci + k, i_max) + 1):
+            if k == 0 or abs(i - ci) == k:
+                columnas = range(j0, j1 + 1)
+            else:
+                columnas = [j for j in (cj - k, cj + k) if j_min <= j <= j_max]
+            for j in columnas:
+                if (i, j) in self._celdas:
+                    yield i, j
+
+    def mas_cercano(self, punto, radio_maximo=math.inf):
+        '''
+        Índice del punto más cercano (o -1 si no hay ninguno a menos de
+        `radio_maximo`).
+
+        Recorre anillos de celdas alrededor de la celda del punto, sin salir de
+        la zona ocupada, y para en cuanto el mejor candidato está más cerca que
+        cualquier celda de los anillos que faltan.
+        '''
+        if len(self.posiciones) == 0:
+            return -1
+
+        dim = min(len(punto), self.posiciones.shape[1])
+        punto = np.asarray(punto[:dim], dtype=float)
+
+        ci, cj = self.celda_de(punto)
+        # Posición del punto dentro de su celda, en fracciones de celda
+        fx = (punto[0] - self.origen[0]) / self.celda - ci
+        fy = (punto[1] - self.origen[1]) / self.celda - cj
+
+        i_min, i_max, j_min, j_max = self._limites
+        # Primer anillo que toca la zona ocupada y último que queda dentro de ella
+        k = max(i_min - ci, ci - i_max, j_min - cj, cj - j_max, 0)
+        k_max = max(ci - i_min, i_max - ci, cj - j_min, j_max - cj)
+
+        mejor, mejor_d2 = -1, math.inf
+        while k <= k_max:
+            trozos = [self.en_celda(i, j) for i, j in self._anillo(ci, cj, k)]
+            if trozos:
+                idx = np.concatenate(trozos)
+                d = self.posiciones[idx, :dim] - punto
+                d2 = np.einsum('ij,ij->i', d, d)
+                m = int(np.argmin(d2))
+                if d2[m] < mejor_d2:
+                    mejor, mejor_d2 = int(idx[m]), float(d2[m])
+
+            # Distancia mínima (en X e Y) a cualquier celda fuera de los anillos 0..k
+            cota = self.celda * min(fx + k, k + 1 - fx, fy + k, k + 1 - fy)
+            if mejor_d2 <= cota * cota or cota > radio_maximo:
+                break
+            k += 1
+
+        if mejor_d2 > radio_maximo * radio_maximo:
+            return -1
+        return mejor
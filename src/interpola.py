@@ -1,4 +1,10 @@
-import mathutils
+import numpy as np
+
+try:
+    import mathutils
+except ImportError:
+    # Fuera de Blender las funciones escalares usan `_producto_fila`
+    mathutils = None
 
 
 """
@@ -7,6 +13,9 @@ interpola.py
 
 Algoritmos de interpolación
 
+Solo `catmull_rom` y `hermite` usan `mathutils`, y únicamente si está
+disponible: el módulo se puede importar sin Blender.
+
 
 Autores: Grupo 5.
 
@@ -16,6 +25,13 @@ Autores: Grupo 5.
 """
 
 
+def _producto_fila(potencias, matriz, puntos):
+    """potencias @ matriz @ puntos con listas de Python (sin `mathutils`)."""
+    columnas = [sum(p * fila[j] for p, fila in zip(potencias, matriz))
+                for j in range(len(puntos))]
+    return sum(c * p for c, p in zip(columnas, puntos))
+
+
 def lineal(t: float,t0: float,t1: float ,x0: float ,x1: float):
    
     pos = x0 + (t - t0)/(t1 - t0)*(x1 - x0)
@@ -30,18 +46,25 @@ def catmull_rom(t: float, t0: float, t1: float, t2: float, t3: float,
     u = (t - t1) / (t2 - t1)
    
     # Vector de potencias de u
-    U = mathutils.Vector([u**3, u**2, u, 1])
+    U = [u**3, u**2, u, 1]
    
     # Matriz modificada de Catmull-Rom
-    M = mathutils.Matrix([
+    M = [
         [-tension, 2 - tension, tension - 2, tension],
         [2 * tension, tension - 3, 3 - 2 * tension, -tension],
         [-tension, 0, tension, 0],
         [0, 1, 0, 0]
-    ])
+    ]
    
     # Vector de posiciones
-    B = mathutils.Vector([p0, p1, p2, p3])
+    B = [p0, p1, p2, p3]
+
+    if mathutils is None:
+        return _producto_fila(U, M, B)
+
+    U = mathutils.Vector(U)
+    M = mathutils.Matrix(M)
+    B = mathutils.Vector(B)
    
     # Producto escalar y matricial para el cálculo del polinomio de Catmull-Rom
     C = U @ M @ B
@@ -65,20 +88,27 @@ def hermite(t: float, t0: float, t1: float, p0: float, p1: float, v0: float, v1:
 
 
     # Vector de potencias de t_norm
-    T = mathutils.Vector([t_norm**3, t_norm**2, t_norm, 1])
+    T = [t_norm**3, t_norm**2, t_norm, 1]
 
 
     # Matriz base de Hermite
-    H = mathutils.Matrix([
+    H = [
         [2, -2, 1, 1],
         [-3, 3, -2, -1],
         [0, 0, 1, 0],
         [1, 0, 0, 0]
-    ])
+    ]
 
 
     # Vector de posiciones y tangentes (tangentes escaladas por la duración del intervalo)
-    P = mathutils.Vector([p0, p1, v0, v1])
+    P = [p0, p1, v0, v1]
+
+    if mathutils is None:
+        return _producto_fila(T, H, P)
+
+    T = mathutils.Vector(T)
+    H = mathutils.Matrix(H)
+    P = mathutils.Vector(P)
 
 
     # Producto escalar y matricial para el cálculo del polinomio de Hermite
@@ -87,8 +117,375 @@ def hermite(t: float, t0: float, t1: float, p0: float, p1: float, v0: float, v1:
     return pos
 
 
+# ---------------------------------------------------------------------------
+# Segmentos compilados
+#
+# Cada intervalo entre dos keyframes se reduce a un polinomio cúbico en la
+# variable normalizada u ∈ [0, 1]:
+#
+#     p(u) = ((a·u + b)·u + c)·u + d
+#
+# Los coeficientes (a, b, c, d) solo dependen de los keyframes y de la tensión,
+# así que se calculan una vez y la evaluación queda en un Horner sin reservar
+# memoria.
+# ---------------------------------------------------------------------------
+
+
+def compila_lineal(tiempos, valores):
+    """
+    Coeficientes cúbicos de la interpolación lineal.
+
+    Retorno:
+    -------
+    numpy.ndarray
+        Array (n - 1, 4) con los coeficientes (a, b, c, d) de cada segmento.
+    """
+    valores = np.asarray(valores, dtype=float)
+    p1 = valores[:-1]
+    p2 = valores[1:]
+
+    cero = np.zeros_like(p1)
+    return np.stack([cero, cero, p2 - p1, p1], axis=1)
+
+
+def compila_catmull_rom(tiempos, valores, tension: float):
+    """
+    Coeficientes cúbicos de Catmull-Rom con la matriz modificada de `catmull_rom`.
+
+    Como en `get_posicion2`, se duplica el primer y el último keyframe cuando
+    falta el vecino anterior o posterior.
+
+    Retorno:
+    -------
+    numpy.ndarray
+        Array (n - 1, 4) con los coeficientes (a, b, c, d) de cada segmento.
+    """
+    valores = np.asarray(valores, dtype=float)
+    n = len(valores)
+    i = np.arange(n - 1)
+
+    p0 = valores[np.maximum(i - 1, 0)]
+    p1 = valores[i]
+    p2 = valores[i + 1]
+    p3 = valores[np.minimum(i + 2, n - 1)]
+
+    # Producto M @ B desarrollado por filas de la matriz
+    a = -tension * p0 + (2 - tension) * p1 + (tension - 2) * p2 + tension * p3
+    b = 2 * tension * p0 + (tension - 3) * p1 + (3 - 2 * tension) * p2 - tension * p3
+    c = -tension * p0 + tension * p2
+    d = p1
+
+    return np.stack([a, b, c, d], axis=1)
+
+
+def compila_hermite(tiempos, valores, velocidades):
+    """
+    Coeficientes cúbicos de Hermite.
+
+    Las velocidades se dan por keyframe (unidades por frame) y se escalan por la
+    duración de cada segmento, igual que hace `get_posicion2` antes de llamar a
+    `hermite`. Los segmentos de duración nula devuelven el valor del keyframe.
+
+    Retorno:
+    -------
+    numpy.ndarray
+        Array (n - 1, 4) con los coeficientes (a, b, c, d) de cada segmento.
+    """
+    tiempos = np.asarray(tiempos, dtype=float)
+    valores = np.asarray(valores, dtype=float)
+    velocidades = np.asarray(velocidades, dtype=float)
+
+    p0 = valores[:-1]
+    p1 = valores[1:]
+    dt = np.diff(tiempos)
+    v0 = velocidades[:-1] * dt
+    v1 = velocidades[1:] * dt
+
+    # Producto H @ P desarrollado por filas de la matriz de Hermite
+    a = 2 * p0 - 2 * p1 + v0 + v1
+    b = -3 * p0 + 3 * p1 - 2 * v0 - v1
+    c = v0
+    d = p0
+
+    coefs = np.stack([a, b, c, d], axis=1)
+    coefs[dt == 0] = 0.0
+    coefs[dt == 0, 3] = p0[dt == 0]
+
+    return coefs
+
+
+def horner(coefs, u: float):
+    """Evalúa el polinomio cúbico (a, b, c, d) en `u`."""
+    a, b, c, d = coefs
+    return ((a * u + b) * u + c) * u + d
+
+
+class SegmentosCompilados:
+    """
+    Curva por tramos ya compilada a coeficientes cúbicos.
+
+    Atributos:
+    ----------
+    tiempos : list[float]
+        Tiempos de los keyframes.
+    coeficientes : list[tuple[float, float, float, float]]
+        Coeficientes (a, b, c, d) de cada segmento, como floats de Python para
+        no pagar el coste de los escalares de NumPy en la evaluación.
+    """
+
+    def __init__(self, tiempos, coeficientes):
+        self.tiempos = [float(t) for t in tiempos]
+        self.coeficientes = [tuple(c) for c in np.asarray(coeficientes, dtype=float).tolist()]
+
+    def evalua(self, t: float, i: int):
+        """Evalúa el segmento `i` (entre los keyframes i e i + 1) en el tiempo `t`."""
+        t0 = self.tiempos[i]
+        t1 = self.tiempos[i + 1]
+        u = (t - t0) / (t1 - t0) if t1 != t0 else 0.0
+
+        a, b, c, d = self.coeficientes[i]
+        return ((a * u + b) * u + c) * u + d
+
+    def derivada(self, t: float, i: int):
+        """Derivada dp/dt del segmento `i` en el tiempo `t`."""
+        t0 = self.tiempos[i]
+        t1 = self.tiempos[i + 1]
+        if t1 == t0:
+            return 0.0
+
+        u = (t - t0) / (t1 - t0)
+        a, b, c, d = self.coeficientes[i]
+        return ((3 * a * u + 2 * b) * u + c) / (t1 - t0)
+
+
+def compila_segmentos(tiempos, valores, metodo: str, tension: float = 0.5, velocidades=None):
+    """
+    Compila los keyframes de una curva según el método de interpolación.
+
+    Parámetros:
+    ----------
+    tiempos, valores : array_like
+        Keyframes de la curva, ordenados por tiempo (al menos dos).
+    metodo : str
+        'LINEAL', 'CATMULL-ROM' o 'HERMITE'.
+    tension : float
+        Tensión de Catmull-Rom.
+    velocidades : array_like, opcional
+        Velocidad en cada keyframe para Hermite (cero si no se indica).
+
+    Retorno:
+    -------
+    SegmentosCompilados
+    """
+    if metodo == 'LINEAL':
+        coefs = compila_lineal(tiempos, valores)
+    elif metodo == 'CATMULL-ROM':
+        coefs = compila_catmull_rom(tiempos, valores, tension)
+    elif metodo == 'HERMITE':
+        if velocidades is None:
+            velocidades = np.zeros(len(tiempos))
+        coefs = compila_hermite(tiempos, valores, velocidades)
+    else:
+        raise ValueError(f"Método de interpolación desconocido: {metodo}")
+
+    return SegmentosCompilados(tiempos, coefs)
+
+
+def pendientes_monotonas(x, y):
+    """
+    Pendientes de Fritsch-Carlson para una interpolación cúbica monótona.
+
+    Con estas pendientes como velocidades, `compila_hermite` produce una curva que
+    conserva la monotonía de los datos (no se pasa de largo entre dos muestras).
+
+    Parámetros:
+    ----------
+    x : array_like
+        Abscisas estrictamente crecientes.
+    y : array_like
+        Ordenadas monótonas.
+
+    Retorno:
+    -------
+    numpy.ndarray
+        Pendiente dy/dx en cada muestra.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    if len(x) < 2:
+        return np.zeros(len(x))
+
+    delta = np.diff(y) / np.diff(x)
+
+    m = np.empty(len(x))
+    m[0] = delta[0]
+    m[-1] = delta[-1]
+    m[1:-1] = (delta[:-1] + delta[1:]) / 2
+
+    # Tramos planos o cambios de signo: pendiente nula
+    plano = delta == 0
+    m[:-1][plano] = 0.0
+    m[1:][plano] = 0.0
+    m[1:-1][delta[:-1] * delta[1:] < 0] = 0.0
+
+    # Limitar las pendientes al círculo de radio 3 para evitar sobreoscilaciones
+    no_plano = ~plano
+    alfa = np.zeros_like(delta)
+    beta = np.zeros_like(delta)
+    alfa[no_plano] = m[:-1][no_plano] / delta[no_plano]
+    beta[no_plano] = m[1:][no_plano] / delta[no_plano]
+
+    radio = np.hypot(alfa, beta)
+    exceso = radio > 3
+    tau = np.ones_like(delta)
+    tau[exceso] = 3 / radio[exceso]
+
+    for k in np.nonzero(exceso)[0]:
+        m[k] = tau[k] * alfa[k] * delta[k]
+        m[k + 1] = tau[k] * beta[k] * delta[k]
+
+    return m
+
+
+# ---------------------------------------------------------------------------
+# Evaluación por lotes
+#
+# Variantes vectorizadas de las funciones anteriores: reciben un array de
+# tiempos y los keyframes completos (tiempos y valores) y devuelven todas las
+# muestras de una vez. Las funciones escalares se mantienen como referencia.
+# ---------------------------------------------------------------------------
+
+
+def _indices_segmento(t, tiempos):
+    """
+    Devuelve, para cada tiempo de `t`, el índice del keyframe que abre el
+    segmento que lo contiene (el mismo criterio que `posicion.get_posicion2`:
+    el primer segmento con t_i <= t <= t_i+1).
+    """
+    i = np.searchsorted(tiempos, t, side='left') - 1
+    return np.clip(i, 0, len(tiempos) - 2)
+
+
+def _prepara_lote(t, tiempos, valores):
+    t = np.asarray(t, dtype=float)
+    tiempos = np.asarray(tiempos, dtype=float)
+    valores = np.asarray(valores, dtype=float)
+
+    if tiempos.shape != valores.shape or tiempos.ndim != 1:
+        raise ValueError("tiempos y valores deben ser arrays 1D de la misma longitud.")
+    if len(tiempos) == 0:
+        raise ValueError("Se necesita al menos un keyframe para interpolar.")
+
+    return t, tiempos, valores
+
+
+def evalua_lote(t, tiempos, valores, coefs):
+    """
+    Evalúa unos coeficientes compilados en un array de tiempos.
 
+    Fuera del rango de keyframes se mantiene el valor del extremo.
+    """
+    i = _indices_segmento(t, tiempos)
 
+    dt = tiempos[i + 1] - tiempos[i]
+    u = (t - tiempos[i]) / np.where(dt == 0, 1.0, dt)
+    u = np.where(dt == 0, 0.0, u)
+
+    a, b, c, d = (coefs[i, k] for k in range(4))
+    pos = ((a * u + b) * u + c) * u + d
 
+    pos = np.where(t < tiempos[0], valores[0], pos)
+    pos = np.where(t > tiempos[-1], valores[-1], pos)
+    return pos
 
 
+def lineal_lote(t, tiempos, valores):
+    """
+    Interpolación lineal de un array de tiempos.
+
+    Parámetros:
+    ----------
+    t : array_like
+        Tiempos (frames) en los que se evalúa la curva.
+    tiempos : array_like
+        Tiempos de los keyframes, ordenados de forma creciente.
+    valores : array_like
+        Valores de los keyframes.
+
+    Retorno:
+    -------
+    numpy.ndarray
+        Valores interpolados, con la misma forma que `t`.
+    """
+    t, tiempos, valores = _prepara_lote(t, tiempos, valores)
+
+    if len(tiempos) == 1:
+        return np.full(t.shape, valores[0])
+
+    return np.interp(t, tiempos, valores)
+
+
+def catmull_rom_lote(t, tiempos, valores, tension: float):
+    """
+    Interpolación Catmull-Rom de un array de tiempos.
+
+    Parámetros:
+    ----------
+    t : array_like
+        Tiempos (frames) en los que se evalúa la curva.
+    tiempos : array_like
+        Tiempos de los keyframes, ordenados de forma creciente.
+    valores : array_like
+        Valores de los keyframes.
+    tension : float
+        Tensión de la curva.
+
+    Retorno:
+    -------
+    numpy.ndarray
+        Valores interpolados, con la misma forma que `t`.
+    """
+    t, tiempos, valores = _prepara_lote(t, tiempos, valores)
+
+    if len(tiempos) == 1:
+        return np.full(t.shape, valores[0])
+
+    coefs = compila_catmull_rom(tiempos, valores, tension)
+    return evalua_lote(t, tiempos, valores, coefs)
+
+
+def hermite_lote(t, tiempos, valores, velocidades):
+    """
+    Interpolación Hermite de un array de tiempos.
+
+    A diferencia de `hermite`, recibe las velocidades por keyframe (unidades por
+    frame) y las escala internamente por la duración de cada segmento.
+
+    Parámetros:
+    ----------
+    t : array_like
+        Tiempos (frames) en los que se evalúa la curva.
+    tiempos : array_like
+        Tiempos de los keyframes, ordenados de forma creciente.
+    valores : array_like
+        Valores de los keyframes.
+    velocidades : array_like
+        Velocidad en cada keyframe.
+
+    Retorno:
+    -------
+    numpy.ndarray
+        Valores interpolados, con la misma forma que `t`.
+    """
+    t, tiempos, valores = _prepara_lote(t, tiempos, valores)
+    velocidades = np.asarray(velocidades, dtype=float)
+
+    if velocidades.shape != tiempos.shape:
+        raise ValueError("Se necesita una velocidad por keyframe.")
+
+    if len(tiempos) == 1:
+        return np.full(t.shape, valores[0])
+
+    coefs = compila_hermite(tiempos, valores, velocidades)
+    return evalua_lote(t, tiempos, valores, coefs)
@@ -0,0 +1,189 @@
+import os
+
+import bmesh
+import bpy
+import mathutils
+
+from bpy.app.handlers import persistent
+
+import trazas
+
+
+"""
+modelos.py
+
+
+Registro de modelos 3D compartidos por los coches.
+
+Importar el .obj para cada coche vuelve a leer el archivo y crea una malla
+nueva por vehículo. Aquí el modelo se importa y se normaliza una sola vez por
+sesión; cada coche es después un objeto nuevo que enlaza la misma malla, así que
+crear un coche cuesta lo mismo sea cual sea la complejidad del modelo.
+
+Lo mismo ocurre con las esferas que sustituyen a los coches: la esfera ya
+subdividida se construye una vez por radio y nivel de subdivisión.
+
+
+Autores: Grupo 5.
+"""
+
+
+# (ruta absoluta, factor de escala) -> (nombre de la malla, rotación del objeto importado)
+_modelos = {}
+
+# (radio, niveles de subdivisión) -> nombre de la malla de esfera
+_esferas = {}
+
+
+def malla_modelo(ruta_obj, factor_escala):
+    """
+    Devuelve la malla normalizada de un modelo .obj, importándolo si hace falta.
+
+    Parámetros:
+    ----------
+    ruta_obj : str
+        Ruta al archivo .obj.
+    factor_escala : float
+        Escala que se aplica a los vértices de la malla.
+
+    Retorno:
+    -------
+    tuple[bpy.types.Mesh, mathutils.Euler]
+        La malla compartida y la rotación que el importador dio al objeto (la
+        conversión de ejes del .obj), que debe copiarse en cada coche.
+    """
+    clave = (os.path.abspath(ruta_obj), factor_escala)
+
+    registro = _modelos.get(clave)
+    if registro is not None:
+        malla = bpy.data.meshes.get(registro[0])
+        if malla is not None:
+            return malla, registro[1].copy()
+
+    bpy.ops.object.select_all(action='DESELECT')
+    with trazas.tramo("obj_import", "modelos", ruta=ruta_obj):
+        bpy.ops.wm.obj_import(filepath=ruta_obj)
+    importados = [obj for obj in bpy.context.selected_objects if obj.type == 'MESH']
+
+    if not importados:
+        raise ValueError(f"El archivo {ruta_obj} no contiene ninguna malla.")
+
+    # Un modelo con varias piezas se une en una sola malla
+    bpy.context.view_layer.objects.active = importados[0]
+    if len(importados) > 1:
+        bpy.ops.object.join()
+    plantilla = bpy.context.view_layer.objects.active
+
+    # Aplica la escala a los vértices, como hacía `transform_apply(scale=True)`
+    escala = plantilla.scale * factor_escala
+    malla = plantilla.data
+    malla.transform(mathutils.Matrix.Diagonal(escala).to_4x4())
+    malla.update()
+
+    rotacion = plantilla.rotation_euler.copy()
+
+    # La plantilla no forma parte de la escena: solo se conserva su malla
+    bpy.data.objects.remove(plantilla, do_unlink=True)
+
+    _modelos[clave] = (malla.name, rotacion)
+
+    return malla, rotacion.copy()
+
+
+def crea_coche(ruta_obj, factor_escala, location=(0, 0, 0)):
+    """
+    Crea un coche que enlaza la malla compartida del modelo y lo añade a la
+    colección activa.
+
+    Retorno:
+    -------
+    bpy.types.Object
+    """
+    malla, rotacion = malla_modelo(ruta_obj, factor_escala)
+
+    coche = bpy.data.objects.new("Car", malla)
+    coche.location = location
+    coche.rotation_euler = rotacion
+    bpy.context.collection.objects.link(coche)
+
+    return coche
+
+
+def malla_esfera(radio, niveles=2):
+    """
+    Devuelve una malla de esfera UV de radio `radio` con `niveles` de
+    subdivisión ya aplicados, construyéndola solo la primera vez.
+
+    La esfera se crea con bmesh (32 segmentos y 16 anillos, como
+    `primitive_uv_sphere_add`) y se subdivide evaluando un modificador
+    Subdivision Surface sobre un objeto temporal.
+
+    Retorno:
+    -------
+    bpy.types.Mesh
+    """
+    clave = (round(radio, 6), niveles)
+
+    nombre = _esferas.get(clave)
+    if nombre is not None:
+        malla = bpy.data.meshes.get(nombre)
+        if malla is not None:
+            return malla
+
+    base = bpy.data.meshes.new("EsferaBase")
+    bm = bmesh.new()
+    bmesh.ops.create_uvsphere(bm, u_segments=32, v_segments=16, radius=radio)
+    bm.to_mesh(base)
+    bm.free()
+
+    temporal = bpy.data.objects.new("EsferaBase", base)
+    bpy.context.collection.objects.link(temporal)
+    mod = temporal.modifiers.new(name="Subdivision", type='SUBSURF')
+    mod.levels = niveles
+    mod.render_levels = niveles
+
+    with trazas.tramo("subdivision", "modelos", niveles=niveles):
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        malla = bpy.data.meshes.new_from_object(temporal.evaluated_get(depsgraph))
+    malla.name = "Esfera"
+
+    bpy.data.objects.remove(temporal, do_unlink=True)
+    bpy.data.meshes.remove(base)
+
+    _esferas[clave] = malla.name
+
+    return malla
+
+
+def crea_esfera(radio, niveles=2, location=(0, 0, 0)):
+    """
+    Crea una esfera que enlaza la malla compartida `malla_esfera(radio, niveles)`
+    y la añade a la colección activa.
+
+    Retorno:
+    -------
+    bpy.types.Object
+    """
+    esfera = bpy.data.objects.new("Sphere", malla_esfera(radio, niveles))
+    esfera.location = location
+    bpy.context.collection.objects.link(esfera)
+
+    return esfera
+
+
+@persistent
+def limpia_registro(*args):
+    """Olvida los modelos importados (al cargar otro .blend sus mallas ya no existen)."""
+    _modelos.clear()
+    _esferas.clear()
+
+
+def register():
+    if limpia_registro not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(limpia_registro)
+
+
+def unregister():
+    if limpia_registro in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(limpia_registro)
+    limpia_registro()
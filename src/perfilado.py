@@ -0,0 +1,374 @@
+import json
+import math
+import os
+import time
+
+from collections import deque
+
+import bpy
+
+from bpy.app.handlers import persistent
+
+import posicion
+
+
+"""
+perfilado.py
+
+
+Perfilado opcional de las funciones de driver.
+
+Con `Scene.perfilar_drivers` activado, las funciones que `posicion.register`
+publica en `bpy.app.driver_namespace` (`get_pos2`, `get_quaternion`, ...) se
+sustituyen por envolturas que cuentan las llamadas y miden su duración por
+función y por objeto. Al desactivarlo se vuelven a publicar las funciones
+originales, así que sin perfilado los drivers no pasan por ningún código
+adicional.
+
+De cada par (función, objeto) se guarda el número de llamadas, el tiempo total
+y las últimas `MUESTRAS` duraciones para estimar el percentil 95. También se
+muestran los aciertos de las cachés de posiciones y cuaterniones desde el
+último reinicio. El panel está en la pestaña "Drivers Control" junto al panel
+de los drivers y permite reiniciar los contadores y volcarlos a JSON.
+
+
+Autores: Grupo 5.
+"""
+
+
+# Duraciones que se conservan por (función, objeto) para el percentil 95
+MUESTRAS = 1024
+
+# Funciones del driver_namespace que se perfilan
+FUNCIONES = ('get_pos2', 'get_quaternion', 'get_pos1',
+             'get_posicion_x_loop', 'get_posicion_y_loop')
+
+
+class Estadistica:
+    '''
+    Contadores de una función de driver para un objeto.
+
+    Atributos:
+    ----------
+    llamadas : int
+        Número de llamadas.
+    total : float
+        Tiempo acumulado en segundos.
+    muestras : collections.deque
+        Últimas duraciones, en segundos.
+    '''
+
+    __slots__ = ('llamadas', 'total', 'muestras')
+
+    def __init__(self):
+        self.llamadas = 0
+        self.total = 0.0
+        self.muestras = deque(maxlen=MUESTRAS)
+
+    def registra(self, duracion):
+        self.llamadas += 1
+        self.total += duracion
+        self.muestras.append(duracion)
+
+
+# (función, objeto) -> Estadistica
+_estadisticas = {}
+
+# función -> Estadistica de todos los objetos (el panel solo lee estas)
+_por_funcion = {}
+
+# Funciones originales mientras las envolturas están publicadas
+_originales = {}
+
+# Aciertos y fallos de cada caché en el último reinicio
+_base_caches = {}
+
+
+def _envuelve(nombre, funcion):
+    '''Envoltura de `funcion` que registra su duración en `_estadisticas`.'''
+    reloj = time.perf_counter
+
+    def envoltura(*args):
+        inicio = reloj()
+        try:
+            return funcion(*args)
+        finally:
+            duracion = reloj() - inicio
+            # Las funciones de driver reciben (frame, objeto, ...) o solo el frame
+            objeto = args[1].name if len(args) > 1 and hasattr(args[1], 'name') else ''
+            clave = (nombre, objeto)
+            estadistica = _estadisticas.get(clave)
+            if estadistica is None:
+                estadistica = _estadisticas[clave] = Estadistica()
+            estadistica.registra(duracion)
+            _por_funcion[nombre].registra(duracion)
+
+    envoltura.__name__ = getattr(funcion, '__name__', nombre)
+    envoltura.__doc__ = getattr(funcion, '__doc__', None)
+    return envoltura
+
+
+def activa():
+    '''Publica las envolturas en el driver_namespace.'''
+    if _originales:
+        return
+
+    espacio = bpy.app.driver_namespace
+    for nombre in FUNCIONES:
+        funcion = espacio.get(nombre)
+        if funcion is not None:
+            _originales[nombre] = funcion
+            _por_funcion.setdefault(nombre, Estadistica())
+            espacio[nombre] = _envuelve(nombre, funcion)
+
+
+def desactiva():
+    '''Vuelve a publicar las funciones originales.'''
+    espacio = bpy.app.driver_namespace
+    for nombre, funcion in _originales.items():
+        espacio[nombre] = funcion
+    _originales.clear()
+
+
+def caches():
+    '''Cachés de `posicion` cuyos aciertos se muestran (se leen del módulo por si se recarga).'''
+    return {
+        'posiciones': posicion._cache_posiciones,
+        'cuaterniones': posicion._cache_quaterniones,
+    }
+
+
+def reinicia():
+    '''Borra los contadores y toma los aciertos actuales de las cachés como base.'''
+    _estadisticas.clear()
+    for estadistica in _por_funcion.values():
+        estadistica.__init__()
+    for nombre, cache in caches().items():
+        _base_caches[nombre] = (cache.aciertos, cache.fallos)
+
+
+def percentil(valores, p):
+    '''Percentil `p` (0-100) por rango más cercano; 0 si no hay valores.'''
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[k]
+
+
+def _resume(estadisticas):
+    '''Combina varias `Estadistica` en un diccionario (tiempos en ms y µs).'''
+    llamadas = sum(e.llamadas for e in estadisticas)
+    total = sum(e.total for e in estadisticas)
+    muestras = [d for e in estadisticas for d in e.muestras]
+    return {
+        'llamadas': llamadas,
+        'total_ms': total * 1e3,
+        'media_us': total / llamadas * 1e6 if llamadas else 0.0,
+        'p95_us': percentil(muestras, 95) * 1e6,
+    }
+
+
+def tasa_caches():
+    '''Aciertos, fallos y tasa de aciertos de cada caché desde el último reinicio.'''
+    resultado = {}
+    for nombre, cache in caches().items():
+        aciertos0, fallos0 = _base_caches.get(nombre, (0, 0))
+        aciertos = cache.aciertos - aciertos0
+        fallos = cache.fallos - fallos0
+        consultas = aciertos + fallos
+        resultado[nombre] = {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa': aciertos / consultas if consultas else 0.0,
+            'entradas': len(cache),
+        }
+    return resultado
+
+
+def resumen():
+    '''
+    Resumen de los contadores.
+
+    Retorno:
+    -------
+    dict
+        'funciones': totales por función; 'objetos': por objeto y función;
+        'caches': ver `tasa_caches`.
+    '''
+    por_objeto = {}
+    for (funcion, objeto), estadistica in _estadisticas.items():
+        por_objeto.setdefault(objeto, {})[funcion] = estadistica
+
+    return {
+        'funciones': resumen_funciones(),
+        'objetos': {objeto: {nombre: _resume([e]) for nombre, e in sorted(funciones.items())}
+                    for objeto, funciones in sorted(por_objeto.items())},
+        'caches': tasa_caches(),
+    }
+
+
+def resumen_funciones():
+    '''Totales por función (sin recorrer los contadores por objeto).'''
+    return {nombre: _resume([e]) for nombre, e in sorted(_por_funcion.items()) if e.llamadas}
+
+
+def objetos_mas_lentos(n=5):
+    '''Los `n` objetos con más tiempo acumulado, como (nombre, segundos, llamadas).'''
+    tiempos = {}
+    for (_, objeto), estadistica in _estadisticas.items():
+        total, llamadas = tiempos.get(objeto, (0.0, 0))
+        tiempos[objeto] = (total + estadistica.total, llamadas + estadistica.llamadas)
+
+    orden = sorted(tiempos.items(), key=lambda item: item[1][0], reverse=True)
+    return [(objeto, total, llamadas) for objeto, (total, llamadas) in orden[:n]]
+
+
+def _actualiza_perfilado(self, context):
+    if self.perfilar_drivers:
+        activa()
+    else:
+        desactiva()
+
+
+bpy.types.Scene.perfilar_drivers = bpy.props.BoolProperty(
+    name="Perfilar drivers",
+    description="Mide las llamadas y el tiempo de las funciones de driver (añade coste a cada evaluación)",
+    default=False,
+    update=_actualiza_perfilado
+)
+
+
+@persistent
+def _sincroniza_perfilado(*args):
+    '''Handler de carga de archivo: aplica el ajuste guardado en la escena.'''
+    desactiva()
+    scene = bpy.context.scene
+    if scene is not None and scene.perfilar_drivers:
+        activa()
+
+
+class OBJECT_PT_PerfiladoDrivers(bpy.types.Panel):
+    '''
+    Panel con los contadores del perfilado de drivers.
+
+    Atributos:
+    ----------
+    - `bl_idname` : str
+        En este caso: "OBJECT_PT_perfilado_drivers".
+    - `bl_category` : str
+        La misma pestaña que `posicion.OBJECT_PT_CustomPanel`: "Drivers Control".
+    '''
+
+    bl_label = "Perfilado de drivers"
+    bl_idname = "OBJECT_PT_perfilado_drivers"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = "Drivers Control"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(context.scene, "perfilar_drivers")
+
+        funciones = resumen_funciones()
+
+        if funciones:
+            caja = layout.box()
+            caja.label(text="Función: llamadas · total · media · p95")
+            for nombre, d in funciones.items():
+                caja.label(text=f"{nombre}: {d['llamadas']} · {d['total_ms']:.1f} ms · "
+                                f"{d['media_us']:.1f} µs · {d['p95_us']:.1f} µs")
+
+            caja = layout.box()
+            caja.label(text="Objetos más lentos")
+            for objeto, total, llamadas in objetos_mas_lentos():
+                caja.label(text=f"{objeto or '(sin objeto)'}: {total * 1e3:.1f} ms, {llamadas} llamadas")
+
+        caja = layout.box()
+        caja.label(text="Cachés: aciertos")
+        for nombre, d in tasa_caches().items():
+            caja.label(text=f"{nombre}: {d['tasa']:.1%} de {d['aciertos'] + d['fallos']} "
+                            f"({d['entradas']} entradas)")
+
+        fila = layout.row(align=True)
+        fila.operator("object.reiniciar_perfilado", text="Reiniciar")
+        fila.operator("object.volcar_perfilado", text="Guardar JSON")
+
+
+class OBJECT_OT_ReiniciarPerfilado(bpy.types.Operator):
+    '''
+    Operador para poner a cero los contadores del perfilado de drivers.
+
+    Atributos:
+    ----------
+    - `bl_idname` : str
+        En este caso: "object.reiniciar_perfilado".
+    - `bl_label` : str
+        En este caso: "Reiniciar perfilado".
+    '''
+
+    bl_idname = "object.reiniciar_perfilado"
+    bl_label = "Reiniciar perfilado"
+
+    def execute(self, context):
+        reinicia()
+        return {'FINISHED'}
+
+
+class OBJECT_OT_VolcarPerfilado(bpy.types.Operator):
+    '''
+    Operador para guardar el resumen del perfilado en JSON.
+
+    Escribe `<archivo>_perfil_drivers.json` junto al .blend (o en el directorio
+    temporal de Blender si el archivo no se ha guardado).
+
+    Atributos:
+    ----------
+    - `bl_idname` : str
+        En este caso: "object.volcar_perfilado".
+    - `bl_label` : str
+        En este caso: "Guardar perfilado".
+    '''
+
+    bl_idname = "object.volcar_perfilado"
+    bl_label = "Guardar perfilado"
+
+    def execute(self, context):
+        if bpy.data.filepath:
+            ruta = os.path.splitext(bpy.data.filepath)[0] + "_perfil_drivers.json"
+        else:
+            ruta = os.path.join(bpy.app.tempdir, "perfil_drivers.json")
+
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(resumen(), f, indent=2)
+
+        self.report({'INFO'}, f"Perfilado guardado en {ruta}")
+        return {'FINISHED'}
+
+
+def register():
+    # `posicion.register` acaba de publicar las funciones originales
+    _originales.clear()
+    reinicia()
+
+    if _sincroniza_perfilado not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(_sincroniza_perfilado)
+
+    bpy.utils.register_class(OBJECT_PT_PerfiladoDrivers)
+    bpy.utils.register_class(OBJECT_OT_ReiniciarPerfilado)
+    bpy.utils.register_class(OBJECT_OT_VolcarPerfilado)
+
+
+def unregister():
+    desactiva()
+
+    if _sincroniza_perfilado in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_sincroniza_perfilado)
+
+    for clase in (OBJECT_PT_PerfiladoDrivers, OBJECT_OT_ReiniciarPerfilado,
+                  OBJECT_OT_VolcarPerfilado):
+        try:
+            bpy.utils.unregister_class(clase)
+        except RuntimeError:
+            pass
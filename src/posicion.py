@@ -1,11 +1,16 @@
 import bpy
 import math
 import mathutils
+import random
 import sys
 import os
+import zlib
 # import interpola
 import importlib
 
+import numpy as np
+
+from bpy.app.handlers import persistent
 from bpy.props import FloatVectorProperty
 from mathutils import noise
 
@@ -15,6 +20,12 @@ try:
 except ImportError:
     import posiciinterpolaon
 
+import fcurves_lote
+import trayectoria
+import trazas
+
+from trayectoria import CacheAcotada, LongitudArco, TablaLongitud
+
 # Añadir la ruta donde se encuentran tus módulos
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
@@ -27,18 +38,34 @@ eje_items = [
     ('-Z', '-Z', 'Alinear con el eje -Z')
 ]
 
+# Versión de los ajustes que influyen en la trayectoria. Forma parte de la clave
+# de las cachés por frame, así que incrementarla invalida todas las entradas.
+_version_ajustes = 0
+
+
+def incrementa_version_ajustes(self=None, context=None):
+    '''
+    Invalida las posiciones memorizadas. Se usa como callback `update` de las
+    propiedades que afectan a la trayectoria.
+    '''
+    global _version_ajustes
+    _version_ajustes += 1
+
+
 bpy.types.Object.eje_alineacion = bpy.props.EnumProperty(
     name="Eje de Alineación",
     description="Selecciona el eje del objeto que se alineará con el vector tangente",
     items=eje_items,
-    default='Y'  # Puedes cambiar el valor predeterminado
+    default='Y',  # Puedes cambiar el valor predeterminado
+    update=incrementa_version_ajustes
 )
 
 bpy.types.Object.eje_arriba = bpy.props.EnumProperty(
     name="Eje de arriba ",
     description="Selecciona el eje del objeto que se alineará con el vector up",
     items=eje_items,
-    default='Z'  # Puedes cambiar el valor predeterminado
+    default='Z',  # Puedes cambiar el valor predeterminado
+    update=incrementa_version_ajustes
 )
 
 bpy.types.Object.angulo_rotacion = bpy.props.FloatProperty(
@@ -47,14 +74,16 @@ bpy.types.Object.angulo_rotacion = bpy.props.FloatProperty(
     default=0,
     min=-90,
     max=90,
-    unit='ROTATION'
+    unit='ROTATION',
+    update=incrementa_version_ajustes
 )
 
 bpy.types.Scene.tension = bpy.props.FloatProperty(
     name="Tension",
     description="Tensión para Catmull-Rom",
     default=0.5,
-    min=0.0  # Sin límite superior
+    min=0.0,  # Sin límite superior
+    update=incrementa_version_ajustes
 )
 
 enum_items = [
@@ -67,14 +96,16 @@ bpy.types.Scene.selected_shape = bpy.props.EnumProperty(
     name="Tipo de interpolación",
     description="Selecciona la interpolación",
     items=enum_items,
-    default='LINEAL'
+    default='LINEAL',
+    update=incrementa_version_ajustes
 )
 
 bpy.types.Object.velocity = FloatVectorProperty(
     name="Velocity",
     description="Velocidad en el keyframe como un vector 3D",
     default=(0.0, 0.0, 0.0),  # Valor por defecto si no se especifica
-    size=3  # Tamaño del vector (x, y, z)
+    size=3,  # Tamaño del vector (x, y, z)
+    update=incrementa_version_ajustes
 )
 
 bpy.types.Object.distancia_deseada = bpy.props.FloatProperty(
@@ -82,6 +113,7 @@ bpy.types.Object.distancia_deseada = bpy.props.FloatProperty(
     description="Distancia que se desea recorrer a lo largo de la curva",
     default=0.0,
     min=0.0,
+    update=incrementa_version_ajustes
 )
 
 bpy.types.Object.distancia_recorrida = bpy.props.FloatProperty(
@@ -91,14 +123,130 @@ bpy.types.Object.distancia_recorrida = bpy.props.FloatProperty(
     min=0.0,
 )
 
+bpy.types.Scene.interpolacion_longitud = bpy.props.EnumProperty(
+    name="Interpolación de longitud",
+    description="Interpolación entre frames al convertir longitud recorrida en frame",
+    items=[
+        ('LINEAL', "Lineal", "Interpola linealmente entre frames"),
+        ('MONOTONA', "Cúbica monótona", "Interpola con una cúbica que conserva la monotonía")
+    ],
+    default='LINEAL',
+    update=incrementa_version_ajustes
+)
+
+bpy.types.Scene.tolerancia_longitud = bpy.props.FloatProperty(
+    name="Tolerancia de longitud",
+    description="Error admitido al integrar la longitud de cada segmento de la trayectoria",
+    default=1e-4,
+    min=1e-8,
+    precision=6
+)
+
+bpy.types.Scene.subframes_bake = bpy.props.IntProperty(
+    name="Muestras por frame",
+    description="Número de muestras por frame al convertir la trayectoria en keyframes",
+    default=1,
+    min=1,
+    max=10
+)
+
+bpy.types.Object.accion_ruta = bpy.props.PointerProperty(
+    name="Acción de la ruta",
+    description="Acción con los keyframes de la ruta mientras la trayectoria está bakeada",
+    type=bpy.types.Action
+)
+
+bpy.types.Object.rotacion_bakeada = bpy.props.BoolProperty(
+    name="Rotación bakeada",
+    description="Indica si la rotación se bakeó junto con la posición",
+    default=False,
+    options={'HIDDEN'}
+)
+
 bpy.types.Object.control_vel = bpy.props.BoolProperty(
     name="Aplicar control de velocidad",
     description="Activar o desactivar contorl de velocidad",
-    default=False
+    default=False,
+    update=incrementa_version_ajustes
 )
 
 
-def get_random_oscillation(frame, frequency, amplitude, axes):
+bpy.types.Object.semilla_oscilacion = bpy.props.IntProperty(
+    name="Semilla de oscilación",
+    description="Desfase del ruido de oscilación del objeto (0: se deriva del nombre)",
+    default=0,
+    min=0,
+    update=incrementa_version_ajustes
+)
+
+
+# Tablas de ruido para la oscilación: una por eje, muestreadas una sola vez.
+# El ruido de Perlin vale 0 en los puntos enteros, así que se muestrea con un paso
+# fino y se interpola linealmente entre muestras.
+_RUIDO_MUESTRAS_POR_UNIDAD = 16
+_RUIDO_LONGITUD = 1024
+_tablas_ruido = None
+_fases_oscilacion = {}
+
+
+def tablas_ruido():
+    """
+    Devuelve las tablas de ruido (3, n + 1) de los ejes X, Y y Z.
+
+    La fila de cada eje contiene `noise.noise` a lo largo de ese eje, igual que la
+    oscilación original, en `_RUIDO_LONGITUD` unidades de t. La última muestra
+    repite la primera para que la tabla sea periódica.
+    """
+    global _tablas_ruido
+
+    if _tablas_ruido is None:
+        n = _RUIDO_LONGITUD * _RUIDO_MUESTRAS_POR_UNIDAD
+        tablas = np.empty((3, n + 1))
+        for k in range(n):
+            t = k / _RUIDO_MUESTRAS_POR_UNIDAD
+            tablas[0, k] = noise.noise((t, 0.0, 0.0))
+            tablas[1, k] = noise.noise((0.0, t, 0.0))
+            tablas[2, k] = noise.noise((0.0, 0.0, t))
+        tablas[:, n] = tablas[:, 0]
+        _tablas_ruido = tablas
+
+    return _tablas_ruido
+
+
+def fases_oscilacion(semilla):
+    """
+    Desfase (en unidades de t) de cada eje para una semilla. La semilla 0 no
+    tiene desfase y reproduce la oscilación original.
+    """
+    fases = _fases_oscilacion.get(semilla)
+    if fases is None:
+        if semilla == 0:
+            fases = (0.0, 0.0, 0.0)
+        else:
+            generador = random.Random(semilla)
+            fases = tuple(generador.uniform(0, _RUIDO_LONGITUD) for _ in range(3))
+        _fases_oscilacion[semilla] = fases
+
+    return fases
+
+
+def semilla_objeto(obj):
+    """Semilla de oscilación del objeto; si no tiene, se deriva de su nombre."""
+    return obj.semilla_oscilacion or (zlib.crc32(obj.name.encode()) & 0x7FFFFFFF) or 1
+
+
+def _muestra_ruido(tabla, t):
+    """Valor de una tabla de ruido en t, con interpolación lineal."""
+    x = (t % _RUIDO_LONGITUD) * _RUIDO_MUESTRAS_POR_UNIDAD
+    i = int(x)
+    f = x - i
+    # Con t negativo muy pequeño el módulo puede redondear a _RUIDO_LONGITUD;
+    # la tabla es periódica, así que esa muestra es la primera
+    i %= len(tabla) - 1
+    return tabla[i] + (tabla[i + 1] - tabla[i]) * f
+
+
+def get_random_oscillation(frame, frequency, amplitude, axes, semilla=0):
     """
     Parámetros:
     ----------
@@ -118,6 +266,10 @@ def get_random_oscillation(frame, frequency, amplitude, axes):
         Una lista de ejes ('X', 'Y', 'Z') en los que se aplicará la oscilación. Por ejemplo,
         si se pasa `['X', 'Z']`, la oscilación solo afectará a los ejes X y Z.
 
+    semilla : int
+        Semilla del objeto (ver `semilla_objeto`). Cada semilla lee las tablas de
+        ruido con un desfase distinto, de modo que dos objetos no oscilan igual.
+
     Retorno:
     -------
     osc_values : dict[str, float]    
@@ -126,16 +278,16 @@ def get_random_oscillation(frame, frequency, amplitude, axes):
     t = frame * frequency
     osc_values = {'X': 0.0, 'Y': 0.0, 'Z': 0.0}
 
-    # Genera el valor de ruido para cada eje especificado en `axes`
-    if 'X' in axes:
-        osc_values['X'] = amplitude * \
-            noise.noise([t, 0.0, 0.0])  # Ruido en el eje X
-    if 'Y' in axes:
-        osc_values['Y'] = amplitude * \
-            noise.noise([0.0, t, 0.0])  # Ruido en el eje Y
-    if 'Z' in axes:
-        osc_values['Z'] = amplitude * \
-            noise.noise([0.0, 0.0, t])  # Ruido en el eje Z
+    if not axes:
+        return osc_values
+
+    tablas = tablas_ruido()
+    fases = fases_oscilacion(semilla)
+
+    # Lee el ruido de cada eje especificado en `axes` de su tabla
+    for k, eje in enumerate(('X', 'Y', 'Z')):
+        if eje in axes:
+            osc_values[eje] = amplitude * _muestra_ruido(tablas[k], t + fases[k])
 
     return osc_values
 
@@ -236,132 +388,280 @@ def get_posicion2(frm, obj, coord):
     - HERMITE: Interpolación Hermite que utiliza velocidades evaluadas en los keyframes.
     '''
 
-    # Obtiene la curva de animación
-    c = obj.animation_data.action.fcurves.find('location', index=coord)
+    # Instantánea de los keyframes del objeto (se reconstruye solo si cambia la acción)
+    indice = indice_keyframes(obj)
 
-    if not c:
+    if indice is None or indice.fcurves[coord] is None:
         print("Curva de animación no encontrada.")
         return 0.0
 
-    # Si hay menos de dos keyframes, devolver la posición del único keyframe
-    if len(c.keyframe_points) == 1:
-        return c.keyframe_points[0].co[1]
+    # Con un solo keyframe no hay nada que interpolar ni frame que ajustar
+    if len(indice.tiempos_lista[coord]) == 1:
+        return indice.valores_lista[coord][0]
 
     frm = change_frame(obj, frm)
-    # print("Nuevo FRAME -->", frm)
-    # Si el frame es menor que el primer keyframe, devolver el valor del primer keyframe
-    if frm < c.keyframe_points[0].co[0]:
-        # print("El frame está antes del primer keyframe.")
-        return c.keyframe_points[0].co[1]
-
-    # Si el frame es mayor que el último keyframe, devolver el valor del último keyframe
-    if frm > c.keyframe_points[-1].co[0]:
-        # print("El frame está después del último keyframe.")
-        return c.keyframe_points[-1].co[1]
-
-    prev_kf = None
-    next_kf = None
-
-    # Encontrar los dos keyframes entre los que se encuentra el frame actual
-    for i in range(len(c.keyframe_points) - 1):
-        kf1 = c.keyframe_points[i]
-        kf2 = c.keyframe_points[i + 1]
-
-        if kf1.co[0] <= frm <= kf2.co[0]:
-            anterior_kf = c.keyframe_points[i - 1] if i > 0 else None
-            prev_kf = kf1
-            next_kf = kf2
-            posterior_kf = c.keyframe_points[i + 2] if i + \
-                2 < len(c.keyframe_points) else None
-            break
-
-    # Manejo de casos fuera de los keyframes
-    if prev_kf is None or next_kf is None:
-        print("El frame está fuera de los keyframes")
-        return None  # Retornar None si el frame está fuera de los keyframes
-
-    # Dependiendo del método de interpolación seleccionado, se elige el algoritmo
-    selected_interpolation = bpy.context.scene.selected_shape
-
-    if selected_interpolation == 'LINEAL':
-        pos = interpola.lineal(
-            frm, prev_kf.co[0], next_kf.co[0], prev_kf.co[1], next_kf.co[1])
-
-    elif selected_interpolation == 'CATMULL-ROM':
-        tension = bpy.context.scene.tension  # Obtener la tensión desde el panel
-
-        if len(c.keyframe_points) >= 2:
-            # Estos pueden ser keyframes anteriores y siguientes a los actuales
-            p0 = anterior_kf.co[1] if anterior_kf is not None else prev_kf.co[1]
-            p1 = prev_kf.co[1]
-            p2 = next_kf.co[1]
-            p3 = posterior_kf.co[1] if posterior_kf is not None else next_kf.co[1]
-
-            # Lo mismo con los tiempos
-            t0 = anterior_kf.co[0] if anterior_kf is not None else prev_kf.co[0]
-            t1 = prev_kf.co[0]
-            t2 = next_kf.co[0]
-            t3 = posterior_kf.co[0] if posterior_kf is not None else next_kf.co[0]
-
-            # Realizar la interpolación
-            pos = interpola.catmull_rom(
-                frm, t0, t1, t2, t3, p0, p1, p2, p3, tension)
-            # print("NUEVA POS -->", pos)
-
-    elif selected_interpolation == 'HERMITE':
-        # Buscar la fCurve de velocidad del objeto
-        velocity_fcurve = None
-        if obj.animation_data and obj.animation_data.action:
-            for fcurve in obj.animation_data.action.fcurves:
-                if fcurve.data_path == 'velocity':
-                    velocity_fcurve =  obj.animation_data.action.fcurves.find('velocity', index=coord)
-                    break
-
-        # Evaluar las velocidades en los keyframes previos y siguientes
-        if velocity_fcurve is not None:
-            # Evaluar la velocidad en t0
-            v0 = velocity_fcurve.evaluate(prev_kf.co[0])
-            # Evaluar la velocidad en t1
-            v1 = velocity_fcurve.evaluate(next_kf.co[0])
-        else:
-            v0 = 0.0
-            v1 = 0.0
-
-        # Asegurarse de que t0 y t1 no son iguales para evitar división por cero en Hermite
-        if prev_kf.co[0] != next_kf.co[0]:
-            # Llamar a la función Hermite con las velocidades adecuadas
-            pos = interpola.hermite(
-                frm,                    # El tiempo del frame actual
-                prev_kf.co[0],          # t0: tiempo del keyframe previo
-                next_kf.co[0],          # t1: tiempo del keyframe siguiente
-                prev_kf.co[1],          # p0: valor en el keyframe previo
-                next_kf.co[1],          # p1: valor en el keyframe siguiente
-                # v0 ajustado al intervalo de tiempo entre t0 y t1
-                v0 * (next_kf.co[0] - prev_kf.co[0]),
-                # v1 ajustado al intervalo de tiempo entre t0 y t1
-                v1 * (next_kf.co[0] - prev_kf.co[0])
-            )
 
-        else:
-            # Si t0 y t1 son iguales, devuelve el valor del keyframe sin interpolación
-            pos = prev_kf.co[1]
+    # Los keyframes se compilan a polinomios cúbicos por segmento y se reutilizan
+    # mientras no cambien la acción, el método o la tensión; fuera del rango de
+    # keyframes se mantiene el valor del extremo
+    pos, dentro = indice.evalua_eje(
+        coord, frm, bpy.context.scene.selected_shape, bpy.context.scene.tension)
+    if not dentro:
+        return pos
 
      # Obtener los valores de las propiedades de oscilación
     frecuencia = bpy.context.scene.oscillation_frequency
     amplitud = bpy.context.scene.oscillation_amplitude
     axis = bpy.context.scene.oscillation_axes
 
-    osc_values = get_random_oscillation(frm, frecuencia, amplitud, axis)
-    if coord == 0:  # Eje X
-        pos += osc_values['X']
-    elif coord == 1:  # Eje Y
-        pos += osc_values['Y']
-    elif coord == 2:  # Eje Z
-        pos += osc_values['Z']
+    osc_values = get_random_oscillation(frm, frecuencia, amplitud, axis, semilla_objeto(obj))
+    return pos + osc_values['XYZ'[coord]]
+
+
+def get_posicion_xyz(frm, obj):
+    '''
+    Obtiene la posición interpolada de un objeto en los tres ejes a la vez.
+
+    Equivale a llamar a `get_posicion2` para X, Y y Z, pero la búsqueda del índice,
+    el ajuste de frame (`change_frame`) y la oscilación se calculan una sola vez.
+
+    Parámetros:
+    ----------
+    frm : float
+        El número del frame actual.
+    obj : bpy.types.Object
+        El objeto para el cual se desea calcular la posición.
+
+    Retorno:
+    -------
+    tuple[float, float, float]
+        La posición (x, y, z) del objeto.
+    '''
+    indice = indice_keyframes(obj)
+
+    if indice is None:
+        print("Curva de animación no encontrada.")
+        return (0.0, 0.0, 0.0)
+
+    if any(fc is None for fc in indice.fcurves):
+        print("Curva de animación no encontrada.")
+
+    scene = bpy.context.scene
+
+    # El ajuste de frame solo hace falta si algún eje se interpola
+    frm_ajustado = change_frame(obj, frm) if indice.interpolable else frm
+    pos, dentro = indice.posicion(frm_ajustado, scene.selected_shape, scene.tension)
+
+    # La oscilación solo se suma a los ejes que están dentro de su ruta
+    if any(dentro):
+        osc_values = get_random_oscillation(
+            frm_ajustado, scene.oscillation_frequency,
+            scene.oscillation_amplitude, scene.oscillation_axes,
+            semilla_objeto(obj))
+        for coord, eje in enumerate('XYZ'):
+            if dentro[coord]:
+                pos[coord] += osc_values[eje]
+
+    return tuple(pos)
+
+
+# Posiciones (x, y, z) por (objeto, frame, versión de ajustes, rango de frames)
+_cache_posiciones = CacheAcotada(65536)
+
+
+def rango_escena():
+    '''
+    Rango de frames de la escena. Con control de velocidad la posición depende de
+    él (`change_frame`), así que forma parte de las claves de las cachés por frame.
+    '''
+    scene = bpy.context.scene
+    return (scene.frame_start, scene.frame_end)
+
+
+def evalua_posicion(obj, frm):
+    '''
+    Devuelve la posición (x, y, z) de `obj` en `frm`, calculándola una sola vez
+    por objeto, frame, versión de los ajustes y rango de frames de la escena.
+    '''
+    clave = (obj.name, frm, _version_ajustes, rango_escena())
+
+    pos = _cache_posiciones.get(clave)
+    if pos is None:
+        pos = get_posicion_xyz(frm, obj)
+        _cache_posiciones.put(clave, pos)
 
     return pos
 
 
+def get_posicion_memo(frm, obj, coord):
+    '''
+    Función de driver para `location`: los drivers de X, Y y Z comparten la
+    posición calculada por `evalua_posicion`.
+    '''
+    return evalua_posicion(obj, frm)[coord]
+
+
+class IndiceKeyframes(trayectoria.KeyframesTrayectoria):
+    '''
+    Instantánea de la animación de un objeto preparada para evaluar drivers.
+
+    Lee los keyframes de `location` de la acción y delega la búsqueda de
+    segmentos, la interpolación y la longitud de arco en
+    `trayectoria.KeyframesTrayectoria`. Añade las fCurves ya resueltas
+    (posición, velocidad y distancias) y la tabla de longitud recorrida.
+
+    El índice es válido mientras no cambie la acción; `indice_keyframes` se
+    encarga de reconstruirlo cuando la acción se edita o se sustituye.
+
+    Atributos:
+    ----------
+    accion : int
+        Puntero de la acción a partir de la que se construyó el índice.
+    nombre_accion : str
+        Nombre de esa acción, para invalidar el índice cuando se edita.
+    fcurves : list[bpy.types.FCurve | None]
+        fCurves de `location` por eje.
+    fcurves_velocidad : list[bpy.types.FCurve | None]
+        fCurves de `velocity` por eje (interpolación Hermite).
+    fcurve_distancia_deseada, fcurve_distancia_recorrida : bpy.types.FCurve | None
+        fCurves usadas por el control de velocidad.
+    '''
+
+    def __init__(self, accion):
+        fcurves = accion.fcurves
+
+        self.accion = accion.as_pointer()
+        self.nombre_accion = accion.name
+
+        self.fcurves = [fcurves.find('location', index=k) for k in range(3)]
+        self.fcurves_velocidad = [fcurves.find('velocity', index=k) for k in range(3)]
+        self.fcurve_distancia_deseada = fcurves.find('distancia_deseada')
+        self.fcurve_distancia_recorrida = fcurves.find('distancia_recorrida')
+
+        tiempos = []
+        valores = []
+        for fc in self.fcurves:
+            n = len(fc.keyframe_points) if fc is not None else 0
+            co = np.empty(2 * n, dtype=float)
+            if n:
+                fc.keyframe_points.foreach_get('co', co)
+            tiempos.append(co[0::2].copy())
+            valores.append(co[1::2].copy())
+
+        super().__init__(tiempos, valores)
+
+        self._tablas_longitud = {}
+
+    def velocidades(self, coord):
+        '''
+        Velocidades de la fCurve `velocity` evaluadas en los tiempos de los
+        keyframes de posición (None si no existe).
+        '''
+        velocity_fcurve = self.fcurves_velocidad[coord]
+        if velocity_fcurve is None:
+            return None
+        return [velocity_fcurve.evaluate(t) for t in self.tiempos_lista[coord]]
+
+    def tabla_longitud(self, frame_start, frame_end):
+        '''
+        Devuelve la tabla de longitud recorrida para un rango de frames.
+        '''
+        clave = (frame_start, frame_end)
+
+        tabla = self._tablas_longitud.get(clave)
+        if tabla is None:
+            tabla = TablaLongitud.desde_fcurve(
+                self.fcurve_distancia_recorrida, frame_start, frame_end)
+            self._tablas_longitud[clave] = tabla
+
+        return tabla
+
+
+# Índices de keyframes por nombre de objeto
+_indices_keyframes = {}
+
+
+def indice_keyframes(obj):
+    '''
+    Devuelve el índice de keyframes de `obj`, construyéndolo si no existe o si la
+    acción del objeto ha cambiado.
+
+    Parámetros:
+    ----------
+    obj : bpy.types.Object
+        El objeto animado.
+
+    Retorno:
+    -------
+    IndiceKeyframes | None
+        El índice, o None si el objeto no tiene acción.
+    '''
+    if not obj.animation_data or not obj.animation_data.action:
+        return None
+
+    accion = obj.animation_data.action
+    indice = _indices_keyframes.get(obj.name)
+
+    if indice is None or indice.accion != accion.as_pointer():
+        indice = IndiceKeyframes(accion)
+        _indices_keyframes[obj.name] = indice
+        incrementa_version_ajustes()
+
+    return indice
+
+
+def invalida_indice(obj=None):
+    '''
+    Descarta el índice de keyframes de `obj` (o de todos los objetos si es None).
+
+    Debe llamarse tras modificar keyframes sin pasar por el depsgraph.
+    '''
+    if obj is None:
+        _indices_keyframes.clear()
+    else:
+        _indices_keyframes.pop(obj.name, None)
+
+    incrementa_version_ajustes()
+
+
+@persistent
+def _invalida_indices_editados(scene, depsgraph):
+    '''
+    Handler de `depsgraph_update_post`: invalida los índices cuya acción se ha
+    editado y vuelve a evaluar sus objetos para que los drivers no usen datos
+    antiguos.
+    '''
+    editadas = {update.id.name for update in depsgraph.updates
+                if isinstance(update.id, bpy.types.Action)}
+    if not editadas:
+        return
+
+    for nombre, indice in list(_indices_keyframes.items()):
+        if indice.nombre_accion in editadas:
+            del _indices_keyframes[nombre]
+            incrementa_version_ajustes()
+            obj = bpy.data.objects.get(nombre)
+            if obj is not None:
+                obj.update_tag(refresh={'OBJECT'})
+
+
+@persistent
+def _invalida_todos_los_indices(*args):
+    '''
+    Handler de carga de archivo y deshacer/rehacer: los punteros de las acciones
+    dejan de ser válidos, así que se descartan todos los índices.
+    '''
+    invalida_indice()
+
+
+_handlers_indices = (
+    (bpy.app.handlers.depsgraph_update_post, _invalida_indices_editados),
+    (bpy.app.handlers.load_post, _invalida_todos_los_indices),
+    (bpy.app.handlers.undo_post, _invalida_todos_los_indices),
+    (bpy.app.handlers.redo_post, _invalida_todos_los_indices),
+)
+
+
 def change_frame(obj, frm):
     """
     Ajusta el fotograma en función de la distancia deseada y la reparametrización de la curva.
@@ -377,8 +677,9 @@ def change_frame(obj, frm):
 
     if obj.control_vel:
 
-        fc = obj.animation_data.action.fcurves.find("distancia_deseada")
-        print("CAMBIANDO FRAME -->", frm)
+        indice = indice_keyframes(obj)
+        fc = indice.fcurve_distancia_deseada if indice is not None else None
+        # print("CAMBIANDO FRAME -->", frm)
 
         if fc is None:
             long = 0
@@ -391,42 +692,26 @@ def change_frame(obj, frm):
 
 
 def frame_desde_longitud(obj, long):
-    fcLongRec = obj.animation_data.action.fcurves.find("distancia_recorrida")
+    '''
+    Devuelve el frame en el que el objeto ha recorrido la longitud `long`.
+
+    Usa la tabla de longitudes del índice de keyframes, que solo se reconstruye
+    cuando cambia la trayectoria (la acción) o el rango de frames de la escena.
+    '''
+    indice = indice_keyframes(obj)
 
-    if not fcLongRec:
+    if indice is None or not indice.fcurve_distancia_recorrida:
         print("Fcurve no encontrada")
         return None
 
     # Utilizar los rangos de frame de la escena
-    frame_start = bpy.context.scene.frame_start
-    frame_end = bpy.context.scene.frame_end
-
-    last_value = None
-    last_frame = None
-
-    for frm in range(frame_start, frame_end + 1):
-        current_value = fcLongRec.evaluate(frm)
-
-        if current_value == long:
-            print("FRAME -->", frm, "LONGITUD -->", long)
-            return frm
-
-        if last_value is not None and ((last_value < long and current_value > long) or (last_value > long and current_value < long)):
-            # f(x) = x0 + (x - y0) * ((x1 - x0) / (y1 - y0))
-            # Aquí, long es t, last_value es y0, current_value es y1, last_frame es t0 y frm es t1
-            frm_interpolado = last_frame + \
-                ((long - last_value) * (frm - last_frame) /
-                 (current_value - last_value))
-            print("FRAME interpolado -->", frm_interpolado, "LONGITUD -->", long)
-            return frm_interpolado
-
-        last_value = current_value
-        last_frame = frm
+    scene = bpy.context.scene
+    tabla = indice.tabla_longitud(scene.frame_start, scene.frame_end)
 
-    print("No se pudo encontrar un frame adecuado para la longitud dada.")
-    return last_frame
+    return tabla.frame(long, scene.interpolacion_longitud)
 
 
+@trazas.traza(categoria="trayectoria")
 def longitud_recorrida(obj):
     """
     Calcula la distancia acumulada recorrida por un objeto frame a frame 
@@ -441,20 +726,23 @@ def longitud_recorrida(obj):
 
     Descripción:
     ------------
-    - Este método recorre todos los frames de la animación, desde `frame_start` 
-      hasta `frame_end`, y calcula la distancia entre la posición actual y 
-      la posición del frame anterior.
+    - La longitud se obtiene integrando la rapidez |dP/dt| de los polinomios de
+      cada segmento (`LongitudArco`), no sumando cuerdas entre frames. La
+      oscilación aleatoria no forma parte de la ruta y no se incluye.
+    - Se muestrea la longitud acumulada en cada frame, desde `frame_start`
+      hasta `frame_end`.
     - La distancia acumulada se almacena en la propiedad personalizada 
       `distancia_recorrida` del objeto.
-    - Inserta un keyframe en cada frame para la propiedad `distancia_recorrida`, 
-      permitiendo visualizar el cambio de esta propiedad en la línea de tiempo.
+    - Escribe un keyframe en cada frame para la propiedad `distancia_recorrida`
+      (con `fcurves_lote`, en bloque), permitiendo visualizar el cambio de esta
+      propiedad en la línea de tiempo.
 
     Notas:
     ------
     - La propiedad `distancia_recorrida` debe estar previamente registrada 
       como un `FloatProperty` en el objeto.
-    - La función utiliza un método auxiliar `get_posicion2` para obtener 
-      las posiciones del objeto en los ejes X, Y, Z en un frame dado.
+    - Las longitudes por segmento quedan en caché en el índice de keyframes
+      hasta que cambie la trayectoria.
 
     Retorno:
     --------
@@ -464,42 +752,28 @@ def longitud_recorrida(obj):
 
     """
 
-    distancia_acumulada = 0.0
-
     scene = bpy.context.scene
     frame_start = scene.frame_start
     frame_end = scene.frame_end
 
-    pos_anterior_x = pos_anterior_y = pos_anterior_z = None
-
-    for frm in range(frame_start, frame_end + 1):
-        pos_actual_x = get_posicion2(frm, obj, 0)
-        pos_actual_y = get_posicion2(frm, obj, 1)
-        pos_actual_z = get_posicion2(frm, obj, 2)
-
-        if frm == frame_start:
-            pos_anterior_x = pos_actual_x
-            pos_anterior_y = pos_actual_y
-            pos_anterior_z = pos_actual_z
-
-        distancia = math.sqrt(
-            (pos_actual_x - pos_anterior_x) ** 2 +
-            (pos_actual_y - pos_anterior_y) ** 2 +
-            (pos_actual_z - pos_anterior_z) ** 2
-        )
-
-        distancia_acumulada += distancia
+    indice = indice_keyframes(obj)
+    if indice is None:
+        print("El objeto no tiene datos de animación.")
+        return 0.0
 
-        obj.distancia_recorrida = distancia_acumulada
+    motor = indice.longitud_arco(
+        scene.selected_shape, scene.tension, scene.tolerancia_longitud)
+    frames = list(range(frame_start, frame_end + 1))
+    longitudes = motor.tabla(frames)
 
-        obj.keyframe_insert(data_path="distancia_recorrida", frame=frm)
+    distancia_acumulada = longitudes[-1] if longitudes else 0.0
+    obj.distancia_recorrida = distancia_acumulada
 
-        pos_anterior_x = pos_actual_x
-        pos_anterior_y = pos_actual_y
-        pos_anterior_z = pos_actual_z
+    # Todos los keyframes de `distancia_recorrida` en una sola escritura
+    fcurves_lote.escribe_fcurve(obj, "distancia_recorrida", frames, longitudes)
+    invalida_indice(obj)
 
-        print(
-            f"FRAME --> {frm}, DISTANCIA ACUMULADA --> {distancia_acumulada}")
+    print(f"DISTANCIA TOTAL --> {distancia_acumulada}")
 
     return distancia_acumulada
 
@@ -518,11 +792,7 @@ def get_lat_vec(t):
         mathutils.Vector
             El vector lateral calculado.
     '''
-    z = mathutils.Vector((0, 0, 1))
-    l = z.cross(t)
-    l = l.normalized()
-
-    return l
+    return mathutils.Vector(trayectoria.vector_lateral(t))
 
 
 def get_up_vec(t, l):
@@ -543,13 +813,7 @@ def get_up_vec(t, l):
     mathutils.Vector
         El vector "up" (arriba) calculado.
     '''
-    up = t.cross(l)
-    up = up.normalized()
-
-    if up.z < 0:
-        up = -up
-
-    return up
+    return mathutils.Vector(trayectoria.vector_arriba(t, l))
 
 
 def get_quad_from_vecs(e, t):
@@ -574,31 +838,10 @@ def get_quad_from_vecs(e, t):
     Maneja los casos especiales en los que los vectores son iguales, opuestos o tienen longitud cero.
 
     '''
-    e = e.normalized()
-    t = t.normalized()
-
     if e.length == 0 or t.length == 0:
         print("Error: Uno de los vectores tiene longitud cero.")
-        return mathutils.Quaternion((1, 0, 0, 0))  # Cuaternión identidad
-
-    if e == t:
-        return mathutils.Quaternion((1, 0, 0, 0))  # Rotación de 0 grados
-
-    if e == -t:
-        axis = e.orthogonal().normalized()
-        # Rotación de 180 grados
-        return mathutils.Quaternion(axis, 3.141592653589793)
-
-    # Eje de rotación
-    v = e.cross(t).normalized()
 
-    # Ángulo de rotación
-    angle = e.angle(t)
-
-    # Construir el cuaternión
-    q = mathutils.Quaternion(v, angle)
-
-    return q
+    return mathutils.Quaternion(trayectoria.cuaternion_entre(e, t))
 
 
 def get_quat_rot(e, t, up, angle_q3, angle_gir, obj):
@@ -630,42 +873,12 @@ def get_quat_rot(e, t, up, angle_q3, angle_gir, obj):
     Esta función calcula el cuaternión de rotación total para un objeto en Blender, alineando su orientación con la trayectoria y
     aplicando inclinación lateral en las curvas. El cálculo se realiza en tres pasos principales:
     '''
-    e = e.normalized()
-    t = t.normalized()
-    up = up.normalized()
-
-    if obj.eje_arriba == 'X':
-        e3 = mathutils.Vector((1, 0, 0))
-    elif obj.eje_arriba == 'Y':
-        e3 = mathutils.Vector((0, 1, 0))
-    elif obj.eje_arriba == 'Z':
-        e3 = mathutils.Vector((0, 0, 1))
-    elif obj.eje_arriba == '-X':
-        e3 = mathutils.Vector((-1, 0, 0))
-    elif obj.eje_arriba == '-Y':
-        e3 = mathutils.Vector((0, -1, 0))
-    elif obj.eje_arriba == '-Z':
-        e3 = mathutils.Vector((0, 0, -1))
-    # Primer cuaternión: alinear e con t
-    q1 = get_quad_from_vecs(e, t)
-
-    e3_rot = q1 @ e3
-    e3_rot = e3_rot.normalized()
-
-    q2 = get_quad_from_vecs(e3_rot, up)
-
-    if abs(angle_gir) > 0.00:
-        if angle_gir > 0:
-            q3 = mathutils.Quaternion(t, angle_q3 * angle_gir)
-            return q3 @ q2 @ q1
-        elif angle_gir < 0:
-            q3 = mathutils.Quaternion(t, -angle_q3 * -angle_gir)
-            return q3 @ q2 @ q1
-    else:
-        return q2 @ q1
+    e3 = trayectoria.EJES[obj.eje_arriba]
+    return mathutils.Quaternion(
+        trayectoria.cuaternion_rotacion(e, t, up, angle_q3, angle_gir, e3))
 
 
-def get_quaternion(frm, obj, coord):
+def calcula_quaternion(frm, obj):
     '''
     Calcula el cuaternión de rotación necesario para alinear un objeto a lo largo de una trayectoria interpolada,
     considerando la orientación y posibles inclinaciones laterales.
@@ -676,95 +889,77 @@ def get_quaternion(frm, obj, coord):
         El número de frame actual.
     obj : bpy.types.Object
         El objeto de Blender cuyo cuaternión de rotación se va a calcular.
-    coord : int
-        Índice de la componente del cuaternión a devolver:
-        - 0 para `w`
-        - 1 para `x`
-        - 2 para `y`
-        - 3 para `z`
 
     Retorno:
     -------
-    float
-        Componente del cuaternión correspondiente al índice `coord`.
+    tuple[float, float, float, float]
+        Componentes (w, x, y, z) del cuaternión.
 
     Descripción:
     ------------
     La función utiliza las posiciones interpoladas del objeto en los frames actual, anterior y siguiente
     para calcular vectores tangentes a la trayectoria. Estos vectores se usan para alinear la orientación
-    del objeto y aplicar rotaciones adicionales si es necesario.
+    del objeto y aplicar rotaciones adicionales si es necesario. Las posiciones se leen de
+    `evalua_posicion`, así que los frames vecinos se comparten con los drivers de posición y con
+    los frames contiguos.
     '''
-    pos_actual_x = get_posicion2(frm + 1, obj, 0)
-    pos_actual_y = get_posicion2(frm + 1, obj, 1)
-    pos_actual_z = get_posicion2(frm + 1, obj, 2)
+    q = trayectoria.cuaternion_trayectoria(
+        evalua_posicion(obj, frm - 1), evalua_posicion(obj, frm), evalua_posicion(obj, frm + 1),
+        trayectoria.EJES.get(obj.eje_alineacion, (0.0, 0.0, 0.0)),
+        trayectoria.EJES[obj.eje_arriba], obj.angulo_rotacion)
 
-    v_actual = mathutils.Vector((pos_actual_x, pos_actual_y, pos_actual_z))
+    if q is None:
+        # El objeto no avanza: se mantiene la rotación actual
+        current_rotation = obj.rotation_quaternion
+        return (current_rotation.w, current_rotation.x, current_rotation.y, current_rotation.z)
 
-    pos_anterior_x = get_posicion2(frm, obj, 0)
-    pos_anterior_y = get_posicion2(frm, obj, 1)
-    pos_anterior_z = get_posicion2(frm, obj, 2)
+    return q
 
-    v_anterior = mathutils.Vector(
-        (pos_anterior_x, pos_anterior_y, pos_anterior_z))
 
-    pos_previa = mathutils.Vector((
-        get_posicion2(frm - 1, obj, 0),
-        get_posicion2(frm - 1, obj, 1),
-        get_posicion2(frm - 1, obj, 2)
-    ))
+# Cuaterniones (w, x, y, z) por (objeto, frame, versión de ajustes, rango de frames)
+_cache_quaterniones = CacheAcotada(65536)
 
-    if v_actual is None or v_anterior is None:
-        # print("Error: v_actual o v_anterior es None.")
-        return None
 
-    t = calculate_vector_director(v_anterior, v_actual)
-    t_anterior = calculate_vector_director(pos_previa, v_anterior)
-    if t_anterior.length == 0:
-        t_anterior = t
+def evalua_quaternion(obj, frm):
+    '''
+    Devuelve el cuaternión (w, x, y, z) de `obj` en `frm`, calculándolo una sola
+    vez por objeto, frame, versión de los ajustes y rango de frames de la escena
+    (se calcula con las posiciones de los frames vecinos, que dependen de él).
+    '''
+    clave = (obj.name, frm, _version_ajustes, rango_escena())
 
-    angle_gir = angle_in_xy_plane(t, t_anterior)
+    q = _cache_quaterniones.get(clave)
+    if q is None:
+        q = calcula_quaternion(frm, obj)
+        _cache_quaterniones.put(clave, q)
 
-    if t.length == 0:
-        # print("VECTOR T tiene longitud 0. Manteniendo la rotación actual.")
-        current_rotation = obj.rotation_quaternion
-        if coord == 0:
-            return current_rotation.w
-        elif coord == 1:
-            return current_rotation.x
-        elif coord == 2:
-            return current_rotation.y
-        elif coord == 3:
-            return current_rotation.z
-
-    e = mathutils.Vector((0, 0, 0))
-    if obj.eje_alineacion == 'X':
-        e = mathutils.Vector((1, 0, 0))
-    elif obj.eje_alineacion == 'Y':
-        e = mathutils.Vector((0, 1, 0))
-    elif obj.eje_alineacion == 'Z':
-        e = mathutils.Vector((0, 0, 1))
-    elif obj.eje_alineacion == '-X':
-        e = mathutils.Vector((-1, 0, 0))
-    elif obj.eje_alineacion == '-Y':
-        e = mathutils.Vector((0, -1, 0))
-    elif obj.eje_alineacion == '-Z':
-        e = mathutils.Vector((0, 0, -1))
-
-    l = get_lat_vec(t)
-    up = get_up_vec(t, l)
-
-    angle_q3 = obj.angulo_rotacion
-
-    q_final = get_quat_rot(e, t, up, angle_q3, angle_gir, obj)
-
-    if coord == 0:
-        return q_final.w
-    elif coord == 1:
-        return q_final.x
-    elif coord == 2:
-        return q_final.y
-    elif coord == 3:
-        return q_final.z
+    return q
+
+
+def get_quaternion(frm, obj, coord):
+    '''
+    Función de driver para `rotation_quaternion`.
+
+    Parámetros:
+    ----------
+    frm : int
+        El número de frame actual.
+    obj : bpy.types.Object
+        El objeto de Blender cuyo cuaternión de rotación se va a calcular.
+    coord : int
+        Índice de la componente del cuaternión a devolver:
+        - 0 para `w`
+        - 1 para `x`
+        - 2 para `y`
+        - 3 para `z`
+
+    Retorno:
+    -------
+    float
+        Componente del cuaternión correspondiente al índice `coord`. Los cuatro
+        drivers comparten el cuaternión calculado por `evalua_quaternion`.
+    '''
+    return evalua_quaternion(obj, frm)[coord]
 
 
 def angle_in_xy_plane(v1, v2):
@@ -790,30 +985,7 @@ def angle_in_xy_plane(v1, v2):
     entre ellos. Luego, utiliza el producto cruzado para determinar la dirección del ángulo, es decir, si el
     giro es en sentido horario o antihorario.
     '''
-
-    # Proyectar los vectores sobre el plano XY
-    v1_proj = mathutils.Vector((v1.x, v1.y, 0))  # Ignorar la componente Z
-    v2_proj = mathutils.Vector((v2.x, v2.y, 0))  # Ignorar la componente Z
-
-    if v1_proj.length == 0 or v2_proj.length == 0:
-        # print("Advertencia: Uno de los vectores tiene longitud cero.")
-        return 0.0  # Devuelve 0 grados como caso especial
-
-    # Normalizar los vectores proyectados para evitar problemas con la longitud
-    v1_proj.normalize()
-    v2_proj.normalize()
-
-    # Calcular el ángulo entre los vectores proyectados
-    angle = v1_proj.angle(v2_proj)
-
-    # Determinar la dirección del ángulo con el producto cruzado
-    # Tomar solo la componente Z del producto cruzado
-    cross_z = v1_proj.cross(v2_proj).z
-
-    if cross_z < 0:  # Si es negativo, el ángulo es en sentido horario
-        angle = -angle
-
-    return angle
+    return trayectoria.angulo_en_plano_xy(v1, v2)
 
 
 def calculate_vector_director(position_current, position_next):
@@ -839,16 +1011,7 @@ def calculate_vector_director(position_current, position_next):
     El vector resultante es normalizado para obtener un vector unitario que conserva únicamente la dirección, 
     eliminando cualquier efecto de la magnitud original.
     '''
-
-    vector_director = position_next - position_current
-
-    if vector_director.length == 0:
-        # print("Error: v_anterior y v_acutual son iguales. No se puede calcular un vector director.")
-        return mathutils.Vector((0, 0, 0))
-
-    vector_director = vector_director.normalized()
-
-    return vector_director
+    return mathutils.Vector(trayectoria.vector_director(position_current, position_next))
 
 
 def sincronizar_keyframes_velocidad(obj):
@@ -876,42 +1039,39 @@ def sincronizar_keyframes_velocidad(obj):
         print("El objeto no tiene datos de animación.")
         return
 
-    # Recorrer todas las fCurves para encontrar las que son de 'location'
-    fcurves_location = [
-        fcurve for fcurve in obj.animation_data.action.fcurves if "location" in fcurve.data_path]
+    fcurves = obj.animation_data.action.fcurves
+    fcurves_location = [fcurves.find('location', index=i) for i in range(3)]
 
-    if not fcurves_location:
+    if not any(fcurves_location):
         print("No se encontraron fCurves de ubicación.")
         return
 
-    # Asumimos que tenemos las fcurves para x, y, z en la lista
     for i, fcurve in enumerate(fcurves_location):
-        keyframes = fcurve.keyframe_points
+        if fcurve is None or len(fcurve.keyframe_points) < 2:
+            continue
 
-        for k in range(len(keyframes) - 1):
-            kf1 = keyframes[k]
-            kf2 = keyframes[k + 1]
-
-            frame1 = kf1.co[0]
-            frame2 = kf2.co[0]
-
-            pos1 = kf1.co[1]
-            pos2 = kf2.co[1]
-
-            # Calcular la velocidad como el cambio de posición dividido por el tiempo entre los keyframes
-            tiempo = frame2 - frame1
+        keyframes = fcurve.keyframe_points
+        co = [0.0] * (2 * len(keyframes))
+        keyframes.foreach_get('co', co)
+        frames = co[0::2]
+        posiciones = co[1::2]
+
+        # Calcular la velocidad como el cambio de posición dividido por el tiempo entre los keyframes
+        velocidades = []
+        for k in range(len(frames) - 1):
+            tiempo = frames[k + 1] - frames[k]
             if tiempo != 0:
-                velocidad = (pos2 - pos1) / tiempo
+                velocidades.append((posiciones[k + 1] - posiciones[k]) / tiempo)
             else:
-                velocidad = 0.0
+                velocidades.append(0.0)
 
-            # Solo asignar la velocidad inicial al objeto
-            obj.velocity[i] = velocidad
+        # La propiedad del objeto se queda con la velocidad del último segmento
+        obj.velocity[i] = velocidades[-1]
 
-            # Insertar un keyframe para la propiedad de velocidad en el frame inicial
-            obj.keyframe_insert(data_path="velocity", index=i, frame=frame1)
+        # Un keyframe de velocidad en el frame inicial de cada segmento
+        fcurves_lote.escribe_fcurve(obj, "velocity", frames[:-1], velocidades, index=i)
 
-            # print(f"Keyframe de velocidad insertado en frame {frame1}, velocidad: {velocidad} en coordenada {i}")
+    invalida_indice(obj)
 
 
 def asigna_driver_posicion(obj):
@@ -936,7 +1096,7 @@ def asigna_driver_posicion(obj):
 
     '''
     for coord in range(3):
-        print("coordenada:", coord)
+        # print("coordenada:", coord)
         drv = obj.driver_add('location', coord).driver
         drv.use_self = True
         drv.expression = f"get_pos2(frame, self, {coord})"
@@ -979,6 +1139,117 @@ def asigna_drivers_rotacion(obj):
         var.targets[0].data_path = 'selected_shape'
 
 
+def tiene_drivers_rotacion(obj):
+    '''Indica si el objeto tiene drivers en `rotation_quaternion`.'''
+    return bool(obj.animation_data and
+                obj.animation_data.drivers.find('rotation_quaternion', index=0))
+
+
+@trazas.traza(categoria="trayectoria")
+def bake_trayectoria(obj, frame_start, frame_end, pasos=1):
+    '''
+    Convierte la trayectoria calculada por los drivers en keyframes densos.
+
+    Parámetros:
+    -----------
+    obj : bpy.types.Object
+        El objeto con drivers de posición (y opcionalmente de rotación).
+    frame_start, frame_end : int
+        Rango de frames que se bakea.
+    pasos : int
+        Muestras por frame (1 para muestrear solo frames enteros).
+
+    Retorno:
+    --------
+    bool
+        True si se ha bakeado la trayectoria.
+
+    Descripción:
+    ------------
+    Evalúa posición y rotación en todo el rango con las mismas funciones que los
+    drivers, guarda la acción de la ruta en `accion_ruta`, quita los drivers y
+    escribe el resultado como fCurves lineales en una acción nueva. La
+    reproducción y el render no ejecutan Python en cada frame. La acción de la
+    ruta se conserva para poder deshacer el bake con `desbake_trayectoria`.
+    '''
+    if obj.accion_ruta is not None:
+        print(f"La trayectoria de {obj.name} ya está bakeada.")
+        return False
+
+    if indice_keyframes(obj) is None:
+        print(f"{obj.name} no tiene keyframes de ruta.")
+        return False
+
+    rotacion = tiene_drivers_rotacion(obj)
+
+    n = (frame_end - frame_start) * pasos
+    frames = [frame_start + k / pasos for k in range(n + 1)]
+
+    posiciones = [evalua_posicion(obj, frm) for frm in frames]
+
+    cuaterniones = []
+    if rotacion:
+        for frm in frames:
+            q = evalua_quaternion(obj, frm)
+            # Mantener el signo del cuaternión continuo para que la interpolación
+            # lineal entre muestras no dé la vuelta larga
+            if cuaterniones and sum(a * b for a, b in zip(q, cuaterniones[-1])) < 0:
+                q = tuple(-c for c in q)
+            cuaterniones.append(q)
+
+    for coord in range(3):
+        obj.driver_remove('location', coord)
+    if rotacion:
+        for coord in range(4):
+            obj.driver_remove('rotation_quaternion', coord)
+
+    obj.accion_ruta = obj.animation_data.action
+    obj.rotacion_bakeada = rotacion
+    obj.animation_data.action = bpy.data.actions.new(name=f"{obj.name}Bake")
+
+    fcurves_lote.escribe_fcurves_vector(
+        obj, 'location', frames, posiciones,
+        grupo="Object Transforms", interpolacion='LINEAR')
+    if rotacion:
+        fcurves_lote.escribe_fcurves_vector(
+            obj, 'rotation_quaternion', frames, cuaterniones,
+            grupo="Object Transforms", interpolacion='LINEAR')
+
+    invalida_indice(obj)
+    return True
+
+
+def desbake_trayectoria(obj):
+    '''
+    Deshace `bake_trayectoria`: recupera la acción de la ruta, elimina la acción
+    bakeada y vuelve a asignar los drivers.
+
+    Retorno:
+    --------
+    bool
+        True si el objeto estaba bakeado.
+    '''
+    accion_ruta = obj.accion_ruta
+    if accion_ruta is None:
+        return False
+
+    accion_bake = obj.animation_data.action
+    obj.animation_data.action = accion_ruta
+    obj.accion_ruta = None
+
+    if accion_bake is not None and accion_bake != accion_ruta and accion_bake.users == 0:
+        bpy.data.actions.remove(accion_bake)
+
+    invalida_indice(obj)
+
+    asigna_driver_posicion(obj)
+    if obj.rotacion_bakeada:
+        asigna_drivers_rotacion(obj)
+    obj.rotacion_bakeada = False
+
+    return True
+
+
 class OBJECT_PT_CustomPanel(bpy.types.Panel):
     '''
     Panel de control para los drivers en Blender.
@@ -1064,9 +1335,16 @@ class OBJECT_PT_CustomPanel(bpy.types.Panel):
 
             if obj.control_vel:
                 layout.prop(obj, "distancia_deseada")
+                layout.prop(context.scene, "interpolacion_longitud")
+            layout.prop(context.scene, "tolerancia_longitud")
 
         layout.operator("object.create_trayectoria", text="Crear trayectoria")
 
+        layout.prop(context.scene, "subframes_bake")
+        row = layout.row(align=True)
+        row.operator("object.bake_trayectoria", text="Bake trayectoria")
+        row.operator("object.unbake_trayectoria", text="Restaurar drivers")
+
 
 class OBJECT_OT_CreateTrayectoria(bpy.types.Operator):
     '''
@@ -1139,8 +1417,9 @@ class OBJECT_OT_CreateTrayectoria(bpy.types.Operator):
 
         asigna_drivers_rotacion(context.object)
 
-        bpy.ops.object.paths_calculate(display_type='RANGE', range='SCENE')
-        bpy.ops.object.paths_update_visible()
+        with trazas.tramo("paths_calculate", "trayectoria"):
+            bpy.ops.object.paths_calculate(display_type='RANGE', range='SCENE')
+            bpy.ops.object.paths_update_visible()
 
         self.report({'INFO'}, "Trayectoria creada exitosamente")
         return {'FINISHED'}
@@ -1155,13 +1434,74 @@ class OBJECT_OT_CreateTrayectoria(bpy.types.Operator):
 
         asigna_drivers_rotacion(context.object)
 
-        bpy.ops.object.paths_calculate(display_type='RANGE', range='SCENE')
-        bpy.ops.object.paths_update_visible()
+        with trazas.tramo("paths_calculate", "trayectoria"):
+            bpy.ops.object.paths_calculate(display_type='RANGE', range='SCENE')
+            bpy.ops.object.paths_update_visible()
 
         self.report({'INFO'}, "Trayectoria creada exitosamente")
         return {'FINISHED'}
 
 
+class OBJECT_OT_BakeTrayectoria(bpy.types.Operator):
+    '''
+    Operador para convertir las trayectorias de los objetos seleccionados en keyframes.
+
+    Propósito:
+    ----------
+    Sustituye los drivers de posición y rotación por fCurves densas en el rango de
+    frames de la escena (ver `bake_trayectoria`), de modo que la reproducción y el
+    render no dependan de Python ni de que los scripts automáticos estén permitidos.
+
+    Atributos:
+    ----------
+    - `bl_idname` : str
+        En este caso: "object.bake_trayectoria".
+    - `bl_label` : str
+        En este caso: "Bake trayectoria".
+    '''
+
+    bl_idname = "object.bake_trayectoria"
+    bl_label = "Bake trayectoria"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        scene = context.scene
+        objetos = context.selected_objects or ([context.object] if context.object else [])
+
+        bakeados = 0
+        for obj in objetos:
+            if bake_trayectoria(obj, scene.frame_start, scene.frame_end, scene.subframes_bake):
+                bakeados += 1
+
+        self.report({'INFO'}, f"{bakeados} trayectorias bakeadas")
+        return {'FINISHED'}
+
+
+class OBJECT_OT_UnbakeTrayectoria(bpy.types.Operator):
+    '''
+    Operador para deshacer el bake de los objetos seleccionados y restaurar sus drivers.
+
+    Atributos:
+    ----------
+    - `bl_idname` : str
+        En este caso: "object.unbake_trayectoria".
+    - `bl_label` : str
+        En este caso: "Restaurar drivers".
+    '''
+
+    bl_idname = "object.unbake_trayectoria"
+    bl_label = "Restaurar drivers"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        objetos = context.selected_objects or ([context.object] if context.object else [])
+
+        restaurados = sum(1 for obj in objetos if desbake_trayectoria(obj))
+
+        self.report({'INFO'}, f"{restaurados} trayectorias restauradas")
+        return {'FINISHED'}
+
+
 class OBJECT_PT_VelocityPanel(bpy.types.Panel):
     '''
     Panel personalizado para controlar la velocidad de un objeto en Blender.
@@ -1223,14 +1563,20 @@ def register():
     Esto incluye paneles, operadores, propiedades de escena y funciones utilizadas como drivers.
     '''
 
-    bpy.app.driver_namespace['get_pos2'] = get_posicion2
+    bpy.app.driver_namespace['get_pos2'] = get_posicion_memo
     bpy.app.driver_namespace['get_pos1'] = get_posicion1
     bpy.app.driver_namespace['get_posicion_x_loop'] = get_posicion_x_loop
     bpy.app.driver_namespace['get_posicion_y_loop'] = get_posicion_y_loop
     bpy.app.driver_namespace["get_quaternion"] = get_quaternion
 
+    for handlers, handler in _handlers_indices:
+        if handler not in handlers:
+            handlers.append(handler)
+
     bpy.utils.register_class(OBJECT_PT_CustomPanel)
     bpy.utils.register_class(OBJECT_OT_CreateTrayectoria)
+    bpy.utils.register_class(OBJECT_OT_BakeTrayectoria)
+    bpy.utils.register_class(OBJECT_OT_UnbakeTrayectoria)
     bpy.utils.register_class(OBJECT_PT_VelocityPanel)
 
     print("Definimos Drivers")
@@ -1247,8 +1593,16 @@ def unregister():
     '''
     bpy.utils.unregister_class(OBJECT_PT_CustomPanel)
     bpy.utils.unregister_class(OBJECT_OT_CreateTrayectoria)
+    bpy.utils.unregister_class(OBJECT_OT_BakeTrayectoria)
+    bpy.utils.unregister_class(OBJECT_OT_UnbakeTrayectoria)
     bpy.utils.unregister_class(OBJECT_PT_VelocityPanel)
 
+    for handlers, handler in _handlers_indices:
+        if handler in handlers:
+            handlers.remove(handler)
+
+    invalida_indice()
+
 
 if __name__ == "__main__":
     '''
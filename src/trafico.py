@@ -0,0 +1,199 @@
+import numpy as np
+
+
+"""
+trafico.py
+
+
+Simulación de tráfico con el modelo del conductor inteligente (IDM).
+
+Cada coche avanza por su ruta (la polilínea de esquinas de `crea_ruta`) y, en
+cada frame, acelera o frena según el coche que lleva delante en el mismo carril:
+misma calle, mismo eje y mismo sentido. El estado es un array por magnitud con
+una fila por coche, y cada paso se resuelve con operaciones de NumPy sobre toda
+la flota (el coche de delante se encuentra ordenando por carril y avance).
+
+Las distancias están en celdas de la cuadrícula y el tiempo en frames. El
+módulo no depende de Blender.
+
+
+Autores: Grupo 5.
+"""
+
+
+def prepara_rutas(rutas):
+    """
+    Agrupa rutas de distinta longitud en arrays rectangulares.
+
+    Parámetros:
+    ----------
+    rutas : list[array_like]
+        Puntos (i, j) de cada ruta, forma (m_k, 2) con m_k >= 2.
+
+    Retorno:
+    -------
+    tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]
+        Puntos (n, m, 2) y longitudes acumuladas (n, m) de cada ruta, rellenados
+        repitiendo el último punto, y longitud total (n,) de cada ruta.
+    """
+    n = len(rutas)
+    m = max(len(ruta) for ruta in rutas)
+
+    puntos = np.empty((n, m, 2))
+    for k, ruta in enumerate(rutas):
+        ruta = np.asarray(ruta, dtype=float)
+        if len(ruta) < 2:
+            raise ValueError("Cada ruta necesita al menos dos puntos.")
+        puntos[k, :len(ruta)] = ruta
+        puntos[k, len(ruta):] = ruta[-1]
+
+    tramos = np.abs(np.diff(puntos, axis=1)).sum(axis=2)
+    acumuladas = np.concatenate((np.zeros((n, 1)), np.cumsum(tramos, axis=1)), axis=1)
+
+    return puntos, acumuladas, acumuladas[:, -1].copy()
+
+
+def carriles(s, puntos, acumuladas):
+    """
+    Carril y avance de cada coche a una distancia `s` de su ruta.
+
+    Los tramos de las rutas son paralelos a los ejes, así que un carril queda
+    definido por el eje del tramo, la calle (la coordenada fija) y el sentido.
+
+    Retorno:
+    -------
+    tuple[numpy.ndarray, ...]
+        Eje (0 para X, 1 para Y), calle, sentido (+1/-1) y avance de cada coche
+        en su carril (crece en el sentido de la marcha).
+    """
+    n = len(s)
+    filas = np.arange(n)
+
+    # Último tramo cuyo inicio ya se ha alcanzado (los tramos vacíos se saltan)
+    tramo = (acumuladas[:, 1:-1] <= s[:, None]).sum(axis=1)
+
+    p0 = puntos[filas, tramo]
+    d = puntos[filas, tramo + 1] - p0
+
+    eje = (np.abs(d[:, 1]) > np.abs(d[:, 0])).astype(np.int64)
+    sentido = np.where(d[filas, eje] < 0, -1, 1)
+    calle = np.rint(p0[filas, 1 - eje]).astype(np.int64)
+    avance = sentido * p0[filas, eje] + (s - acumuladas[filas, tramo])
+
+    return eje, calle, sentido, avance
+
+
+def lideres(eje, calle, sentido, avance, activos):
+    """
+    Índice del coche inmediatamente por delante de cada coche en su carril.
+
+    Retorno:
+    -------
+    numpy.ndarray
+        Índice del líder de cada coche, o -1 si no tiene ninguno (o no está
+        activo).
+    """
+    lider = np.full(len(avance), -1, dtype=np.int64)
+
+    idx = np.nonzero(activos)[0]
+    if len(idx) < 2:
+        return lider
+
+    orden = idx[np.lexsort((avance[idx], calle[idx], sentido[idx], eje[idx]))]
+
+    mismo_carril = ((eje[orden[1:]] == eje[orden[:-1]]) &
+                    (calle[orden[1:]] == calle[orden[:-1]]) &
+                    (sentido[orden[1:]] == sentido[orden[:-1]]))
+
+    lider[orden[:-1][mismo_carril]] = orden[1:][mismo_carril]
+
+    return lider
+
+
+def aceleracion_idm(v, dv, hueco, v0, a, b, T, s0, delta=4):
+    """
+    Aceleración del modelo del conductor inteligente.
+
+    Parámetros:
+    ----------
+    v : numpy.ndarray
+        Velocidad de cada coche.
+    dv : numpy.ndarray
+        Velocidad de aproximación al líder (v - v_líder).
+    hueco : numpy.ndarray
+        Distancia libre hasta el líder (inf si no hay líder).
+    v0, a, b, T, s0 : float
+        Velocidad deseada, aceleración máxima, frenada cómoda, tiempo de
+        seguridad y distancia mínima.
+    delta : float
+        Exponente de la aceleración libre.
+    """
+    deseado = s0 + np.maximum(v * T + v * dv / (2 * np.sqrt(a * b)), 0.0)
+    interaccion = (deseado / np.maximum(hueco, 1e-6)) ** 2
+
+    return a * (1 - (v / v0) ** delta - interaccion)
+
+
+def simula(rutas, num_frames, v0, largo=0.25, s0=0.1, T=24.0, a=None, b=None,
+           v_inicial=None):
+    """
+    Simula la flota frame a frame y devuelve la distancia recorrida por cada coche.
+
+    Parámetros:
+    ----------
+    rutas : list[array_like]
+        Puntos (i, j) de la ruta de cada coche.
+    num_frames : int
+        Número de frames que se simulan.
+    v0 : float
+        Velocidad deseada en celdas por frame.
+    largo : float
+        Longitud de un coche en celdas.
+    s0 : float
+        Distancia mínima de parada en celdas.
+    T : float
+        Tiempo de seguridad en frames.
+    a, b : float
+        Aceleración máxima y frenada cómoda en celdas por frame². Por defecto se
+        alcanza `v0` en unos `T` frames y se frena el doble de fuerte.
+    v_inicial : float
+        Velocidad de salida (por defecto `v0`).
+
+    Retorno:
+    -------
+    numpy.ndarray
+        Distancia recorrida (num_frames, n) a lo largo de cada ruta, en celdas;
+        la primera fila es 0.
+    """
+    puntos, acumuladas, totales = prepara_rutas(rutas)
+    n = len(totales)
+
+    if a is None:
+        a = v0 / T
+    if b is None:
+        b = 2 * a
+
+    s = np.zeros(n)
+    v = np.full(n, v0 if v_inicial is None else v_inicial, dtype=float)
+    recorrido = np.empty((num_frames, n))
+
+    for f in range(num_frames):
+        recorrido[f] = s
+
+        activos = s < totales
+        eje, calle, sentido, avance = carriles(s, puntos, acumuladas)
+        lider = lideres(eje, calle, sentido, avance, activos)
+
+        con_lider = lider >= 0
+        hueco = np.full(n, np.inf)
+        dv = np.zeros(n)
+        hueco[con_lider] = avance[lider[con_lider]] - avance[con_lider] - largo
+        dv[con_lider] = v[con_lider] - v[lider[con_lider]]
+
+        acc = aceleracion_idm(v, dv, hueco, v0, a, b, T, s0)
+
+        v_nueva = np.maximum(v + acc, 0.0)
+        s = np.minimum(s + 0.5 * (v + v_nueva), totales)
+        v = np.where(activos, v_nueva, 0.0)
+
+    return recorrido
@@ -0,0 +1,648 @@
+import bisect
+import math
+
+from collections import OrderedDict
+
+import numpy as np
+
+import interpola
+
+
+"""
+trayectoria.py
+
+
+Núcleo numérico de las trayectorias, sin Blender.
+
+Reúne el cálculo que hacen los drivers de `posicion` sobre datos simples
+(listas y arrays de keyframes por eje, tuplas para vectores y cuaterniones):
+
+- `KeyframesTrayectoria`: keyframes por eje, búsqueda del segmento con
+  `bisect`, segmentos compilados por método de interpolación y evaluación de
+  la posición.
+- `LongitudArco` y `TablaLongitud`: longitud de arco y su inversión.
+- La orientación a lo largo de la trayectoria (vector lateral, vector arriba,
+  cuaterniones de alineación e inclinación en las curvas) con tuplas
+  (x, y, z) y (w, x, y, z).
+- `CacheAcotada`, la caché LRU de los drivers.
+
+`posicion` adapta estas piezas a los objetos de Blender (fCurves, propiedades
+de la escena, `mathutils`); las herramientas por lotes, los procesos de
+trabajo y los benchmarks pueden importar este módulo directamente.
+
+
+Autores: Grupo 5.
+"""
+
+
+class CacheAcotada:
+    '''
+    Caché LRU de tamaño máximo fijo.
+
+    Lleva la cuenta de aciertos y fallos para poder medir su eficacia.
+    '''
+
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self.aciertos = 0
+        self.fallos = 0
+        self._datos = OrderedDict()
+
+    def get(self, clave):
+        valor = self._datos.get(clave)
+        if valor is None:
+            self.fallos += 1
+            return None
+
+        self.aciertos += 1
+        self._datos.move_to_end(clave)
+        return valor
+
+    def put(self, clave, valor):
+        self._datos[clave] = valor
+        self._datos.move_to_end(clave)
+        if len(self._datos) > self.capacidad:
+            self._datos.popitem(last=False)
+
+    def clear(self):
+        self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+# ---------------------------------------------------------------------------
+# Keyframes y evaluación de la posición
+# ---------------------------------------------------------------------------
+
+
+def busca_segmento(tiempos, t):
+    '''
+    Índice `i` del primer segmento con tiempos[i] <= t <= tiempos[i+1].
+
+    `tiempos` es una lista ordenada con al menos dos keyframes y `t` debe estar
+    dentro de su rango.
+    '''
+    i = bisect.bisect_left(tiempos, t) - 1
+    return min(max(i, 0), len(tiempos) - 2)
+
+
+class KeyframesTrayectoria:
+    '''
+    Keyframes de posición de una trayectoria, preparados para evaluarla.
+
+    Guarda, por eje, los tiempos y valores de los keyframes como arrays
+    ordenados y como listas (para `bisect`), y los segmentos compilados y los
+    motores de longitud de arco por método de interpolación.
+
+    Atributos:
+    ----------
+    tiempos, valores : list[numpy.ndarray]
+        Keyframes de posición por eje (vacíos si el eje no tiene curva).
+    tiempos_lista, valores_lista : list[list[float]]
+        Los mismos keyframes como listas de Python.
+    '''
+
+    def __init__(self, tiempos, valores, velocidades=None):
+        '''
+        Parámetros:
+        ----------
+        tiempos, valores : list[array_like]
+            Tiempos y valores de los keyframes de cada eje.
+        velocidades : list[array_like | None], opcional
+            Velocidad de cada eje en sus keyframes, para Hermite.
+        '''
+        self.tiempos = [np.asarray(t, dtype=float) for t in tiempos]
+        self.valores = [np.asarray(v, dtype=float) for v in valores]
+
+        self.tiempos_lista = [t.tolist() for t in self.tiempos]
+        self.valores_lista = [v.tolist() for v in self.valores]
+
+        self._velocidades = (list(velocidades) if velocidades is not None
+                             else [None] * len(self.tiempos))
+
+        self._segmentos = {}
+        self._longitudes_arco = {}
+        # Tensión de las entradas de Catmull-Rom que hay en las cachés
+        self._tension = None
+
+    @property
+    def interpolable(self):
+        '''Indica si algún eje tiene al menos dos keyframes.'''
+        return any(len(t) >= 2 for t in self.tiempos_lista)
+
+    def velocidades(self, coord):
+        '''Velocidades del eje `coord` en sus keyframes (None si no se conocen).'''
+        return self._velocidades[coord]
+
+    def busca_segmento(self, coord, t):
+        '''Índice del segmento del eje `coord` que contiene el tiempo `t`.'''
+        return busca_segmento(self.tiempos_lista[coord], t)
+
+    def _usa_tension(self, tension):
+        '''
+        Descarta los segmentos y motores de Catmull-Rom de otra tensión: al mover
+        el deslizador solo interesa la tensión actual.
+        '''
+        if tension != self._tension:
+            self._segmentos = {clave: valor for clave, valor in self._segmentos.items()
+                               if clave[1] != 'CATMULL-ROM'}
+            self._longitudes_arco = {clave: valor for clave, valor in self._longitudes_arco.items()
+                                     if clave[0] != 'CATMULL-ROM'}
+            self._tension = tension
+
+    def segmentos(self, coord, metodo, tension):
+        '''
+        Devuelve los segmentos compilados del eje `coord` para un método y una tensión.
+        '''
+        if metodo == 'CATMULL-ROM':
+            self._usa_tension(tension)
+        clave = (coord, metodo, tension if metodo == 'CATMULL-ROM' else None)
+
+        segmentos = self._segmentos.get(clave)
+        if segmentos is None:
+            velocidades = self.velocidades(coord) if metodo == 'HERMITE' else None
+            segmentos = interpola.compila_segmentos(
+                self.tiempos[coord], self.valores[coord], metodo,
+                tension=tension, velocidades=velocidades)
+            self._segmentos[clave] = segmentos
+
+        return segmentos
+
+    def longitud_arco(self, metodo, tension, tolerancia):
+        '''
+        Devuelve el motor de longitud de arco de la trayectoria para un método de
+        interpolación, una tensión y una tolerancia.
+        '''
+        if metodo == 'CATMULL-ROM':
+            self._usa_tension(tension)
+        clave = (metodo, tension if metodo == 'CATMULL-ROM' else None, tolerancia)
+
+        motor = self._longitudes_arco.get(clave)
+        if motor is None:
+            curvas = [self.segmentos(coord, metodo, tension)
+                      for coord in range(len(self.tiempos)) if len(self.tiempos_lista[coord]) >= 2]
+            motor = LongitudArco(curvas, tolerancia)
+            self._longitudes_arco[clave] = motor
+
+        return motor
+
+    def evalua_eje(self, coord, t, metodo, tension):
+        '''
+        Valor del eje `coord` en el tiempo `t`.
+
+        Fuera del rango de keyframes (o con un solo keyframe) se mantiene el valor
+        del extremo; un eje sin keyframes vale 0.
+
+        Retorno:
+        -------
+        tuple[float, bool]
+            El valor y si `t` cae dentro de un segmento interpolado.
+        '''
+        tiempos = self.tiempos_lista[coord]
+        valores = self.valores_lista[coord]
+
+        if not tiempos:
+            return 0.0, False
+        if len(tiempos) == 1 or t < tiempos[0]:
+            return valores[0], False
+        if t > tiempos[-1]:
+            return valores[-1], False
+
+        i = busca_segmento(tiempos, t)
+        return self.segmentos(coord, metodo, tension).evalua(t, i), True
+
+    def posicion(self, t, metodo, tension):
+        '''
+        Posición en el tiempo `t` en todos los ejes.
+
+        Retorno:
+        -------
+        tuple[list[float], list[bool]]
+            Valor de cada eje y si cae dentro de un segmento interpolado.
+        '''
+        pos = []
+        dentro = []
+        for coord in range(len(self.tiempos)):
+            valor, interior = self.evalua_eje(coord, t, metodo, tension)
+            pos.append(valor)
+            dentro.append(interior)
+
+        return pos, dentro
+
+
+# ---------------------------------------------------------------------------
+# Longitud de arco
+# ---------------------------------------------------------------------------
+
+
+# Nodos y pesos de Gauss-Legendre de orden 5 en [-1, 1]
+_GL5_NODOS = (
+    -0.9061798459386640, -0.5384693101056831, 0.0,
+    0.5384693101056831, 0.9061798459386640,
+)
+_GL5_PESOS = (
+    0.2369268850561891, 0.4786286704993665, 0.5688888888888889,
+    0.4786286704993665, 0.2369268850561891,
+)
+
+
+class LongitudArco:
+    '''
+    Longitud de arco de una trayectoria definida por segmentos cúbicos por eje.
+
+    Integra la rapidez |dP/dt| con cuadratura de Gauss-Legendre de orden 5 en
+    cada tramo entre keyframes consecutivos (de cualquier eje) y subdivide el
+    tramo a la mitad mientras la estimación no alcance la tolerancia pedida.
+    Las longitudes de los tramos se calculan al construir el objeto; las
+    longitudes en frames intermedios solo cuando se piden.
+
+    Atributos:
+    ----------
+    rupturas : list[float]
+        Tiempos de todos los keyframes, ordenados y sin repetir.
+    longitudes_tramo : list[float]
+        Longitud de cada tramo entre rupturas consecutivas.
+    acumuladas : list[float]
+        Longitud acumulada hasta cada ruptura.
+    '''
+
+    def __init__(self, curvas, tolerancia=1e-4, profundidad_maxima=12):
+        '''
+        Parámetros:
+        ----------
+        curvas : list[interpola.SegmentosCompilados]
+            Segmentos compilados de cada eje; los ejes con menos de dos
+            keyframes no aportan movimiento.
+        tolerancia : float
+            Error absoluto admitido en la longitud de cada tramo.
+        profundidad_maxima : int
+            Número máximo de subdivisiones de un tramo.
+        '''
+        self.curvas = [c for c in curvas if c is not None and len(c.tiempos) >= 2]
+        self.tolerancia = tolerancia
+        self.profundidad_maxima = profundidad_maxima
+
+        self.rupturas = sorted({t for c in self.curvas for t in c.tiempos})
+        self.longitudes_tramo = [
+            self._integra(t0, t1) for t0, t1 in zip(self.rupturas, self.rupturas[1:])]
+
+        self.acumuladas = [0.0]
+        for longitud in self.longitudes_tramo:
+            self.acumuladas.append(self.acumuladas[-1] + longitud)
+
+    @property
+    def total(self):
+        return self.acumuladas[-1]
+
+    def rapidez(self, t):
+        '''Módulo de la velocidad |dP/dt| en el tiempo `t`.'''
+        suma = 0.0
+        for segmentos in self.curvas:
+            tiempos = segmentos.tiempos
+            if t < tiempos[0] or t > tiempos[-1]:
+                continue
+
+            d = segmentos.derivada(t, busca_segmento(tiempos, t))
+            suma += d * d
+
+        return math.sqrt(suma)
+
+    def _gauss_legendre(self, a, b):
+        centro = (a + b) / 2
+        radio = (b - a) / 2
+        return radio * sum(w * self.rapidez(centro + radio * x)
+                           for x, w in zip(_GL5_NODOS, _GL5_PESOS))
+
+    def _integra(self, a, b, total=None, tolerancia=None, profundidad=0):
+        '''Integral adaptativa de la rapidez entre `a` y `b`.'''
+        if b <= a:
+            return 0.0
+        if total is None:
+            total = self._gauss_legendre(a, b)
+        if tolerancia is None:
+            tolerancia = self.tolerancia
+
+        medio = (a + b) / 2
+        izquierda = self._gauss_legendre(a, medio)
+        derecha = self._gauss_legendre(medio, b)
+
+        if profundidad >= self.profundidad_maxima or abs(izquierda + derecha - total) <= tolerancia:
+            return izquierda + derecha
+
+        return (self._integra(a, medio, izquierda, tolerancia / 2, profundidad + 1) +
+                self._integra(medio, b, derecha, tolerancia / 2, profundidad + 1))
+
+    def longitud_hasta(self, t):
+        '''Longitud recorrida desde el primer keyframe hasta el tiempo `t`.'''
+        if not self.rupturas or t <= self.rupturas[0]:
+            return 0.0
+        if t >= self.rupturas[-1]:
+            return self.total
+
+        k = bisect.bisect_right(self.rupturas, t) - 1
+        return self.acumuladas[k] + self._integra(self.rupturas[k], t)
+
+    def tabla(self, frames):
+        '''Longitud acumulada en cada uno de los `frames`.'''
+        return [self.longitud_hasta(frm) for frm in frames]
+
+
+class TablaLongitud:
+    '''
+    Tabla frame → longitud recorrida con inversión por bisección.
+
+    Se construye muestreando una vez la longitud recorrida en cada frame del
+    rango de la escena. La consulta longitud → frame busca el primer frame que
+    alcanza la longitud con `bisect` (O(log n)) e interpola entre las dos muestras
+    vecinas, de forma lineal o con una cúbica monótona.
+
+    Atributos:
+    ----------
+    frames, longitudes : numpy.ndarray
+        Muestras de la tabla.
+    '''
+
+    def __init__(self, frames, longitudes):
+        self.frames = np.asarray(frames, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+
+        self._frames_lista = self.frames.tolist()
+        self._longitudes_lista = self.longitudes.tolist()
+        self._monotona = None
+
+    @classmethod
+    def desde_fcurve(cls, fcurve, frame_start, frame_end):
+        '''Muestrea cualquier curva con `evaluate(frame)` (una fCurve) en el rango.'''
+        frames = list(range(frame_start, frame_end + 1))
+        return cls(frames, [fcurve.evaluate(frm) for frm in frames])
+
+    def _segmentos_monotonos(self):
+        '''
+        Compila la cúbica monótona frame(longitud) sobre las muestras en las que la
+        longitud crece estrictamente. De cada tramo parado se conserva el último
+        frame, que es desde donde se vuelve a avanzar.
+        '''
+        if self._monotona is None:
+            crece = np.concatenate((np.diff(self.longitudes) > 0, [True]))
+            x = self.longitudes[crece]
+            y = self.frames[crece]
+            pendientes = interpola.pendientes_monotonas(x, y)
+            self._monotona = (x.tolist(), interpola.SegmentosCompilados(
+                x, interpola.compila_hermite(x, y, pendientes)))
+
+        return self._monotona
+
+    def frame(self, long, metodo='LINEAL'):
+        '''
+        Devuelve el frame en el que se alcanza la longitud `long`.
+
+        Parámetros:
+        ----------
+        long : float
+            Longitud recorrida buscada.
+        metodo : str
+            'LINEAL' o 'MONOTONA': interpolación entre las dos muestras vecinas.
+
+        Retorno:
+        -------
+        float
+            El frame correspondiente; el primero o el último de la tabla si la
+            longitud queda fuera de su rango.
+        '''
+        longitudes = self._longitudes_lista
+        frames = self._frames_lista
+
+        j = bisect.bisect_left(longitudes, long)
+
+        if j >= len(longitudes):
+            return frames[-1]
+
+        if longitudes[j] == long or j == 0:
+            return frames[j]
+
+        if metodo == 'MONOTONA':
+            x, segmentos = self._segmentos_monotonos()
+            return segmentos.evalua(long, busca_segmento(x, long))
+
+        # f(x) = x0 + (x - y0) * ((x1 - x0) / (y1 - y0))
+        l0 = longitudes[j - 1]
+        l1 = longitudes[j]
+        return frames[j - 1] + (long - l0) * (frames[j] - frames[j - 1]) / (l1 - l0)
+
+
+# ---------------------------------------------------------------------------
+# Orientación
+#
+# Vectores como tuplas (x, y, z) y cuaterniones como tuplas (w, x, y, z). Las
+# funciones siguen las mismas reglas que las versiones con `mathutils` de
+# `posicion` (get_lat_vec, get_up_vec, get_quad_from_vecs, get_quat_rot y
+# angle_in_xy_plane).
+# ---------------------------------------------------------------------------
+
+
+EJES = {
+    'X': (1.0, 0.0, 0.0),
+    'Y': (0.0, 1.0, 0.0),
+    'Z': (0.0, 0.0, 1.0),
+    '-X': (-1.0, 0.0, 0.0),
+    '-Y': (0.0, -1.0, 0.0),
+    '-Z': (0.0, 0.0, -1.0),
+}
+
+CUATERNION_IDENTIDAD = (1.0, 0.0, 0.0, 0.0)
+
+
+def producto_escalar(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def producto_vectorial(a, b):
+    return (a[1] * b[2] - a[2] * b[1],
+            a[2] * b[0] - a[0] * b[2],
+            a[0] * b[1] - a[1] * b[0])
+
+
+def norma(v):
+    return math.sqrt(v[0] * v[0] + v[1] * v[1] + v[2] * v[2])
+
+
+def normaliza(v):
+    '''Vector unitario en la dirección de `v` (el vector nulo se devuelve tal cual).'''
+    n = norma(v)
+    if n == 0:
+        return (0.0, 0.0, 0.0)
+    return (v[0] / n, v[1] / n, v[2] / n)
+
+
+def angulo(a, b):
+    '''Ángulo entre dos vectores no nulos, en radianes.'''
+    coseno = producto_escalar(a, b) / (norma(a) * norma(b))
+    return math.acos(max(-1.0, min(1.0, coseno)))
+
+
+def ortogonal(v):
+    '''Un vector perpendicular a `v` (misma elección que `mathutils.Vector.orthogonal`).'''
+    x, y, z = v
+    ax, ay, az = abs(x), abs(y), abs(z)
+    if ax >= ay and ax >= az:
+        return (-y - z, x, x)
+    if ay >= az:
+        return (y, -x - z, y)
+    return (z, z, -x - y)
+
+
+def cuaternion_eje_angulo(eje, angulo_rad):
+    '''Cuaternión de un giro de `angulo_rad` alrededor de `eje`.'''
+    x, y, z = normaliza(eje)
+    s = math.sin(angulo_rad / 2)
+    return (math.cos(angulo_rad / 2), x * s, y * s, z * s)
+
+
+def producto_cuaternion(q, r):
+    '''Composición q @ r (primero r y después q).'''
+    w1, x1, y1, z1 = q
+    w2, x2, y2, z2 = r
+    return (w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+            w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+            w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+            w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2)
+
+
+def rota_vector(q, v):
+    '''Aplica el giro q a v (q @ v).'''
+    w = q[0]
+    u = (q[1], q[2], q[3])
+    # v' = v + 2w (u × v) + 2 u × (u × v)
+    t = producto_vectorial(u, v)
+    t = (2 * t[0], 2 * t[1], 2 * t[2])
+    c = producto_vectorial(u, t)
+    return (v[0] + w * t[0] + c[0], v[1] + w * t[1] + c[1], v[2] + w * t[2] + c[2])
+
+
+def vector_director(p0, p1):
+    '''Vector unitario de `p0` a `p1`, o nulo si coinciden.'''
+    return normaliza((p1[0] - p0[0], p1[1] - p0[1], p1[2] - p0[2]))
+
+
+def vector_lateral(t):
+    '''Vector lateral: perpendicular a la tangente `t` y al eje Z global.'''
+    return normaliza(producto_vectorial((0.0, 0.0, 1.0), t))
+
+
+def vector_arriba(t, l):
+    '''Vector arriba, perpendicular a `t` y a `l` y con Z no negativa.'''
+    up = normaliza(producto_vectorial(t, l))
+    if up[2] < 0:
+        up = (-up[0], -up[1], -up[2])
+    return up
+
+
+def cuaternion_entre(e, t):
+    '''
+    Cuaternión que gira el vector `e` hasta alinearlo con `t`.
+
+    Devuelve la identidad si alguno es nulo o si ya están alineados, y un giro de
+    180 grados alrededor de un eje perpendicular si son opuestos.
+    '''
+    e = normaliza(e)
+    t = normaliza(t)
+
+    if norma(e) == 0 or norma(t) == 0:
+        return CUATERNION_IDENTIDAD
+
+    if e == t:
+        return CUATERNION_IDENTIDAD
+
+    if e == (-t[0], -t[1], -t[2]):
+        return cuaternion_eje_angulo(ortogonal(e), math.pi)
+
+    return cuaternion_eje_angulo(producto_vectorial(e, t), angulo(e, t))
+
+
+def cuaternion_rotacion(e, t, up, angulo_inclinacion, angulo_giro, e3):
+    '''
+    Cuaternión que alinea el eje `e` con la tangente `t`, el eje `e3` con `up` y,
+    en las curvas, inclina alrededor de `t`.
+
+    Parámetros:
+    ----------
+    e, t, up : tuple[float, float, float]
+        Eje de avance del objeto, tangente y vector arriba.
+    angulo_inclinacion : float
+        Inclinación lateral por radián de giro.
+    angulo_giro : float
+        Giro entre la tangente actual y la anterior (ver `angulo_en_plano_xy`).
+    e3 : tuple[float, float, float]
+        Eje local del objeto que se alinea con `up`.
+    '''
+    e = normaliza(e)
+    t = normaliza(t)
+    up = normaliza(up)
+
+    q1 = cuaternion_entre(e, t)
+    e3_rot = normaliza(rota_vector(q1, e3))
+    q2 = cuaternion_entre(e3_rot, up)
+
+    q = producto_cuaternion(q2, q1)
+    if angulo_giro != 0:
+        q3 = cuaternion_eje_angulo(t, angulo_inclinacion * angulo_giro)
+        q = producto_cuaternion(q3, q)
+
+    return q
+
+
+def angulo_en_plano_xy(v1, v2):
+    '''
+    Ángulo con signo de `v1` a `v2` proyectados en el plano XY: positivo en
+    sentido antihorario y 0 si alguna proyección es nula.
+    '''
+    a = (v1[0], v1[1], 0.0)
+    b = (v2[0], v2[1], 0.0)
+
+    if norma(a) == 0 or norma(b) == 0:
+        return 0.0
+
+    a = normaliza(a)
+    b = normaliza(b)
+    resultado = angulo(a, b)
+
+    if a[0] * b[1] - a[1] * b[0] < 0:
+        resultado = -resultado
+
+    return resultado
+
+
+def cuaternion_trayectoria(p_previa, p_anterior, p_actual, e, e3, angulo_inclinacion):
+    '''
+    Orientación de un objeto a partir de tres posiciones consecutivas.
+
+    Parámetros:
+    ----------
+    p_previa, p_anterior, p_actual : tuple[float, float, float]
+        Posiciones en los frames frm - 1, frm y frm + 1.
+    e, e3 : tuple[float, float, float]
+        Eje de avance y eje arriba del objeto.
+    angulo_inclinacion : float
+        Inclinación lateral por radián de giro.
+
+    Retorno:
+    -------
+    tuple[float, float, float, float] | None
+        El cuaternión (w, x, y, z), o None si el objeto no se mueve entre frm y
+        frm + 1 (y debe conservar su rotación).
+    '''
+    t = vector_director(p_anterior, p_actual)
+    t_anterior = vector_director(p_previa, p_anterior)
+    if norma(t_anterior) == 0:
+        t_anterior = t
+
+    if norma(t) == 0:
+        return None
+
+    angulo_giro = angulo_en_plano_xy(t, t_anterior)
+
+    l = vector_lateral(t)
+    up = vector_arriba(t, l)
+
+    return cuaternion_rotacion(e, t, up, angulo_inclinacion, angulo_giro, e3)
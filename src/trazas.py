@@ -0,0 +1,211 @@
+import functools
+import json
+import os
+import threading
+import time
+
+
+"""
+trazas.py
+
+
+Trazas de tiempo de la generación de la ciudad y de los coches.
+
+`tramo` (gestor de contexto) y `traza` (decorador) marcan el inicio y el final
+de una etapa. Mientras el trazado está activo cada tramo se guarda como un
+evento completo ("ph": "X") del formato Trace Event de Chrome, con tiempos en
+microsegundos, y `exporta` escribe el JSON que abren chrome://tracing o
+Perfetto (ui.perfetto.dev, también sin conexión).
+
+Los tramos se pueden asignar a una pista (`pista="Car.012"`) para ver la línea
+de tiempo de cada coche en su propia fila. Un tramo sin pista se dibuja en la
+del tramo que lo contiene (así `longitud_recorrida` aparece dentro del coche que
+la llama) o, si no hay ninguno, en la fila del hilo.
+
+Con el trazado desactivado (por defecto) `tramo` devuelve un contexto vacío
+compartido y las funciones decoradas se llaman directamente tras comprobar una
+variable, así que la instrumentación puede quedarse en el código.
+
+El módulo no depende de Blender.
+
+
+Autores: Grupo 5.
+"""
+
+
+_activo = False
+_eventos = []
+_pistas = {}
+# Filas de los tramos abiertos; los tramos sin pista usan la del más interno
+_pila = []
+_origen = time.perf_counter_ns()
+
+
+class _TramoNulo:
+    '''Contexto vacío que se devuelve cuando el trazado está desactivado.'''
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def anota(self, **args):
+        pass
+
+
+_TRAMO_NULO = _TramoNulo()
+
+
+class _Tramo:
+    __slots__ = ('nombre', 'categoria', 'args', 'tid', 'inicio')
+
+    def __init__(self, nombre, categoria, args, tid):
+        self.nombre = nombre
+        self.categoria = categoria
+        self.args = args
+        self.tid = tid
+
+    def __enter__(self):
+        if self.tid is None:
+            self.tid = _pila[-1] if _pila else threading.get_ident()
+        _pila.append(self.tid)
+        self.inicio = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        fin = time.perf_counter_ns()
+        _pila.pop()
+        evento = {
+            "name": self.nombre,
+            "cat": self.categoria,
+            "ph": "X",
+            "ts": (self.inicio - _origen) / 1000,
+            "dur": (fin - self.inicio) / 1000,
+            "pid": os.getpid(),
+            "tid": self.tid,
+        }
+        if self.args:
+            evento["args"] = self.args
+        _eventos.append(evento)
+        return False
+
+    def anota(self, **args):
+        '''Añade valores al tramo antes de cerrarlo (por ejemplo, el objeto creado).'''
+        if self.args:
+            self.args.update(args)
+        else:
+            self.args = args
+
+
+def activa():
+    '''Empieza a guardar los tramos.'''
+    global _activo
+    _activo = True
+
+
+def desactiva():
+    '''Deja de guardar tramos (los ya guardados se conservan hasta `reinicia`).'''
+    global _activo
+    _activo = False
+
+
+def activo():
+    return _activo
+
+
+def reinicia():
+    '''Descarta los tramos guardados y toma el instante actual como origen.'''
+    global _origen
+    _eventos.clear()
+    _pistas.clear()
+    _origen = time.perf_counter_ns()
+
+
+def num_eventos():
+    return len(_eventos)
+
+
+def _tid(pista):
+    '''Identificador de fila de una pista (None: se decide al abrir el tramo).'''
+    if pista is None:
+        return None
+
+    tid = _pistas.get(pista)
+    if tid is None:
+        # Números pequeños y estables en el orden en que aparecen las pistas
+        tid = _pistas[pista] = len(_pistas) + 1
+    return tid
+
+
+def tramo(nombre, categoria="", pista=None, **args):
+    '''
+    Gestor de contexto que mide el bloque como un tramo `nombre`.
+
+    Parámetros:
+    ----------
+    nombre : str
+        Nombre del tramo en la traza.
+    categoria : str
+        Categoría ("cat") para filtrar en el visor.
+    pista : str, opcional
+        Fila en la que se dibuja el tramo (por ejemplo, el nombre del coche).
+    **args :
+        Valores que se muestran con el tramo (deben poder pasarse a JSON).
+
+    El objeto devuelto por `with` tiene `anota(**args)` para añadir valores
+    que solo se conocen dentro del bloque.
+    '''
+    if not _activo:
+        return _TRAMO_NULO
+    return _Tramo(nombre, categoria, args, _tid(pista))
+
+
+def traza(nombre=None, categoria=""):
+    '''
+    Decorador que mide cada llamada a la función como un tramo.
+
+    Sin `nombre` se usa el de la función.
+    '''
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _activo:
+                return funcion(*args, **kwargs)
+            with _Tramo(etiqueta, categoria, None, None):
+                return funcion(*args, **kwargs)
+
+        return envoltura
+
+    return decorador
+
+
+def eventos():
+    '''
+    Eventos de la traza, con los metadatos que dan nombre al proceso y a las pistas.
+    '''
+    pid = os.getpid()
+    metadatos = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                  "args": {"name": "Skyward Metropolis"}}]
+    metadatos += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                   "args": {"name": pista}} for pista, tid in _pistas.items()]
+    return metadatos + list(_eventos)
+
+
+def exporta(ruta):
+    '''
+    Escribe la traza en formato Trace Event de Chrome.
+
+    Retorno:
+    -------
+    int
+        Número de tramos escritos.
+    '''
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": eventos(), "displayTimeUnit": "ms"}, f)
+
+    return len(_eventos)